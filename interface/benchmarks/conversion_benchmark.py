@@ -0,0 +1,218 @@
+"""Offline conversion benchmark.
+
+Generates a synthetic PandaSet-layout sequence, converts it end to end through
+DataExplorerInterface with local storage, and reports throughput, per-stage time, peak
+RSS and the time a fresh interpreter takes to import the interface as JSON.
+
+Each conversion runs in a fresh child process, so its peak RSS counts the interface and
+the conversion only, and not generating the fixtures or the conversions before it.
+
+Example, from /interface:
+    python -m benchmarks.conversion_benchmark --frames 80 --output /tmp/bench.json \\
+        --extra_data '{"read_ahead_frames": 4}'
+"""
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import typing
+
+from benchmarks import pandaset_fixtures
+import constants
+import data_sender
+from google.protobuf import json_format
+import log_converter
+
+from simian.public.proto.v2 import io_pb2
+
+LOG_PATH = "synthetic/001"
+CHANNELS = [constants.POSE_CHANNEL, constants.CAMERA_CHANNEL, constants.LIDAR_CHANNEL]
+
+
+def run_conversion(
+    storage_root: str, extra_data: dict[str, typing.Any], channels: list[str] = CHANNELS
+) -> dict[str, typing.Any]:
+    """Converts the sequence at `<storage_root>/LOG_PATH` the way ADP drives the interface
+    and returns the measurements, including the interface's own per-stage metrics."""
+    metrics_dir = tempfile.TemporaryDirectory()
+    metrics_file = os.path.join(metrics_dir.name, "metrics.json")
+    fake_data_sender = data_sender.FakeDataSender(quiet=True)
+    interface = log_converter.DataExplorerInterface(None, data_sender_override=fake_data_sender)
+    startup_options = json_format.ParseDict(
+        {
+            "channelSetup": {"allChannels": [{"name": channel} for channel in channels]},
+            # Extra data values are passed as strings, as they come from the drive config.
+            "scenarioExtraData": {
+                "storage": "local",
+                "local_root": storage_root,
+                "metrics_file": metrics_file,
+                **{key: str(value) for key, value in extra_data.items()},
+            },
+        },
+        io_pb2.InterfaceStartupOptions(),
+    )
+    interface.set_startup_options_v2_1(startup_options)
+
+    stage_seconds = {"log_open": 0.0, "log_read": 0.0, "convert_to_simian": 0.0, "log_close": 0.0}
+    messages_per_channel: dict[str, int] = {}
+    start = time.perf_counter()
+
+    stage_start = time.perf_counter()
+    interface.log_open_v2_2(io_pb2.LogOpenOptions(path=LOG_PATH))
+    stage_seconds["log_open"] += time.perf_counter() - stage_start
+
+    t = 0
+    while True:
+        read_options = io_pb2.LogReadOptions()
+        read_options.offset.FromMilliseconds(t)
+        stage_start = time.perf_counter()
+        read_output = interface.log_read_v2_1(read_options)
+        stage_seconds["log_read"] += time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        for channel in read_output.seen_channel_names:
+            interface.convert_to_simian(io_pb2.Channel(name=channel))
+            interface.convert_to_simian_free(channel)
+            messages_per_channel[channel] = messages_per_channel.get(channel, 0) + 1
+        stage_seconds["convert_to_simian"] += time.perf_counter() - stage_start
+
+        if read_output.offset_reached.ToMilliseconds() >= t:
+            t += 100
+        if not read_output.data_remaining:
+            break
+
+    stage_start = time.perf_counter()
+    interface.log_close(io_pb2.LogCloseOptions())
+    stage_seconds["log_close"] += time.perf_counter() - stage_start
+    total_seconds = time.perf_counter() - start
+
+    with metrics_dir, open(metrics_file) as f:
+        interface_metrics = json.load(f)
+
+    num_messages = sum(messages_per_channel.values())
+    return {
+        "total_seconds": total_seconds,
+        "messages": num_messages,
+        "messages_per_second": num_messages / total_seconds,
+        # A frame is one message on the camera channel, the slowest channel to convert.
+        "frames_per_second": messages_per_channel.get(constants.CAMERA_CHANNEL, 0) / total_seconds,
+        "messages_per_channel": messages_per_channel,
+        "stage_seconds": stage_seconds,
+        "interface_metrics": interface_metrics,
+        "messages_sent": dict(fake_data_sender.counts),
+    }
+
+
+def measure_import_seconds() -> float:
+    """Times importing the interface in a fresh interpreter, the part of a conversion
+    container's startup before it can serve the first call. Includes starting Python."""
+    interface_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import log_converter"], cwd=interface_dir, check=True)
+    return time.perf_counter() - start
+
+
+def peak_rss_bytes() -> int:
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _run_and_measure_rss(
+    storage_root: str, extra_data: dict[str, typing.Any], channels: list[str]
+) -> dict[str, typing.Any]:
+    results = run_conversion(storage_root, extra_data, channels)
+    results["peak_rss_bytes"] = peak_rss_bytes()
+    return results
+
+
+def run_conversion_in_child(
+    storage_root: str, extra_data: dict[str, typing.Any], channels: list[str] = CHANNELS
+) -> dict[str, typing.Any]:
+    """Runs `run_conversion` in a freshly spawned interpreter and adds the peak RSS of that
+    process to the measurements."""
+    # Spawned rather than forked, as a forked child starts out with the parent's pages.
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        return executor.submit(_run_and_measure_rss, storage_root, extra_data, channels).result()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=pandaset_fixtures.DEFAULT_NUM_FRAMES)
+    parser.add_argument(
+        "--points", type=int, default=pandaset_fixtures.DEFAULT_POINTS_PER_FRAME
+    )
+    parser.add_argument("--height", type=int, default=pandaset_fixtures.DEFAULT_IMAGE_SHAPE[0])
+    parser.add_argument("--width", type=int, default=pandaset_fixtures.DEFAULT_IMAGE_SHAPE[1])
+    parser.add_argument(
+        "--channels",
+        nargs="+",
+        default=CHANNELS,
+        help="Channels to request from the interface",
+    )
+    parser.add_argument(
+        "--all_cameras",
+        action="store_true",
+        help="Generate images for all six PandaSet cameras instead of the front camera only",
+    )
+    parser.add_argument("--repeat", type=int, default=1, help="Number of conversions to time")
+    parser.add_argument(
+        "--extra_data",
+        type=str,
+        default="{}",
+        help="JSON object of scenario extra data options to convert with",
+    )
+    parser.add_argument(
+        "--fixture_dir",
+        type=str,
+        default=None,
+        help="Reuse the sequence in this directory, generating it if it does not exist",
+    )
+    parser.add_argument("--output", type=str, default=None, help="Path to write JSON results to")
+    args = parser.parse_args()
+
+    extra_data = json.loads(args.extra_data)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        storage_root = args.fixture_dir or temp_dir
+        if not os.path.exists(os.path.join(storage_root, LOG_PATH)):
+            pandaset_fixtures.write_sequence(
+                storage_root,
+                LOG_PATH,
+                num_frames=args.frames,
+                points_per_frame=args.points,
+                image_shape=(args.height, args.width),
+                cameras=constants.PANDASET_CAMERAS if args.all_cameras else ("front_camera",),
+            )
+
+        runs = [
+            run_conversion_in_child(storage_root, extra_data, args.channels)
+            for _ in range(args.repeat)
+        ]
+
+    results = {
+        "frames": args.frames,
+        "points_per_frame": args.points,
+        "image_shape": [args.height, args.width],
+        "extra_data": extra_data,
+        "channels": args.channels,
+        "runs": runs,
+        "best_frames_per_second": max(run["frames_per_second"] for run in runs),
+        "import_seconds": measure_import_seconds(),
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from benchmarks import conversion_benchmark
+from benchmarks import pandaset_fixtures
+import constants
+
+NUM_FRAMES = 3
+
+
+class ConversionBenchmarkTest(unittest.TestCase):
+    def setUp(self) -> None:
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self._storage_root = temp_dir.name
+        pandaset_fixtures.write_sequence(
+            self._storage_root,
+            conversion_benchmark.LOG_PATH,
+            num_frames=NUM_FRAMES,
+            points_per_frame=20,
+            image_shape=(16, 24),
+        )
+
+    def test_run_conversion(self) -> None:
+        for extra_data in ({}, {"read_ahead_frames": 2, "coalesce_reads": True}):
+            with self.subTest(extra_data=extra_data):
+                results = conversion_benchmark.run_conversion(self._storage_root, extra_data)
+                messages_per_channel = results["messages_per_channel"]
+                self.assertEqual(messages_per_channel[constants.CAMERA_CHANNEL], NUM_FRAMES)
+                self.assertEqual(messages_per_channel[constants.LIDAR_CHANNEL], NUM_FRAMES)
+                self.assertEqual(results["messages"], sum(messages_per_channel.values()))
+                self.assertGreater(results["frames_per_second"], 0.0)
+                self.assertIn("latency", results["interface_metrics"])
+
+    def test_main(self) -> None:
+        output = os.path.join(self._storage_root, "results.json")
+        argv = [
+            "conversion_benchmark",
+            "--frames",
+            str(NUM_FRAMES),
+            "--fixture_dir",
+            self._storage_root,
+            "--channels",
+            constants.CAMERA_CHANNEL,
+            "--output",
+            output,
+            "--extra_data",
+            '{"camera_passthrough": true}',
+        ]
+        with mock.patch.object(sys, "argv", argv), contextlib.redirect_stdout(io.StringIO()):
+            conversion_benchmark.main()
+
+        with open(output) as f:
+            results = json.load(f)
+        self.assertEqual(results["channels"], [constants.CAMERA_CHANNEL])
+        self.assertEqual(
+            results["runs"][0]["messages_per_channel"], {constants.CAMERA_CHANNEL: NUM_FRAMES}
+        )
+        self.assertGreater(results["runs"][0]["peak_rss_bytes"], 0)
+        self.assertGreater(results["import_seconds"], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
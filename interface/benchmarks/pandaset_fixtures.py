@@ -0,0 +1,154 @@
+"""Generates synthetic sequences in the PandaSet layout read by the log readers:
+
+    <log>/camera/<camera>/{00..}.jpg, timestamps.json, poses.json, intrinsics.json
+    <log>/lidar/{00..}.pkl.gz, timestamps.json, poses.json
+    <log>/meta/gps.json, timestamps.json
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import pickle
+import typing
+
+import constants
+import cv2
+import numpy as np
+import pandas as pd
+
+# Roughly the size of a PandaSet sequence.
+DEFAULT_NUM_FRAMES = 80
+DEFAULT_POINTS_PER_FRAME = 170000
+DEFAULT_IMAGE_SHAPE = (1080, 1920)
+
+START_LAT = 37.7749
+START_LONG = -122.4194
+
+# Yaw of each camera relative to the vehicle, roughly as mounted on the PandaSet car.
+CAMERA_YAWS = {
+    "front_camera": 0.0,
+    "front_left_camera": np.pi / 3,
+    "left_camera": np.pi / 2,
+    "back_camera": np.pi,
+    "right_camera": -np.pi / 2,
+    "front_right_camera": -np.pi / 3,
+}
+# Rotation from the optical axes of a camera (x right, y down, z forward) to its body axes.
+_BODY_FROM_OPTICAL = np.array([[0.0, 0.0, 1.0], [-1.0, 0.0, 0.0], [0.0, -1.0, 0.0]])
+
+
+def _yaw_matrix(yaw: float) -> np.ndarray:
+    return np.array(
+        [[np.cos(yaw), -np.sin(yaw), 0.0], [np.sin(yaw), np.cos(yaw), 0.0], [0.0, 0.0, 1.0]]
+    )
+
+
+def _pose(position: np.ndarray, rotation: np.ndarray) -> dict[str, dict[str, float]]:
+    """A PandaSet pose, with the rotation as a {w, x, y, z} heading quaternion."""
+    # Solve for the largest quaternion component first, for numerical stability.
+    (m00, m01, m02), (m10, m11, m12), (m20, m21, m22) = rotation
+    candidates = [
+        (1 + m00 + m11 + m22, (m21 - m12, m02 - m20, m10 - m01)),
+        (1 + m00 - m11 - m22, (m21 - m12, m01 + m10, m02 + m20)),
+        (1 - m00 + m11 - m22, (m02 - m20, m01 + m10, m12 + m21)),
+        (1 - m00 - m11 + m22, (m10 - m01, m02 + m20, m12 + m21)),
+    ]
+    largest = max(range(4), key=lambda i: candidates[i][0])
+    t, others = candidates[largest]
+    scale = 0.5 / np.sqrt(t)
+    quaternion = [value * scale for value in others]
+    quaternion.insert(largest, 0.5 * np.sqrt(t))
+    w, x, y, z = quaternion
+    return {
+        "position": dict(zip("xyz", map(float, position))),
+        "heading": dict(zip("wxyz", map(float, (w, x, y, z)))),
+    }
+
+
+def write_sequence(
+    root: str,
+    log_path: str,
+    num_frames: int = DEFAULT_NUM_FRAMES,
+    points_per_frame: int = DEFAULT_POINTS_PER_FRAME,
+    image_shape: tuple[int, int] = DEFAULT_IMAGE_SHAPE,
+    seed: int = 0,
+    cameras: typing.Sequence[str] = ("front_camera",),
+) -> None:
+    """Writes a sequence of `num_frames` frames of `cameras` to `<root>/<log_path>`."""
+    rng = np.random.default_rng(seed)
+    log_dir = os.path.join(root, log_path)
+    camera_dirs = [os.path.join(log_dir, "camera", camera) for camera in cameras]
+    lidar_dir = os.path.join(log_dir, "lidar")
+    meta_dir = os.path.join(log_dir, "meta")
+    for directory in (*camera_dirs, lidar_dir, meta_dir):
+        os.makedirs(directory, exist_ok=True)
+
+    timestamps = [1557540883.0 + i * constants.PERIOD_SECONDS for i in range(num_frames)]
+    for directory in (*camera_dirs, lidar_dir, meta_dir):
+        with open(os.path.join(directory, "timestamps.json"), "w") as f:
+            json.dump(timestamps, f)
+
+    # The vehicle drives forward while slowly turning, with the cameras 1.5m above the lidar.
+    vehicle_positions = [np.array([i * 1.0, i * 0.1, 1.8]) for i in range(num_frames)]
+    vehicle_rotations = [_yaw_matrix(i * 0.01) for i in range(num_frames)]
+    with open(os.path.join(lidar_dir, "poses.json"), "w") as f:
+        json.dump([_pose(p, r) for p, r in zip(vehicle_positions, vehicle_rotations)], f)
+    for camera, camera_dir in zip(cameras, camera_dirs):
+        mount_rotation = _yaw_matrix(CAMERA_YAWS.get(camera, 0.0)) @ _BODY_FROM_OPTICAL
+        mount_position = np.array([0.5, 0.0, 1.5])
+        with open(os.path.join(camera_dir, "poses.json"), "w") as f:
+            json.dump(
+                [
+                    _pose(p + r @ mount_position, r @ mount_rotation)
+                    for p, r in zip(vehicle_positions, vehicle_rotations)
+                ],
+                f,
+            )
+        with open(os.path.join(camera_dir, "intrinsics.json"), "w") as f:
+            json.dump({"fx": 1970.0, "fy": 1970.0, "cx": 970.0, "cy": 483.0}, f)
+
+    # Smooth gradients compress like camera images, unlike pure noise.
+    height, width = image_shape
+    gradient = np.add.outer(np.arange(height), np.arange(width)).astype(np.uint8)
+    for camera_index, camera_dir in enumerate(camera_dirs):
+        for i in range(num_frames):
+            image = np.stack(
+                [gradient + i, gradient[::-1], gradient[:, ::-1] + camera_index], axis=-1
+            )
+            noise = rng.integers(0, 16, size=image.shape, dtype=np.uint8)
+            with open(os.path.join(camera_dir, f"{i:02d}.jpg"), "wb") as f:
+                f.write(cv2.imencode(".jpg", image + noise)[1].tobytes())
+
+    for i in range(num_frames):
+        # Points scattered around the vehicle, with the extra columns PandaSet clouds have.
+        # Like PandaSet's, the clouds are stored in the world frame.
+        angle = rng.uniform(0, 2 * np.pi, points_per_frame)
+        distance = rng.gamma(2.0, 10.0, points_per_frame)
+        ego_points = np.stack(
+            [
+                distance * np.cos(angle),
+                distance * np.sin(angle),
+                rng.normal(-1.5, 0.5, points_per_frame),
+            ]
+        )
+        x, y, z = vehicle_rotations[i] @ ego_points + vehicle_positions[i][:, np.newaxis]
+        cloud = pd.DataFrame(
+            {
+                "x": x,
+                "y": y,
+                "z": z,
+                "i": rng.uniform(0, 100, points_per_frame),
+                "t": np.full(points_per_frame, timestamps[i]),
+                "d": np.zeros(points_per_frame, dtype=np.int64),
+            }
+        )
+        with gzip.open(os.path.join(lidar_dir, f"{i:02d}.pkl.gz"), "wb") as f:
+            pickle.dump(cloud, f)
+
+    gps = [
+        {"lat": START_LAT + i * 1e-5, "long": START_LONG + i * 1e-5, "height": 0.0}
+        for i in range(num_frames)
+    ]
+    with open(os.path.join(meta_dir, "gps.json"), "w") as f:
+        json.dump(gps, f)
@@ -12,7 +12,16 @@ class ChannelHandlerBase(abc.ABC):
     This channel handler converts the raw data from the log into the ADP format.
     """
 
-    def __init__(self, data_sender: data_sender.DataSender, mailbox: mailbox.Mailbox) -> None:
+    # Increment when a change makes the handler produce different outputs, so outputs cached
+    # by earlier versions are no longer used.
+    VERSION = 1
+
+    def __init__(
+        self,
+        data_sender: data_sender.DataSender,
+        mailbox: mailbox.Mailbox,
+        configuration: typing.Optional[dict[str, typing.Any]] = None,
+    ) -> None:
         raise NotImplementedError()
 
     def update(self) -> None:
@@ -20,3 +29,8 @@ class ChannelHandlerBase(abc.ABC):
 
     def get(self) -> typing.Any:
         raise NotImplementedError()
+
+    def cache_token(self) -> str:
+        """Identifies the outputs of this handler, including any options they depend on, in
+        the keys of the output cache."""
+        return f"{type(self).__name__}/{self.VERSION}"
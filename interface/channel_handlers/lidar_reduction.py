@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import typing
+
+import numpy as np
+
+# Voxel grids with up to this many voxels per point, or up to _MIN_DENSE_GRID_SIZE voxels,
+# are grouped by counting instead of sorting.
+_DENSE_GRID_POINTS_RATIO = 8
+_MIN_DENSE_GRID_SIZE = 1 << 20
+
+# Region of interest as (x_min, y_min, z_min, x_max, y_max, z_max).
+Roi = tuple[float, float, float, float, float, float]
+
+
+def _parse_roi(value: typing.Any) -> typing.Optional[Roi]:
+    """Parses a region of interest given as six comma-separated numbers or a list of six."""
+    if value in (None, ""):
+        return None
+    bounds = [float(bound) for bound in (value.split(",") if isinstance(value, str) else value)]
+    if len(bounds) != 6:
+        raise ValueError(
+            f"lidar_roi needs 6 values x_min,y_min,z_min,x_max,y_max,z_max, got {value}"
+        )
+    return typing.cast(Roi, tuple(bounds))
+
+
+class LidarReduction(typing.NamedTuple):
+    """Reduces the number of points of a lidar cloud before it is packed.
+
+    Crops are applied first, then the remaining points are averaged per voxel. Distances
+    are in meters, in the coordinate frame of the cloud. A value of 0 or None disables
+    the corresponding step.
+    """
+
+    # Edge length of the voxel grid, each occupied voxel becomes the centroid of its points.
+    voxel_size: float = 0.0
+    # Points further than this from the origin are dropped.
+    max_range: float = 0.0
+    # Points outside of this box are dropped.
+    roi: typing.Optional[Roi] = None
+
+    @classmethod
+    def from_extra_data(cls, extra_data: dict[str, typing.Any]) -> LidarReduction:
+        return cls(
+            voxel_size=float(extra_data.get("lidar_voxel_size", 0.0)),
+            max_range=float(extra_data.get("lidar_max_range", 0.0)),
+            roi=_parse_roi(extra_data.get("lidar_roi")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.voxel_size > 0 or self.max_range > 0 or self.roi is not None
+
+    def apply(self, points: np.ndarray) -> np.ndarray:
+        """Reduces an Nx4 (x, y, z, intensity) cloud, returning an Mx4 cloud."""
+        # Per-point math and indexing are much faster on contiguous columns, so the cloud is
+        # transposed once and the result is returned as a transposed view.
+        columns = np.ascontiguousarray(points.T)
+        x, y, z = columns[:3]
+        keep: typing.Optional[np.ndarray] = None
+        if self.max_range > 0:
+            keep = x * x + y * y + z * z <= self.max_range * self.max_range
+        if self.roi is not None:
+            for axis in range(3):
+                in_roi = (columns[axis] >= self.roi[axis]) & (columns[axis] <= self.roi[axis + 3])
+                keep = in_roi if keep is None else keep & in_roi
+        if keep is not None:
+            # Taking indices is several times faster than boolean indexing of 2D arrays.
+            columns = columns.take(np.flatnonzero(keep), axis=1)
+
+        if self.voxel_size > 0 and columns.shape[1]:
+            columns = self._voxel_centroids(columns)
+        return np.asarray(columns.T)
+
+    def _voxel_centroids(self, columns: np.ndarray) -> np.ndarray:
+        voxels = np.floor(columns[:3] * (1.0 / self.voxel_size)).astype(np.int64)
+        voxels -= voxels.min(axis=1, keepdims=True)
+        dims = voxels.max(axis=1) + 1
+        # One integer key per voxel is much faster to group than rows of three.
+        keys = (voxels[0] * dims[1] + voxels[1]) * dims[2] + voxels[2]
+
+        num_keys = int(dims[0] * dims[1] * dims[2])
+        if num_keys <= max(_DENSE_GRID_POINTS_RATIO * len(keys), _MIN_DENSE_GRID_SIZE):
+            # Small grids are counted directly, which avoids sorting the points.
+            points_per_voxel = np.bincount(keys, minlength=num_keys)
+            occupied: typing.Optional[np.ndarray] = np.flatnonzero(points_per_voxel)
+            voxel_of_point = keys
+            points_per_voxel = points_per_voxel[occupied]
+        else:
+            occupied = None
+            _, voxel_of_point, points_per_voxel = np.unique(
+                keys, return_inverse=True, return_counts=True
+            )
+
+        centroids = np.empty((len(columns), len(points_per_voxel)), dtype=columns.dtype)
+        for column, values in enumerate(columns):
+            sums = np.bincount(voxel_of_point, weights=values)
+            centroids[column] = (sums if occupied is None else sums[occupied]) / points_per_voxel
+        return centroids
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import unittest
+
+import lidar_reduction
+import numpy as np
+
+
+class LidarReductionTest(unittest.TestCase):
+    def test_disabled_by_default(self) -> None:
+        self.assertFalse(lidar_reduction.LidarReduction().enabled)
+        self.assertFalse(lidar_reduction.LidarReduction.from_extra_data({}).enabled)
+
+    def test_from_extra_data(self) -> None:
+        reduction = lidar_reduction.LidarReduction.from_extra_data(
+            {"lidar_voxel_size": "0.5", "lidar_max_range": "80", "lidar_roi": "-1,-2,-3,1,2,3"}
+        )
+        self.assertEqual(reduction.voxel_size, 0.5)
+        self.assertEqual(reduction.max_range, 80.0)
+        self.assertEqual(reduction.roi, (-1.0, -2.0, -3.0, 1.0, 2.0, 3.0))
+
+        with self.assertRaises(ValueError):
+            lidar_reduction.LidarReduction.from_extra_data({"lidar_roi": "1,2,3"})
+
+    def test_crop(self) -> None:
+        points = np.array(
+            [[1.0, 0.0, 0.0, 10.0], [0.0, 3.0, 0.0, 20.0], [0.0, 0.0, 5.0, 30.0]]
+        )
+        np.testing.assert_array_equal(
+            lidar_reduction.LidarReduction(max_range=4.0).apply(points), points[:2]
+        )
+        np.testing.assert_array_equal(
+            lidar_reduction.LidarReduction(roi=(-1, -1, -1, 1, 4, 1)).apply(points), points[:2]
+        )
+        np.testing.assert_array_equal(
+            lidar_reduction.LidarReduction(max_range=4.0, roi=(0.5, -1, -1, 1, 4, 1)).apply(
+                points
+            ),
+            points[:1],
+        )
+
+    def test_voxel_centroids(self) -> None:
+        points = np.array(
+            [
+                [0.1, 0.1, 0.1, 10.0],
+                [0.3, 0.3, 0.3, 20.0],
+                [1.5, 0.1, 0.1, 30.0],
+            ]
+        )
+        reduced = lidar_reduction.LidarReduction(voxel_size=1.0).apply(points)
+        np.testing.assert_allclose(
+            reduced[np.argsort(reduced[:, 0])],
+            [[0.2, 0.2, 0.2, 15.0], [1.5, 0.1, 0.1, 30.0]],
+        )
+
+    def test_voxel_grid_matches_row_grouping(self) -> None:
+        # Both the counting and the sorting implementations, with dense and sparse grids.
+        points = np.random.default_rng(0).uniform(-30, 30, size=(5000, 4))
+        for voxel_size in (0.5, 0.01):
+            reduced = lidar_reduction.LidarReduction(voxel_size=voxel_size).apply(points)
+
+            _, voxel_of_point = np.unique(
+                np.floor(points[:, :3] / voxel_size), axis=0, return_inverse=True
+            )
+            voxel_of_point = voxel_of_point.ravel()
+            counts = np.bincount(voxel_of_point)
+            expected = np.stack(
+                [np.bincount(voxel_of_point, weights=column) / counts for column in points.T],
+                axis=1,
+            )
+            np.testing.assert_allclose(np.sort(reduced, axis=0), np.sort(expected, axis=0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,10 @@
 from __future__ import annotations
 
 import mailbox
+import typing
 
 from channel_handlers import channel_handler_base
 import constants
-import cv2
 import data_sender
 import interface_errors
 
@@ -18,26 +18,53 @@ class MockCameraChannelHandler(channel_handler_base.ChannelHandlerBase):
     This channel handler converts the raw data from the log into the ADP format.
     """
 
-    def __init__(self, data_sender: data_sender.DataSender, mailbox: mailbox.Mailbox) -> None:
+    # 2: Camera poses come from the calibration of the sequence.
+    VERSION = 2
+
+    def __init__(
+        self,
+        data_sender: data_sender.DataSender,
+        mailbox: mailbox.Mailbox,
+        configuration: typing.Optional[dict[str, typing.Any]] = None,
+        topic: str = constants.MOCK_CAMERA_TOPIC,
+    ) -> None:
         self._data_sender = data_sender
         self._mailbox = mailbox
+        # Topic the camera images are read from, one per camera with the multi-camera reader.
+        self._topic = topic
+        # Passthrough images are the original JPEGs instead of re-encoded ones.
+        self._passthrough = bool((configuration or {}).get("camera_passthrough", False))
 
         self._camera_proto = sensor_model_pb2.SensorOutput.CameraImage()
+        # Pose of frames without calibration, built once.
+        self._default_pose_proto = proto_util.pose3d_to_proto(
+            spatial_py.Pose3d.create_with_roll_pitch_yaw(0, -10, 2, 0, -0.05, 1)
+        )
 
     def update(self) -> None:
-        camera_data = self._mailbox.latest_messages.get(constants.MOCK_CAMERA_TOPIC)
+        camera_data = self._mailbox.latest_message(self._topic)
 
         if camera_data is None:
             raise interface_errors.InterfaceImplementationError(
-                f"Camera data not received from a log reader to the topic {constants.MOCK_CAMERA_TOPIC} but the `update` function on the channel handler was called."
+                f"Camera data not received from a log reader to the topic {self._topic} but the `update` function on the channel handler was called."
             )
-        img_bytes = cv2.imencode(".jpg", camera_data.image_arr)[1].tobytes()
+        if camera_data.jpeg_bytes is not None:
+            # Passthrough mode, the reader forwarded the original compressed image.
+            img_bytes = camera_data.jpeg_bytes
+        else:
+            import cv2  # Not loaded by passthrough conversions.
+
+            img_bytes = cv2.imencode(".jpg", camera_data.image_arr)[1].tobytes()
         self._camera_proto.image.image_bytes = img_bytes
         self._camera_proto.image_shape.height = camera_data.height
         self._camera_proto.image_shape.width = camera_data.width
-        camera_pose = spatial_py.Pose3d.create_with_roll_pitch_yaw(0, -10, 2, 0, -0.05, 1)
-        camera_pose_proto = proto_util.pose3d_to_proto(camera_pose)
-        self._camera_proto.pose.CopyFrom(camera_pose_proto)
+        # The reader attaches the pose of the frame, prebuilt when the log was opened.
+        self._camera_proto.pose.CopyFrom(
+            camera_data.pose if camera_data.pose is not None else self._default_pose_proto
+        )
 
     def get(self) -> sensor_model_pb2.SensorOutput.CameraImage:
         return self._camera_proto
+
+    def cache_token(self) -> str:
+        return f"{super().cache_token()}/passthrough={self._passthrough}"
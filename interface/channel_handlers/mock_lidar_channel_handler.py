@@ -3,9 +3,10 @@ from __future__ import annotations
 import mailbox
 import numpy as np
 import struct
-import ctypes
+import typing
 
 from channel_handlers import channel_handler_base
+from channel_handlers import lidar_reduction
 import constants
 import data_sender
 import interface_errors
@@ -14,15 +15,99 @@ from simian.public.proto import sensor_model_pb2
 from simian.public.transforms import proto_util
 from simian.public.transforms import spatial_py
 
+# Header of the LidarCloud points blob: timestamp, 2x unused, number of fields per point.
+HEADER_FORMAT = "<Q3I"  # 1x ULONG LONG, 3x ULONG
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+# x, y, z, intensity, channel, instance_id, semantic_class
+NUM_FIELDS = 7
+# Converts from the standard right-handed Object Sim coordinate frame to the left-handed
+# coordinate frame that the lidar proto expects: (x, y, z) -> (-y, -x, z).
+LEFT_HANDED_FROM_RIGHT_HANDED = np.array([[0.0, -1.0, 0.0], [-1.0, 0.0, 0.0], [0.0, 0.0, 1.0]])
+
+
+def transform_points(points: np.ndarray, transform: np.ndarray) -> np.ndarray:
+    """Applies a 3x4 [R | t] transform to the x, y, z of an Nx4 cloud, in float32.
+
+    The result is a transposed view of contiguous columns, the layout LidarReduction
+    works on, so reducing it needs no further copy.
+    """
+    weights = np.eye(4, dtype=np.float32)
+    weights[:3, :3] = transform[:, :3]
+    columns = np.matmul(weights, points.astype(np.float32, copy=False).T)
+    columns[:3] += transform[:, 3:].astype(np.float32)
+    return np.asarray(columns.T)
+
+
+class LidarPointPacker:
+    """Packs Nx4 (x, y, z, intensity) clouds into the LidarCloud points blob.
+
+    The header and the points are written into a single buffer that is reused and only
+    grown across frames. The points are copied once, as float32 homogeneous coordinates,
+    into a reused scratch array, and all fields are then written by one matrix product that
+    applies the optional transform of the cloud and the conversion to the left-handed frame.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = bytearray(HEADER_SIZE)
+        # Pack header with: timestamp(0), unused(0), unused(0), num_fields(7)
+        struct.pack_into(HEADER_FORMAT, self._buffer, 0, 0, 0, 0, NUM_FIELDS)
+        # (x, y, z, intensity, 1) columns, the last one is never overwritten. Clouds are
+        # usually column-major, so they are copied column by column.
+        self._homogeneous = np.ones((5, 0), dtype=np.float32)
+
+    def pack(self, points: np.ndarray, transform: typing.Optional[np.ndarray] = None) -> bytes:
+        """Packs `points`, transformed by the 3x4 [R | t] `transform` if there is one."""
+        num_points = points.shape[0]
+        size = HEADER_SIZE + num_points * NUM_FIELDS * 4
+        if len(self._buffer) < size:
+            # Grow geometrically so clouds of slowly increasing size don't regrow every frame.
+            self._buffer.extend(bytes(max(size, len(self._buffer) * 5 // 4) - len(self._buffer)))
+        if self._homogeneous.shape[1] < num_points:
+            self._homogeneous = np.ones(
+                (5, max(num_points, self._homogeneous.shape[1] * 5 // 4)), dtype=np.float32
+            )
+        homogeneous = self._homogeneous[:, :num_points]
+        homogeneous[:4] = points[:, :4].T
+
+        if transform is None:
+            transform = np.eye(3, 4)
+        # Maps (x, y, z, intensity, 1) to all fields, the channel, instance and class are 0.
+        weights = np.zeros((5, NUM_FIELDS), dtype=np.float32)
+        weights[[0, 1, 2, 4], :3] = (LEFT_HANDED_FROM_RIGHT_HANDED @ transform).T
+        weights[3, 3] = 1
+
+        fields = np.frombuffer(
+            self._buffer, dtype="<f4", count=num_points * NUM_FIELDS, offset=HEADER_SIZE
+        ).reshape(num_points, NUM_FIELDS)
+        np.matmul(homogeneous.T, weights, out=fields)
+        # Release the view so the buffer can be grown on a later frame.
+        del fields
+
+        with memoryview(self._buffer) as buffer_view, buffer_view[:size] as points_view:
+            return points_view.tobytes()
+
 
 class MockLidarChannelHandler(channel_handler_base.ChannelHandlerBase):
     """
     This channel handler converts the raw lidar data from the log into the ADP format.
     """
 
-    def __init__(self, data_sender: data_sender.DataSender, mailbox: mailbox.Mailbox) -> None:
+    # 2: Clouds are transformed from the world frame to the ego frame.
+    VERSION = 2
+
+    def __init__(
+        self,
+        data_sender: data_sender.DataSender,
+        mailbox: mailbox.Mailbox,
+        configuration: typing.Optional[dict[str, typing.Any]] = None,
+    ) -> None:
         self._data_sender = data_sender
         self._mailbox = mailbox
+        # Optional point reduction, for smaller preview conversions.
+        configuration = configuration or {}
+        self._reduction: lidar_reduction.LidarReduction = configuration.get(
+            "lidar_reduction", lidar_reduction.LidarReduction()
+        )
         self._lidar_proto = sensor_model_pb2.SensorOutput.LidarCloud()
 
         # Initialize required fields
@@ -30,45 +115,35 @@ class MockLidarChannelHandler(channel_handler_base.ChannelHandlerBase):
         self._lidar_proto.id = 0  # Set an appropriate ID if needed
         self._lidar_proto.label_snapshot.Clear()
 
+        self._packer = LidarPointPacker()
+
+        # Set lidar pose (example fixed pose, adjust as needed)
+        lidar_pose = spatial_py.Pose3d.create_with_roll_pitch_yaw(0, 0, 0, 0, 0, 0)  # x,y,z, roll,pitch,yaw
+        self._lidar_proto.pose.CopyFrom(proto_util.pose3d_to_proto(lidar_pose))
+
     def update(self) -> None:
-        lidar_data = self._mailbox.latest_messages.get(constants.MOCK_LIDAR_TOPIC)
+        lidar_data = self._mailbox.latest_message(constants.MOCK_LIDAR_TOPIC)
 
         if lidar_data is None:
             raise interface_errors.InterfaceImplementationError(
                 f"Lidar data not received from a log reader to the topic {constants.MOCK_LIDAR_TOPIC} but the `update` function on the channel handler was called."
             )
 
-        # Convert from standard right-handed Object Sim coordinate frame to
-        # the left-handed coordinate frame that the lidar proto expects
-        points = lidar_data.points.copy()
-
-        # Create a new array with 7 columns (x,y,z,intensity,channel,instance_id,semantic_class)
-        padded_points = np.zeros((points.shape[0], 7), dtype='<f')
-        padded_points[:, :4] = points  # Copy the x,y,z,intensity coordinates
-
-        # Convert from standard right-handed Object Sim coordinate frame to
-        # the left-handed coordinate frame that the lidar proto expects
-        padded_points[:,[0,1]] = -padded_points[:, [1,0]]
+        # PandaSet clouds are in the world frame. The transform to the ego frame is applied
+        # while packing, unless the cloud is reduced, which is done in the ego frame.
+        points = lidar_data.points
+        transform = lidar_data.ego_from_world
+        if self._reduction.enabled:
+            if transform is not None:
+                points = transform_points(points, transform)
+                transform = None
+            points = self._reduction.apply(points)
 
-        # Create header bytes
-        header_format = '<Q3I'  # 1x ULONG LONG, 3x ULONG
-        header_size = struct.calcsize(header_format)
-        header_bytes = ctypes.create_string_buffer(header_size)
-
-        # Pack header with: timestamp(0), unused(0), unused(0), num_fields(7)
-        struct.pack_into(header_format, header_bytes, 0, 0, 0, 0, 7)
-
-        # Combine header and flattened points data
-        raw_bytes = header_bytes.raw + padded_points.flatten().tobytes()
- 
         # Set points data with header and converted points
-        self._lidar_proto.Clear()
-        self._lidar_proto.points = raw_bytes
-
-        # Set lidar pose (example fixed pose, adjust as needed)
-        lidar_pose = spatial_py.Pose3d.create_with_roll_pitch_yaw(0, 0, 0, 0, 0, 0)  # x,y,z, roll,pitch,yaw
-        lidar_pose_proto = proto_util.pose3d_to_proto(lidar_pose)
-        self._lidar_proto.pose.CopyFrom(lidar_pose_proto)
+        self._lidar_proto.points = self._packer.pack(points, transform)
 
     def get(self) -> sensor_model_pb2.SensorOutput.LidarCloud:
-        return self._lidar_proto
\ No newline at end of file
+        return self._lidar_proto
+
+    def cache_token(self) -> str:
+        return f"{super().cache_token()}/{self._reduction}"
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import unittest
+
+import mock_lidar_channel_handler
+import numpy as np
+
+
+def unpack(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype="<f4", offset=mock_lidar_channel_handler.HEADER_SIZE).reshape(
+        -1, mock_lidar_channel_handler.NUM_FIELDS
+    )
+
+
+class LidarPointPackerTest(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = np.random.default_rng(0)
+        self.points = rng.normal(size=(100, 4)) * 20
+        # A quarter turn about z and a translation.
+        self.transform = np.array(
+            [[0.0, -1.0, 0.0, 5.0], [1.0, 0.0, 0.0, -2.0], [0.0, 0.0, 1.0, 0.5]]
+        )
+
+    def test_left_handed_frame(self) -> None:
+        fields = unpack(mock_lidar_channel_handler.LidarPointPacker().pack(self.points))
+        x, y, z, intensity = self.points.T
+        np.testing.assert_allclose(fields[:, :4], np.stack([-y, -x, z, intensity], -1), rtol=1e-6)
+        np.testing.assert_array_equal(fields[:, 4:], 0)
+
+    def test_transform_fused_with_frame_conversion(self) -> None:
+        packer = mock_lidar_channel_handler.LidarPointPacker()
+        fields = unpack(packer.pack(self.points, self.transform))
+
+        transformed = self.points.copy()
+        transformed[:, :3] = self.points[:, :3] @ self.transform[:, :3].T + self.transform[:, 3]
+        expected = unpack(mock_lidar_channel_handler.LidarPointPacker().pack(transformed))
+        np.testing.assert_allclose(fields, expected, rtol=1e-5, atol=1e-4)
+        # Transforming first, as for reduced clouds, gives the same result.
+        np.testing.assert_allclose(
+            mock_lidar_channel_handler.transform_points(self.points, self.transform),
+            transformed,
+            rtol=1e-5,
+            atol=1e-4,
+        )
+
+    def test_reuses_buffer_across_sizes(self) -> None:
+        packer = mock_lidar_channel_handler.LidarPointPacker()
+        for num_points in (100, 10, 50):
+            fields = unpack(packer.pack(self.points[:num_points]))
+            self.assertEqual(fields.shape, (num_points, mock_lidar_channel_handler.NUM_FIELDS))
+            np.testing.assert_allclose(fields[:, 2], self.points[:num_points, 2], rtol=1e-6)
+
+
+if __name__ == "__main__":
+    unittest.main()
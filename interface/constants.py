@@ -4,9 +4,22 @@ CAMERA_CHANNEL = "camera_0"
 POSE_CHANNEL = "simian_pose"
 LIDAR_CHANNEL = "lidar_0"
 
+# The PandaSet cameras, in the order of their channels camera_0 ... camera_5.
+PANDASET_CAMERAS = [
+    "front_camera",
+    "front_left_camera",
+    "front_right_camera",
+    "left_camera",
+    "right_camera",
+    "back_camera",
+]
+CAMERA_CHANNELS = [f"camera_{i}" for i in range(len(PANDASET_CAMERAS))]
+
 MOCK_POSE_TOPIC = "mock_topic"
 MOCK_CAMERA_TOPIC = "mock_camera_topic"
 MOCK_LIDAR_TOPIC = "mock_lidar_topic"
+# Topics of the multi-camera reader, one per PandaSet camera.
+CAMERA_TOPICS = [f"{MOCK_CAMERA_TOPIC}/{camera}" for camera in PANDASET_CAMERAS]
 
 PERIOD_SECONDS = 0.1
 
@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+import collections
+import queue
+import threading
 import typing
 
 from simian.public.proto import common_pb2
@@ -33,23 +36,123 @@ class DataSender:
 class FakeDataSender(DataSender):
     """
     For use in testing.
+
+    Counts the messages sent by kind. With `quiet`, messages are dropped instead of
+    printed, which keeps benchmarks from measuring the printing.
+    """
+
+    def __init__(self, quiet: bool = False) -> None:
+        self._quiet = quiet
+        self.counts: collections.Counter[str] = collections.Counter()
+
+    def send_data_point(self, datapoint: common_pb2.DataPoint) -> None:
+        """send custom data points as common_pb2.DataPoint to ADP"""
+        self.counts["data_point"] += 1
+        if not self._quiet:
+            print("Sending data point", datapoint)
+
+    def send_drawing(self, drawing: drawing_pb2.Drawing) -> None:
+        """send a drawing proto as drawing_pb2.Drawing to ADP"""
+        self.counts["drawing"] += 1
+        if not self._quiet:
+            print("Sending drawing", drawing)
+
+    def send_timestamped_struct(self, timestamped_struct: common_pb2.TimestampedStruct) -> None:
+        """send a timestamped struct proto as common_pb2.TimestampedStruct to ADP"""
+        self.counts["timestamped_struct"] += 1
+        if not self._quiet:
+            print("Sending timestamped struct", timestamped_struct)
+
+    def send_log_custom_field(self, datapoint: common_pb2.CustomField) -> None:
+        """send custom log custom points to ADP"""
+        self.counts["log_custom_field"] += 1
+        if not self._quiet:
+            print("Sending log custom points", datapoint)
+
+
+# Marks the end of the queue of an AsyncDataSender.
+_STOP = object()
+
+
+class AsyncDataSender(DataSender):
+    """Queues outgoing messages and sends them one at a time through `data_sender` from a
+    background thread, so the conversion does not wait on each send.
+
+    The DataSender API has no call that sends several messages at once, so every message
+    is still a separate call to `data_sender`, but made from the background thread. While
+    it runs, that thread is the only one calling `data_sender`, and the calls never overlap,
+    just as when the conversion thread made them. The interface's send methods are not
+    called concurrently, but they are called from another thread than the RPC that queued
+    the message.
+
+    Messages are sent in the order they were queued. The queue holds at most
+    `max_queued_messages`, after which senders block until there is room again. An error
+    raised by a send is raised again by the next `flush` or `close`.
     """
 
-    def __init__(self) -> None:
-        pass
+    def __init__(self, data_sender: DataSender, max_queued_messages: int = 4096) -> None:
+        self._data_sender = data_sender
+        self._queue: queue.Queue[typing.Any] = queue.Queue(maxsize=max_queued_messages)
+        self._error: typing.Optional[BaseException] = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="async_data_sender", daemon=True)
+        self._thread.start()
 
     def send_data_point(self, datapoint: common_pb2.DataPoint) -> None:
         """send custom data points as common_pb2.DataPoint to ADP"""
-        print("Sending data point", datapoint)
+        self._put(self._data_sender.send_data_point, datapoint)
 
     def send_drawing(self, drawing: drawing_pb2.Drawing) -> None:
         """send a drawing proto as drawing_pb2.Drawing to ADP"""
-        print("Sending drawing", drawing)
+        self._put(self._data_sender.send_drawing, drawing)
 
     def send_timestamped_struct(self, timestamped_struct: common_pb2.TimestampedStruct) -> None:
         """send a timestamped struct proto as common_pb2.TimestampedStruct to ADP"""
-        print("Sending timestamped struct", timestamped_struct)
+        self._put(self._data_sender.send_timestamped_struct, timestamped_struct)
 
     def send_log_custom_field(self, datapoint: common_pb2.CustomField) -> None:
         """send custom log custom points to ADP"""
-        print("Sending log custom points", datapoint)
+        self._put(self._data_sender.send_log_custom_field, datapoint)
+
+    @property
+    def data_sender(self) -> DataSender:
+        """The sender messages are forwarded to."""
+        return self._data_sender
+
+    def flush(self) -> None:
+        """Blocks until every queued message has been sent."""
+        self._queue.join()
+        self._raise_error()
+
+    def close(self) -> None:
+        """Sends the queued messages and stops the background thread."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_STOP)
+            self._thread.join()
+        self._raise_error()
+
+    def _put(self, send: typing.Callable[[typing.Any], None], message: typing.Any) -> None:
+        if self._closed:
+            raise RuntimeError("Data sender is closed")
+        self._queue.put((send, message))
+
+    def _raise_error(self) -> None:
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                return
+            send, message = item
+            try:
+                send(message)
+            except Exception as e:
+                # Keep draining the queue so senders never block on a failed send.
+                if self._error is None:
+                    self._error = e
+            self._queue.task_done()
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import threading
+import unittest
+
+import data_sender
+
+from simian.public.proto import common_pb2
+
+
+class RecordingDataSender(data_sender.FakeDataSender):
+    def __init__(self) -> None:
+        super().__init__(quiet=True)
+        self.data_points: list[str] = []
+        self.sent = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def send_data_point(self, datapoint: common_pb2.DataPoint) -> None:
+        self.release.wait()
+        if datapoint.name == "fail":
+            raise ValueError("send failed")
+        self.data_points.append(datapoint.name)
+        self.sent.set()
+
+
+class AsyncDataSenderTest(unittest.TestCase):
+    def test_sends_in_order(self) -> None:
+        recorder = RecordingDataSender()
+        sender = data_sender.AsyncDataSender(recorder)
+        names = [str(i) for i in range(10)]
+        for name in names:
+            sender.send_data_point(common_pb2.DataPoint(name=name))
+        sender.flush()
+        self.assertEqual(recorder.data_points, names)
+
+        sender.send_data_point(common_pb2.DataPoint(name="last"))
+        sender.close()
+        self.assertEqual(recorder.data_points, [*names, "last"])
+        with self.assertRaises(RuntimeError):
+            sender.send_data_point(common_pb2.DataPoint(name="closed"))
+
+    def test_sends_without_flush(self) -> None:
+        recorder = RecordingDataSender()
+        sender = data_sender.AsyncDataSender(recorder)
+        sender.send_data_point(common_pb2.DataPoint(name="0"))
+        self.assertTrue(recorder.sent.wait(timeout=5))
+        sender.close()
+
+    def test_bounded_queue_blocks_senders(self) -> None:
+        recorder = RecordingDataSender()
+        recorder.release.clear()
+        sender = data_sender.AsyncDataSender(recorder, max_queued_messages=1)
+        # One message is taken by the stalled background thread and one fills the queue.
+        sender.send_data_point(common_pb2.DataPoint(name="0"))
+        sender.send_data_point(common_pb2.DataPoint(name="1"))
+        blocked = threading.Thread(
+            target=sender.send_data_point, args=(common_pb2.DataPoint(name="2"),)
+        )
+        blocked.start()
+        blocked.join(timeout=0.2)
+        self.assertTrue(blocked.is_alive())
+
+        recorder.release.set()
+        blocked.join(timeout=5)
+        sender.close()
+        self.assertEqual(recorder.data_points, ["0", "1", "2"])
+
+    def test_raises_send_errors_on_flush(self) -> None:
+        recorder = RecordingDataSender()
+        sender = data_sender.AsyncDataSender(recorder)
+        sender.send_data_point(common_pb2.DataPoint(name="fail"))
+        sender.send_data_point(common_pb2.DataPoint(name="0"))
+        with self.assertRaises(ValueError):
+            sender.flush()
+        sender.close()
+        self.assertEqual(recorder.data_points, ["0"])
+
+
+if __name__ == "__main__":
+    unittest.main()
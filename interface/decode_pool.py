@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import concurrent.futures
+import mmap
+import multiprocessing
+import os
+import tempfile
+import typing
+
+from log_readers import lidar_decode
+import numpy as np
+
+# Decoded frames are handed back from the workers through files in this directory, which
+# is a tmpfs on Linux, so the data never goes through the pool's pipe.
+SHARED_MEMORY_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+_SHARED_FILE_PREFIX = "decode_pool_"
+
+T = typing.TypeVar("T")
+
+
+class SharedArray(typing.NamedTuple):
+    """An array a worker wrote to shared memory, to be attached by the parent process."""
+
+    path: str
+    shape: tuple[int, ...]
+    dtype: str
+
+
+def _export(array: np.ndarray) -> SharedArray:
+    array = np.ascontiguousarray(array)
+    fd, path = tempfile.mkstemp(prefix=_SHARED_FILE_PREFIX, dir=SHARED_MEMORY_DIR)
+    shared = SharedArray(path, array.shape, array.dtype.str)
+    try:
+        with open(fd, "wb") as f:
+            f.write(array.data.cast("B"))
+    except BaseException:
+        _discard(shared)
+        raise
+    return shared
+
+
+def _discard(shared: typing.Any) -> None:
+    """Unlinks the files of the exported arrays in `shared`, a SharedArray or a tuple that
+    may contain some, whose data will not be attached."""
+    if isinstance(shared, SharedArray):
+        try:
+            os.unlink(shared.path)
+        except FileNotFoundError:
+            pass
+    elif isinstance(shared, tuple):
+        for item in shared:
+            _discard(item)
+
+
+def _attach(shared: SharedArray) -> np.ndarray:
+    """Maps an exported array into this process. The file is unlinked right away, the
+    memory is released together with the returned array."""
+    try:
+        with open(shared.path, "r+b") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return np.zeros(shared.shape, dtype=shared.dtype)
+            buffer = mmap.mmap(f.fileno(), 0)
+    finally:
+        os.unlink(shared.path)
+    return np.frombuffer(buffer, dtype=shared.dtype).reshape(shared.shape)
+
+
+def _discard_result(future: concurrent.futures.Future[typing.Any]) -> None:
+    if not future.cancelled() and future.exception() is None:
+        _discard(future.result())
+
+
+def _decode_jpeg_worker(data: bytes, encode: bool) -> tuple[SharedArray, typing.Optional[SharedArray]]:
+    # Only the workers that decode images load OpenCV.
+    import cv2
+
+    arr = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if arr is None:
+        raise ValueError("Failed to decode image data")
+    encoded = _export(cv2.imencode(".jpg", arr)[1]) if encode else None
+    try:
+        return _export(arr), encoded
+    except BaseException:
+        _discard(encoded)
+        raise
+
+
+def _decode_pickled_cloud_worker(data: bytes) -> SharedArray:
+    return _export(lidar_decode.decode_pickled_cloud(data))
+
+
+class DecodePool:
+    """Runs the CPU-heavy frame decode and encode stages on a pool of worker processes.
+
+    Calls block until their frame is done, so concurrency comes from calling them from
+    several threads, such as the readers' read-ahead threads. Results come back in
+    whatever order the callers consume them, which keeps every reader in frame order.
+    """
+
+    def __init__(self, workers: int) -> None:
+        # Forking a process that runs the gRPC server is unsafe, so workers are spawned.
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def decode_jpeg(self, data: typing.Any, encode: bool) -> tuple[np.ndarray, typing.Optional[bytes]]:
+        """Decodes a JPEG. With `encode`, also returns the decoded image re-encoded as JPEG,
+        as the camera channel handler would produce it."""
+        shared_arr, shared_encoded = self._run(_decode_jpeg_worker, bytes(data), encode)
+        try:
+            arr = _attach(shared_arr)
+        except BaseException:
+            _discard(shared_encoded)
+            raise
+        encoded = _attach(shared_encoded).tobytes() if shared_encoded is not None else None
+        return arr, encoded
+
+    def decode_pickled_cloud(self, data: typing.Any) -> np.ndarray:
+        return _attach(self._run(_decode_pickled_cloud_worker, bytes(data)))
+
+    def _run(self, function: typing.Callable[..., T], *args: typing.Any) -> T:
+        future = self._executor.submit(function, *args)
+        try:
+            return future.result()
+        except BaseException:
+            # The result will not be attached, for instance because the caller was
+            # interrupted, so the files of a worker that still finishes are unlinked then.
+            future.add_done_callback(_discard_result)
+            raise
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import concurrent.futures
+import gzip
+import os
+import pickle
+import unittest
+
+import cv2
+import decode_pool
+from log_readers import lidar_decode
+import numpy as np
+import pandas as pd
+
+NUM_FRAMES = 6
+
+
+def _shared_files() -> set[str]:
+    return {
+        name
+        for name in os.listdir(decode_pool.SHARED_MEMORY_DIR)
+        if name.startswith(decode_pool._SHARED_FILE_PREFIX)
+    }
+
+
+class DecodePoolTest(unittest.TestCase):
+    _pool: decode_pool.DecodePool
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls._pool = decode_pool.DecodePool(workers=2)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls._pool.close()
+
+    def setUp(self) -> None:
+        self._files_before = _shared_files()
+        rng = np.random.default_rng(0)
+        # Flat images, which JPEG encodes without loss.
+        self._images = [np.full((16, 24, 3), 10 * i, dtype=np.uint8) for i in range(NUM_FRAMES)]
+        self._jpegs = [cv2.imencode(".jpg", image)[1].tobytes() for image in self._images]
+        self._clouds = [rng.normal(size=(50 + i, 4)) for i in range(NUM_FRAMES)]
+        self._pickled_clouds = [
+            gzip.compress(pickle.dumps(pd.DataFrame(cloud, columns=["x", "y", "z", "i"])))
+            for cloud in self._clouds
+        ]
+
+    def tearDown(self) -> None:
+        # Every file a worker wrote was unlinked once attached or discarded.
+        self.assertEqual(_shared_files(), self._files_before)
+
+    def test_decode_jpeg_in_order(self) -> None:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(
+                executor.map(lambda data: self._pool.decode_jpeg(data, encode=True), self._jpegs)
+            )
+        for image, (arr, encoded) in zip(self._images, results):
+            np.testing.assert_array_equal(arr, image)
+            assert encoded is not None
+            np.testing.assert_array_equal(
+                cv2.imdecode(np.frombuffer(encoded, np.uint8), cv2.IMREAD_COLOR), image
+            )
+        arr, encoded = self._pool.decode_jpeg(self._jpegs[0], encode=False)
+        self.assertIsNone(encoded)
+
+    def test_decode_pickled_clouds_in_order(self) -> None:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+            points = list(executor.map(self._pool.decode_pickled_cloud, self._pickled_clouds))
+        for cloud, decoded in zip(self._clouds, points):
+            np.testing.assert_array_equal(decoded, cloud)
+        np.testing.assert_array_equal(
+            lidar_decode.decode_pickled_cloud(self._pickled_clouds[0]), self._clouds[0]
+        )
+
+    def test_failed_decode(self) -> None:
+        with self.assertRaises(ValueError):
+            self._pool.decode_jpeg(b"not a jpeg", encode=True)
+
+    def test_discards_results_not_attached(self) -> None:
+        # The result of a call that stopped waiting for it, written after it stopped.
+        future: concurrent.futures.Future[decode_pool.SharedArray] = concurrent.futures.Future()
+        future.set_result(decode_pool._export(self._images[0]))
+        self.assertNotEqual(_shared_files(), self._files_before)
+        decode_pool._discard_result(future)
+
+
+if __name__ == "__main__":
+    unittest.main()
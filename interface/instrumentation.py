@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+import typing
+
+from simian.public.proto import common_pb2
+
+if typing.TYPE_CHECKING:
+    import data_sender as data_sender_module
+
+# Latency histogram buckets are powers of two in microseconds, up to ~17 minutes.
+_NUM_BUCKETS = 31
+
+DEFAULT_PROGRESS_INTERVAL_SECONDS = 30.0
+
+
+class LatencyHistogram:
+    """Log2-bucketed latency histogram. Percentiles are reported as bucket upper bounds."""
+
+    def __init__(self) -> None:
+        self.buckets = [0] * _NUM_BUCKETS
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, seconds: float) -> None:
+        micros = int(seconds * 1e6)
+        self.buckets[min(micros.bit_length(), _NUM_BUCKETS - 1)] += 1
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def percentile_seconds(self, fraction: float) -> float:
+        threshold = fraction * self.count
+        seen = 0
+        for bucket, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if bucket_count and seen >= threshold:
+                return min((1 << bucket) / 1e6, self.max_seconds)
+        return self.max_seconds
+
+    def summary(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "total_ms": self.total_seconds * 1e3,
+            "mean_ms": self.total_seconds * 1e3 / self.count if self.count else 0.0,
+            "p50_ms": self.percentile_seconds(0.5) * 1e3,
+            "p99_ms": self.percentile_seconds(0.99) * 1e3,
+            "max_ms": self.max_seconds * 1e3,
+        }
+
+
+class _Timer:
+    __slots__ = ("_metrics", "_stage", "_start")
+
+    def __init__(self, metrics: Metrics, stage: str) -> None:
+        self._metrics = metrics
+        self._stage = stage
+        self._start = 0.0
+
+    def __enter__(self) -> None:
+        self._start = time.perf_counter()
+
+    def __exit__(self, *_exc_info: typing.Any) -> None:
+        self._metrics.record_latency(self._stage, time.perf_counter() - self._start)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *_exc_info: typing.Any) -> None:
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """Aggregates per-stage latencies and per-channel byte counters of a conversion, and
+    values reported once, such as the peak memory usage.
+
+    Stages are named `<stage>/<topic or channel>`, such as `fetch/mock_camera_topic` or
+    `update/camera_0`. Recording is thread safe, so read-ahead threads can record too.
+    """
+
+    enabled = True
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._latencies: dict[str, LatencyHistogram] = {}
+        self._bytes: dict[str, int] = {}
+        self._values: dict[str, float] = {}
+
+    def time(self, stage: str) -> typing.ContextManager[None]:
+        """Times the body of a `with` block as one sample of `stage`."""
+        return _Timer(self, stage)
+
+    def record_latency(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._latencies.get(stage)
+            if histogram is None:
+                histogram = self._latencies[stage] = LatencyHistogram()
+            histogram.record(seconds)
+
+    def add_bytes(self, counter: str, num_bytes: int) -> None:
+        with self._lock:
+            self._bytes[counter] = self._bytes.get(counter, 0) + num_bytes
+
+    def set_value(self, name: str, value: float) -> None:
+        with self._lock:
+            self._values[name] = value
+
+    def summary(self) -> dict[str, typing.Any]:
+        with self._lock:
+            return {
+                "latency": {
+                    stage: histogram.summary() for stage, histogram in sorted(self._latencies.items())
+                },
+                "bytes": dict(sorted(self._bytes.items())),
+                "values": dict(sorted(self._values.items())),
+            }
+
+    def publish(self, data_sender: data_sender_module.DataSender) -> None:
+        """Sends the aggregates to ADP as data points named `metrics/...`."""
+        summary = self.summary()
+        for stage, latency in summary["latency"].items():
+            for statistic, value in latency.items():
+                data_sender.send_data_point(
+                    common_pb2.DataPoint(name=f"metrics/{stage}/{statistic}", value=value)
+                )
+        for counter, num_bytes in summary["bytes"].items():
+            data_sender.send_data_point(
+                common_pb2.DataPoint(name=f"metrics/bytes/{counter}", value=num_bytes)
+            )
+        for name, value in summary["values"].items():
+            data_sender.send_data_point(common_pb2.DataPoint(name=f"metrics/{name}", value=value))
+
+    def write(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+
+class DisabledMetrics(Metrics):
+    """Metrics that record nothing, used when instrumentation is off."""
+
+    enabled = False
+
+    def time(self, _stage: str) -> typing.ContextManager[None]:
+        return _NULL_TIMER
+
+    def record_latency(self, stage: str, seconds: float) -> None:
+        pass
+
+    def add_bytes(self, counter: str, num_bytes: int) -> None:
+        pass
+
+    def set_value(self, name: str, value: float) -> None:
+        pass
+
+    def publish(self, data_sender: data_sender_module.DataSender) -> None:
+        pass
+
+
+def create_metrics(enabled: bool) -> Metrics:
+    return Metrics() if enabled else DisabledMetrics()
+
+
+class ProgressLog:
+    """Logs how many messages of a conversion were read and an estimate of the time left,
+    at most once per interval.
+
+    The total is known when the log is opened, so the estimate extrapolates the rate of the
+    messages read so far to the messages left.
+    """
+
+    def __init__(
+        self,
+        num_messages: int,
+        total_bytes: int = 0,
+        start_position: int = 0,
+        interval_seconds: float = DEFAULT_PROGRESS_INTERVAL_SECONDS,
+        clock: typing.Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._num_messages = num_messages
+        self._total_bytes = total_bytes
+        self._start_position = start_position
+        self._interval_seconds = interval_seconds
+        self._clock = clock
+        self._start_time = clock()
+        self._next_log_time = self._start_time + interval_seconds
+
+    def update(self, position: int) -> None:
+        """Called with the number of messages read so far, start position included."""
+        now = self._clock()
+        if now < self._next_log_time:
+            return
+        self._next_log_time = now + self._interval_seconds
+        eta_seconds = self.eta_seconds(position, now)
+        logging.info(
+            "Read %d of %d messages (%.0f%%, %.1f MB in total), %s left",
+            position,
+            self._num_messages,
+            100 * position / max(self._num_messages, 1),
+            self._total_bytes / 1e6,
+            f"about {eta_seconds:.0f}s" if eta_seconds is not None else "unknown time",
+        )
+
+    def eta_seconds(
+        self, position: int, now: typing.Optional[float] = None
+    ) -> typing.Optional[float]:
+        """Estimated seconds until every message is read, None before any was read."""
+        read_messages = position - self._start_position
+        if read_messages <= 0:
+            return None
+        elapsed_seconds = (self._clock() if now is None else now) - self._start_time
+        return elapsed_seconds / read_messages * max(self._num_messages - position, 0)
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import unittest
+
+import data_sender
+import instrumentation
+
+from simian.public.proto import common_pb2
+
+
+class _RecordingDataSender(data_sender.FakeDataSender):
+    def __init__(self) -> None:
+        super().__init__(quiet=True)
+        self.data_points: dict[str, float] = {}
+
+    def send_data_point(self, datapoint: common_pb2.DataPoint) -> None:
+        super().send_data_point(datapoint)
+        self.data_points[datapoint.name] = datapoint.value
+
+
+class LatencyHistogramTest(unittest.TestCase):
+    def test_buckets(self) -> None:
+        histogram = instrumentation.LatencyHistogram()
+        # Bucket N holds latencies of 2^(N-1) to 2^N - 1 microseconds.
+        for seconds in (0.0, 1e-6, 3e-6, 4e-6, 1e6):
+            histogram.record(seconds)
+        self.assertEqual(histogram.buckets[:4], [1, 1, 1, 1])
+        # Latencies past the last bucket are counted in it.
+        self.assertEqual(histogram.buckets[-1], 1)
+        self.assertEqual(histogram.count, 5)
+        self.assertEqual(sum(histogram.buckets), histogram.count)
+
+    def test_percentiles(self) -> None:
+        histogram = instrumentation.LatencyHistogram()
+        self.assertEqual(histogram.percentile_seconds(0.5), 0.0)
+        for _ in range(99):
+            histogram.record(100e-6)
+        histogram.record(0.1)
+        # Percentiles are the upper bounds of their buckets, 128us for 100us.
+        self.assertEqual(histogram.percentile_seconds(0.5), 128e-6)
+        self.assertEqual(histogram.percentile_seconds(0.99), 128e-6)
+        # The upper bound of the last bucket is capped at the largest latency.
+        self.assertEqual(histogram.percentile_seconds(1.0), 0.1)
+
+        summary = histogram.summary()
+        self.assertEqual(summary["count"], 100)
+        self.assertAlmostEqual(summary["total_ms"], 109.9)
+        self.assertAlmostEqual(summary["mean_ms"], 1.099)
+        self.assertAlmostEqual(summary["p50_ms"], 0.128)
+        self.assertAlmostEqual(summary["max_ms"], 100.0)
+
+    def test_empty_summary(self) -> None:
+        summary = instrumentation.LatencyHistogram().summary()
+        self.assertEqual(summary["count"], 0)
+        self.assertEqual(summary["mean_ms"], 0.0)
+
+
+class MetricsTest(unittest.TestCase):
+    def _record(self, metrics: instrumentation.Metrics) -> None:
+        with metrics.time("fetch/camera"):
+            pass
+        metrics.record_latency("update/camera", 0.002)
+        metrics.record_latency("update/camera", 0.004)
+        metrics.add_bytes("output/camera", 100)
+        metrics.add_bytes("output/camera", 50)
+        metrics.set_value("memory/peak_bytes", 1.0)
+        metrics.set_value("memory/peak_bytes", 2.0)
+
+    def test_summary(self) -> None:
+        metrics = instrumentation.create_metrics(True)
+        self.assertTrue(metrics.enabled)
+        self._record(metrics)
+
+        summary = metrics.summary()
+        self.assertEqual(list(summary["latency"]), ["fetch/camera", "update/camera"])
+        self.assertEqual(summary["latency"]["fetch/camera"]["count"], 1)
+        self.assertEqual(summary["latency"]["update/camera"]["count"], 2)
+        self.assertAlmostEqual(summary["latency"]["update/camera"]["max_ms"], 4.0)
+        self.assertEqual(summary["bytes"], {"output/camera": 150})
+        self.assertEqual(summary["values"], {"memory/peak_bytes": 2.0})
+
+    def test_publish(self) -> None:
+        metrics = instrumentation.create_metrics(True)
+        self._record(metrics)
+        sender = _RecordingDataSender()
+        metrics.publish(sender)
+
+        self.assertEqual(sender.data_points["metrics/update/camera/count"], 2)
+        self.assertAlmostEqual(sender.data_points["metrics/update/camera/total_ms"], 6.0)
+        self.assertEqual(sender.data_points["metrics/bytes/output/camera"], 150)
+        self.assertEqual(sender.data_points["metrics/memory/peak_bytes"], 2.0)
+        # One data point per statistic of each stage, and one per counter and value.
+        self.assertEqual(len(sender.data_points), 2 * 6 + 2)
+
+    def test_write(self) -> None:
+        metrics = instrumentation.create_metrics(True)
+        self._record(metrics)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "metrics.json")
+            metrics.write(path)
+            with open(path) as f:
+                self.assertEqual(json.load(f), metrics.summary())
+
+    def test_disabled(self) -> None:
+        metrics = instrumentation.create_metrics(False)
+        self.assertIsInstance(metrics, instrumentation.DisabledMetrics)
+        self.assertFalse(metrics.enabled)
+        self._record(metrics)
+
+        self.assertEqual(metrics.summary(), {"latency": {}, "bytes": {}, "values": {}})
+        sender = _RecordingDataSender()
+        metrics.publish(sender)
+        self.assertEqual(sender.data_points, {})
+
+
+class _FakeClock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class ProgressLogTest(unittest.TestCase):
+    def test_eta(self) -> None:
+        clock = _FakeClock()
+        progress = instrumentation.ProgressLog(100, start_position=20, clock=clock)
+        self.assertIsNone(progress.eta_seconds(20))
+        clock.now += 10.0
+        # 10 messages read in 10 seconds, 70 left.
+        self.assertAlmostEqual(progress.eta_seconds(30) or 0.0, 70.0)
+        self.assertAlmostEqual(progress.eta_seconds(30, now=clock.now + 10.0) or 0.0, 140.0)
+        self.assertEqual(progress.eta_seconds(120), 0.0)
+
+    def test_logs_once_per_interval(self) -> None:
+        clock = _FakeClock()
+        progress = instrumentation.ProgressLog(
+            200, total_bytes=5_000_000, interval_seconds=30.0, clock=clock
+        )
+        with self.assertLogs(level="INFO") as logs:
+            for seconds, position in ((0.0, 0), (29.0, 50), (1.0, 50), (29.0, 60), (1.0, 100)):
+                clock.now += seconds
+                progress.update(position)
+        self.assertEqual(
+            logs.output,
+            [
+                "INFO:root:Read 50 of 200 messages (25%, 5.0 MB in total), about 90s left",
+                "INFO:root:Read 100 of 200 messages (50%, 5.0 MB in total), about 60s left",
+            ],
+        )
+
+    def test_unknown_eta(self) -> None:
+        clock = _FakeClock()
+        progress = instrumentation.ProgressLog(0, interval_seconds=0.0, clock=clock)
+        with self.assertLogs(level="INFO") as logs:
+            progress.update(0)
+        self.assertEqual(
+            logs.output,
+            ["INFO:root:Read 0 of 0 messages (0%, 0.0 MB in total), unknown time left"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
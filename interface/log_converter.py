@@ -3,20 +3,33 @@
 from __future__ import annotations
 
 import datetime
-import heapq
+import functools
 import logging
 import mailbox
+import time
 import typing
 
+from channel_handlers import channel_handler_base
+from channel_handlers import lidar_reduction
 from channel_handlers import mock_camera_channel_handler
 from channel_handlers import mock_pose_channel_handler
 from channel_handlers import mock_lidar_channel_handler
 import constants
 import data_sender
+import decode_pool
 from google.protobuf import json_format
+import instrumentation
+import interface_errors
 from log_readers import mock_camera_reader
 from log_readers import mock_position_reader
 from log_readers import mock_lidar_reader
+from log_readers import multi_camera_reader
+from log_readers import scheduled_reader
+import memory_budget
+import message_timeline
+import output_cache
+import profiling
+import storage
 
 from simian.public import customer_stack_server
 from simian.public import stack_interface_v2
@@ -27,6 +40,66 @@ from strada.public.log_readers import log_reader_base
 DEFAULT_RATE = 10
 
 
+# Creates a log reader from the reader configuration. Log reader classes take the data
+# sender in addition to the configuration of the base class.
+_ReaderFactory = typing.Callable[
+    [dict[str, typing.Any], data_sender.DataSender], scheduled_reader.ScheduledLogReader
+]
+
+
+class _ChannelSource(typing.NamedTuple):
+    """The log reader a channel is read from and the channel handler that converts it."""
+
+    topic: str
+    # Channels with the same reader class share one reader.
+    reader_class: _ReaderFactory
+    handler_factory: typing.Callable[
+        [data_sender.DataSender, mailbox.Mailbox, dict[str, typing.Any]],
+        channel_handler_base.ChannelHandlerBase,
+    ]
+
+
+CHANNEL_SOURCES = {
+    constants.CAMERA_CHANNEL: _ChannelSource(
+        constants.MOCK_CAMERA_TOPIC,
+        mock_camera_reader.MockCameraReader,
+        mock_camera_channel_handler.MockCameraChannelHandler,
+    ),
+    constants.POSE_CHANNEL: _ChannelSource(
+        constants.MOCK_POSE_TOPIC,
+        mock_position_reader.MockPositionReader,
+        mock_pose_channel_handler.MockPoseChannelHandler,
+    ),
+    constants.LIDAR_CHANNEL: _ChannelSource(
+        constants.MOCK_LIDAR_TOPIC,
+        mock_lidar_reader.MockLidarReader,
+        mock_lidar_channel_handler.MockLidarChannelHandler,
+    ),
+}
+
+# With the `multi_camera` option, the channels of all six PandaSet cameras are read by one
+# reader that fetches the cameras of a frame concurrently.
+MULTI_CAMERA_CHANNEL_SOURCES = {
+    **{
+        channel: _ChannelSource(
+            topic,
+            multi_camera_reader.MultiCameraReader,
+            functools.partial(mock_camera_channel_handler.MockCameraChannelHandler, topic=topic),
+        )
+        for channel, topic in zip(constants.CAMERA_CHANNELS, constants.CAMERA_TOPICS)
+    },
+    constants.POSE_CHANNEL: CHANNEL_SOURCES[constants.POSE_CHANNEL],
+    constants.LIDAR_CHANNEL: CHANNEL_SOURCES[constants.LIDAR_CHANNEL],
+}
+
+
+def _parse_bool(value: typing.Any) -> bool:
+    """Parses a boolean option from the scenario extra data, where it may be a string."""
+    if isinstance(value, str):
+        return value.lower() in ("1", "true", "yes")
+    return bool(value)
+
+
 class DataExplorerInterface(stack_interface_v2.StackInterfaceV2):
     """Implements the interface class
     The necessary methods are:
@@ -38,21 +111,58 @@ class DataExplorerInterface(stack_interface_v2.StackInterfaceV2):
         * log_close
     """
 
-    def __init__(self, proc_handler: typing.Any) -> None:
+    def __init__(
+        self,
+        proc_handler: typing.Any,
+        data_sender_override: typing.Optional[data_sender.DataSender] = None,
+    ) -> None:
         super().__init__(proc_handler)
 
         # This will be populated with the channel names
         # that are requested by ADP as part of the log conversion
         # AFTER set_startup_options_v2_1 is called.
         self._channel_names: list[str] = []
+        # Scenario extra data parsed from the startup options. Used to configure the conversion.
+        self._extra_data: dict[str, typing.Any] = {}
 
-        self._data_sender = data_sender.DataSender(self)
+        # Tests and benchmarks can pass a sender that does not need a running simulator.
+        self._data_sender = data_sender_override or data_sender.DataSender(self)
+        # Wraps the data sender while a conversion runs with `async_data_sender`.
+        self._async_data_sender: typing.Optional[data_sender.AsyncDataSender] = None
         self._unprocessed_message = None
+        self._coalesce_reads = False
 
         # Store earliest log startime seen.
         self._earliest_log_dt = datetime.datetime.max.replace(tzinfo=datetime.timezone.utc)
 
+        self._memory_budget = memory_budget.MemoryBudget()
         self._mailbox = mailbox.Mailbox()
+        # Channel of each topic read, for the channels requested by ADP.
+        self._topic_channels: dict[str, str] = {}
+        self._channel_handlers: dict[str, channel_handler_base.ChannelHandlerBase] = {}
+        # Channels whose latest message has not been converted yet. Conversion is deferred
+        # until convert_to_simian asks for the channel, and runs at most once per message.
+        self._unconverted_channels: set[str] = set()
+        self._channel_topics: dict[str, str] = {}
+        self._message_times: dict[str, datetime.datetime] = {}
+
+        # Converted outputs persisted across conversions, enabled with `output_cache_dir`.
+        self._output_cache: typing.Optional[output_cache.OutputCache] = None
+        self._log_path = ""
+        self._storage_uri = ""
+
+        # Per-stage timings and byte counters, enabled with `instrumentation` or `metrics_file`.
+        self._metrics: instrumentation.Metrics = instrumentation.DisabledMetrics()
+        self._metrics_file: typing.Optional[str] = None
+        # CPU and memory profile of the conversion, enabled with `profile` or `profile_memory`.
+        self._profiler: profiling.Profiler = profiling.DisabledProfiler()
+
+        # Startup time is reported from here to the end of the first log_open.
+        self._created_time = time.perf_counter()
+        self._opened_log = False
+
+        # Logs the progress of the conversion and the time left, once the log is opened.
+        self._progress_log: typing.Optional[instrumentation.ProgressLog] = None
 
     def get_default_rate(self, _channel: str) -> int:
         """Returns the default channel rate (in this case 10Hz)"""
@@ -60,11 +170,18 @@ class DataExplorerInterface(stack_interface_v2.StackInterfaceV2):
 
     def convert_to_simian(self, channel: io_pb2.Channel) -> typing.Any:
         """Returns data for the specified channel at this time in ADP format"""
-        return self._mailbox.latest_outputs.get(channel.name)
+        if channel.name in self._unconverted_channels:
+            self._unconverted_channels.discard(channel.name)
+            with self._profiler.active():
+                self._populate(channel.name, self._channel_handlers[channel.name])
+        return self._mailbox.latest_output(channel.name)
 
     def convert_to_simian_free(self, channel: str) -> None:
         """Optionally frees any data returned by convert_to_simian"""
-        pass
+        if self._mailbox.release_output(channel):
+            # The message stays in the mailbox, so asking for the channel again converts it
+            # again instead of returning nothing.
+            self._unconverted_channels.add(channel)
 
     def set_startup_options_v2_1(self, startup_options: io_pb2.InterfaceStartupOptions) -> None:
         channels = startup_options.channel_setup.all_channels
@@ -73,45 +190,155 @@ class DataExplorerInterface(stack_interface_v2.StackInterfaceV2):
         options = json_format.MessageToDict(startup_options)
         logging.warning(f"In set startup {options}")  # noqa: G004
         self._extra_data = options.get("scenarioExtraData", {})
+        # Creates the storage client while ADP prepares the log, instead of in log_open.
+        storage.warm_up(self._extra_data)
 
     def log_open_v2_2(self, log_open_options: io_pb2.LogOpenOptions) -> io_pb2.LogOpenOutput:
         """Called once at the start of the conversion. Does all the work necessary to prepare
         for the conversion, including opening files, querying the DBs, and downloading data.
         The drive start time is returned in the output.
         """
-
-        # Add any additional information here to initialize the
-        # log readers with the right configuration based on the drive configuration
-        # parameters or the scenario extra data.
-        reader_configuration = {"channel_names": self._channel_names}
-
-        # Initialize the log readers.
-        self._log_readers: list[log_reader_base.LogReaderBase] = [
-            mock_camera_reader.MockCameraReader(reader_configuration, self._data_sender),
-            mock_position_reader.MockPositionReader(reader_configuration, self._data_sender),
-            mock_lidar_reader.MockLidarReader(reader_configuration, self._data_sender),
-        ]
-
-        self._pose_handler = mock_pose_channel_handler.MockPoseChannelHandler(
-            self._data_sender, self._mailbox
+        # Profiles the conversion from here to the end of log_close, written to per-log
+        # files in `profile_dir`.
+        profile_mode = self._extra_data.get("profile") or None
+        self._profiler = profiling.create_profiler(
+            profiling.ProfileOptions(
+                mode=str(profile_mode).lower() if profile_mode is not None else None,
+                memory=_parse_bool(self._extra_data.get("profile_memory", False)),
+                directory=self._extra_data.get("profile_dir", profiling.DEFAULT_DIRECTORY),
+                top_n=int(self._extra_data.get("profile_top_n", profiling.DEFAULT_TOP_N)),
+                snapshot_interval_seconds=float(
+                    self._extra_data.get(
+                        "profile_snapshot_interval_seconds",
+                        profiling.DEFAULT_SNAPSHOT_INTERVAL_SECONDS,
+                    )
+                ),
+                sample_interval_seconds=float(
+                    self._extra_data.get(
+                        "profile_sample_interval_seconds",
+                        profiling.DEFAULT_SAMPLE_INTERVAL_SECONDS,
+                    )
+                ),
+            ),
+            log_open_options.path,
         )
-        self._camera_handler = mock_camera_channel_handler.MockCameraChannelHandler(
-            self._data_sender, self._mailbox
+        self._profiler.start()
+        open_start = time.perf_counter()
+        with self._profiler.active():
+            log_open_output = self._open_log(log_open_options)
+        self._report_startup(time.perf_counter() - open_start)
+        return log_open_output
+
+    def _open_log(self, log_open_options: io_pb2.LogOpenOptions) -> io_pb2.LogOpenOutput:
+
+        # Send the data points, drawings and structs of the readers and handlers from a
+        # background thread.
+        if _parse_bool(self._extra_data.get("async_data_sender", False)):
+            self._async_data_sender = data_sender.AsyncDataSender(self._data_sender)
+            self._data_sender = self._async_data_sender
+
+        # Number of messages of each topic the channel handlers can look back at.
+        messages_per_topic = self._extra_data.get(
+            "mailbox_messages_per_topic", mailbox.DEFAULT_MESSAGES_PER_TOPIC
         )
-        self._lidar_handler = mock_lidar_channel_handler.MockLidarChannelHandler(
-            self._data_sender, self._mailbox
+        # Memory held by prefetched frames and by the mailbox, limited with
+        # `memory_budget_bytes`. The peak usage is reported when the log is closed.
+        self._memory_budget = memory_budget.MemoryBudget(
+            int(self._extra_data.get("memory_budget_bytes", memory_budget.UNLIMITED))
         )
+        self._mailbox = mailbox.Mailbox(int(messages_per_topic), self._memory_budget)
+
+        self._log_path = log_open_options.path
+        # Selected with the `storage` key of the scenario extra data.
+        log_storage = storage.create_storage(self._extra_data)
+        self._storage_uri = log_storage.uri
+        self._output_cache = None
+        if self._extra_data.get("output_cache_dir"):
+            max_bytes = self._extra_data.get(
+                "output_cache_max_bytes", output_cache.DEFAULT_MAX_BYTES
+            )
+            self._output_cache = output_cache.OutputCache(
+                self._extra_data["output_cache_dir"], int(max_bytes)
+            )
+
+        # Drain all messages up to the requested offset in one log_read_v2_1 call.
+        self._coalesce_reads = _parse_bool(self._extra_data.get("coalesce_reads", False))
 
-        # Create a multi log reader which will combine messages
-        # from all the log readers, organized by earliest timestamp.
+        self._metrics_file = self._extra_data.get("metrics_file")
+        self._metrics = instrumentation.create_metrics(
+            _parse_bool(self._extra_data.get("instrumentation", False)) or bool(self._metrics_file)
+        )
 
-        # NOTE: A heapq can be slow. If you only have one log reader, you
-        # can remove this. If conversion performance is slow, consider
-        # using alternative methods to decide which messages to send back to
-        # ADP first.
-        self._multi_log_reader = heapq.merge(
-            *self._log_readers, key=lambda log_read_type: log_read_type.epoch_timestamp
+        # Add any additional information here to initialize the
+        # log readers with the right configuration based on the drive configuration
+        # parameters or the scenario extra data.
+        reader_configuration = {
+            "channel_names": self._channel_names,
+            # Shared by all readers.
+            "storage": log_storage,
+            # Number of camera/lidar frames each reader fetches ahead of the conversion.
+            "read_ahead_frames": int(self._extra_data.get("read_ahead_frames", 0)),
+            # `pickle` (per-frame PandaSet clouds) or `packed` (log_readers/pack_lidar_sequence.py).
+            "lidar_format": self._extra_data.get("lidar_format", "pickle"),
+            # Forward camera JPEGs as-is instead of decoding and re-encoding them.
+            "camera_passthrough": _parse_bool(self._extra_data.get("camera_passthrough", False)),
+            # Only read every Nth lidar frame, for preview conversions.
+            "lidar_frame_step": int(self._extra_data.get("lidar_frame_step", 1)),
+            "decode_pool": None,
+            "metrics": self._metrics,
+            "memory_budget": self._memory_budget,
+            # Readers return cached outputs instead of downloading their frames.
+            "lookup_cached_output": (
+                self._lookup_cached_output if self._output_cache is not None else None
+            ),
+        }
+
+        # Configuration of the channel handlers, from the scenario extra data.
+        handler_configuration = {
+            "camera_passthrough": reader_configuration["camera_passthrough"],
+            # Voxel-grid downsampling and range/ROI cropping of lidar clouds.
+            "lidar_reduction": lidar_reduction.LidarReduction.from_extra_data(self._extra_data),
+        }
+
+        # Worker processes for JPEG and lidar decoding. Frames are decoded concurrently when
+        # combined with read_ahead_frames, otherwise the pool only moves the work off this thread.
+        self._decode_pool: typing.Optional[decode_pool.DecodePool] = None
+        decode_workers = int(self._extra_data.get("decode_workers", 0))
+        if decode_workers > 0:
+            self._decode_pool = decode_pool.DecodePool(decode_workers)
+            reader_configuration["decode_pool"] = self._decode_pool
+
+        # Initialize the log readers and channel handlers of the requested channels only, so
+        # unrequested channels are never downloaded or converted. All channels are converted
+        # when ADP does not list any.
+        channel_sources = (
+            MULTI_CAMERA_CHANNEL_SOURCES
+            if _parse_bool(self._extra_data.get("multi_camera", False))
+            else CHANNEL_SOURCES
         )
+        requested_channels = [
+            channel
+            for channel in channel_sources
+            if not self._channel_names or channel in self._channel_names
+        ]
+        if not requested_channels:
+            raise interface_errors.InterfaceImplementationError(
+                f"None of the requested channels {self._channel_names} are provided by this "
+                f"interface. Supported channels: {list(channel_sources)}"
+            )
+        log_readers: dict[_ReaderFactory, scheduled_reader.ScheduledLogReader] = {}
+        for channel in requested_channels:
+            source = channel_sources[channel]
+            if source.reader_class not in log_readers:
+                log_readers[source.reader_class] = source.reader_class(
+                    reader_configuration, self._data_sender
+                )
+            self._topic_channels[source.topic] = channel
+            self._channel_topics[channel] = source.topic
+            self._channel_handlers[channel] = source.handler_factory(
+                self._data_sender, self._mailbox, handler_configuration
+            )
+        self._log_readers: list[scheduled_reader.ScheduledLogReader] = list(log_readers.values())
 
         output = io_pb2.LogOpenOutput()
         for log_reader in self._log_readers:
@@ -124,6 +351,46 @@ class DataExplorerInterface(stack_interface_v2.StackInterfaceV2):
             if log_start_datetime < self._earliest_log_dt:
                 self._earliest_log_dt = log_start_datetime
 
+        # Create a multi log reader which will combine messages from all the log readers,
+        # organized by earliest timestamp. Every reader knows the timestamps of all its
+        # messages once opened, so the order is computed once up front.
+        self._timeline = message_timeline.MessageTimeline(
+            [log_reader.timestamps_ns() for log_reader in self._log_readers]
+        )
+        self._multi_log_reader = message_timeline.MergedLogReader(
+            self._log_readers, self._timeline, self._metrics
+        )
+        # The readers list their frames when opened, so the size of the download is known
+        # before any frame is read.
+        total_bytes = sum(log_reader.total_bytes() for log_reader in self._log_readers)
+        logging.info(
+            "Scheduled %d messages (per reader: %s), %d bytes to download",
+            len(self._timeline),
+            self._timeline.message_counts,
+            total_bytes,
+        )
+        self._metrics.set_value("log/num_messages", len(self._timeline))
+        self._metrics.set_value("log/total_bytes", total_bytes)
+
+        # Optionally start the conversion part way into the log. The messages before the start
+        # are skipped without being read, and offsets are relative to the new start.
+        start_offset = datetime.timedelta(
+            seconds=float(self._extra_data.get("start_offset_seconds", 0))
+        )
+        if start_offset:
+            self._earliest_log_dt += start_offset
+            self._multi_log_reader.seek(scheduled_reader.datetime_to_ns(self._earliest_log_dt))
+        self._progress_log = instrumentation.ProgressLog(
+            len(self._timeline),
+            total_bytes,
+            start_position=self._multi_log_reader.position,
+            interval_seconds=float(
+                self._extra_data.get(
+                    "progress_interval_seconds", instrumentation.DEFAULT_PROGRESS_INTERVAL_SECONDS
+                )
+            ),
+        )
+
         output.start_timestamp.FromDatetime(self._earliest_log_dt)
         return output
 
@@ -131,7 +398,12 @@ class DataExplorerInterface(stack_interface_v2.StackInterfaceV2):
         """Called repeatedly until all of the data has been read (or we have reached the
         max duration specified in the Drive Conversion modal).
         """
-        target_offset = log_read_options.offset.ToTimedelta()
+        with self._profiler.active(), self._metrics.time("log_read_v2_1"):
+            return self._read_until(log_read_options.offset.ToTimedelta())
+
+    def _read_until(self, target_offset: datetime.timedelta) -> io_pb2.LogReadOutput:
+        if self._coalesce_reads:
+            return self._read_batch(target_offset)
 
         # This variable will have a valid LogReadOutput when the log has a message ready to ingest.
         output = None
@@ -156,6 +428,41 @@ class DataExplorerInterface(stack_interface_v2.StackInterfaceV2):
             output = self._process_message(read_message)
         return output
 
+    def _read_batch(self, target_offset: datetime.timedelta) -> io_pb2.LogReadOutput:
+        """Processes every message at or before `target_offset` and reports all the channels
+        they touched in a single output, instead of returning after each message.
+
+        Only the latest message of a channel can be converted, so a batch ends before a
+        second message of a channel it already touched, which starts the next batch instead
+        of replacing the first one unconverted.
+        """
+        seen_channels: list[str] = []
+        offset = target_offset
+        while True:
+            read_message = self._unprocessed_message
+            self._unprocessed_message = None
+            if read_message is None:
+                try:
+                    read_message = next(self._multi_log_reader)
+                except StopIteration:
+                    if not seen_channels:
+                        return self._create_output(data_remaining=False)
+                    # Report this batch first, the next call reports the end of the log.
+                    break
+
+            if self._message_too_far(target_offset, read_message.epoch_timestamp):
+                self._unprocessed_message = read_message
+                offset = target_offset
+                break
+            if self._topic_channels.get(read_message.topic) in seen_channels:
+                self._unprocessed_message = read_message
+                break
+
+            output = self._process_message(read_message)
+            offset = output.offset_reached.ToTimedelta()
+            seen_channels.extend(output.seen_channel_names)
+        return self._create_output(offset=offset, seen_channels=seen_channels)
+
     def _message_too_far(
         self, target_offset: datetime.timedelta, message_epoch: datetime.datetime
     ) -> bool:
@@ -177,29 +484,75 @@ class DataExplorerInterface(stack_interface_v2.StackInterfaceV2):
             read_message.epoch_timestamp,
         )
 
-        self._mailbox.latest_messages[read_message.topic] = message
-
         offset = epoch_timestamp - self._earliest_log_dt
         seen_channels = []
-
-        if topic == constants.MOCK_POSE_TOPIC:
-            self._populate_pose()
-            seen_channels.extend([constants.POSE_CHANNEL])
-        elif topic == constants.MOCK_CAMERA_TOPIC:
-            self._populate_cameras()
-            seen_channels.append(constants.CAMERA_CHANNEL)
-        elif topic == constants.MOCK_LIDAR_TOPIC:
-            self._populate_lidar()
-            seen_channels.append(constants.LIDAR_CHANNEL)
+        with self._metrics.time("process_message"):
+            self._mailbox.put_message(topic, message)
+            self._message_times[topic] = epoch_timestamp
+            if self._progress_log is not None:
+                self._progress_log.update(self._multi_log_reader.position)
+
+            # The message is only converted if ADP asks for its channel with
+            # convert_to_simian.
+            channel = self._topic_channels.get(topic)
+            if channel is not None:
+                self._unconverted_channels.add(channel)
+                seen_channels.append(channel)
 
         return self._create_output(offset=offset, seen_channels=seen_channels)
 
     def log_close(self, _log_close_options: io_pb2.LogCloseOptions) -> None:
         """Called once at the end of the drive conversion."""
+        try:
+            with self._profiler.active():
+                self._close_log(_log_close_options)
+        finally:
+            if self._profiler.enabled:
+                self._profiler.stop()
+                self._profiler = profiling.DisabledProfiler()
+
+    def _close_log(self, _log_close_options: io_pb2.LogCloseOptions) -> None:
         for log_reader in self._log_readers:
             log_reader.close(_log_close_options)
+        if self._decode_pool is not None:
+            self._decode_pool.close()
+        self._mailbox.clear()
+
+        memory_usage = self._memory_budget.summary()
+        logging.info(
+            "Peak memory held by frames: %d bytes (budget %d bytes, %d prefetches shed)",
+            memory_usage["peak_bytes"],
+            memory_usage["max_bytes"],
+            memory_usage["shed_prefetches"],
+        )
+        for name, value in memory_usage.items():
+            self._metrics.set_value(f"memory/{name}", value)
+        self._metrics.publish(self._data_sender)
+        if self._async_data_sender is not None:
+            async_data_sender, self._async_data_sender = self._async_data_sender, None
+            self._data_sender = async_data_sender.data_sender
+            # Everything queued is sent before the conversion is reported complete. A failed
+            # send is raised from here.
+            async_data_sender.close()
+        if self._metrics_file:
+            self._metrics.write(self._metrics_file)
         logging.info("Drive conversion complete")
 
+    def _report_startup(self, log_open_seconds: float) -> None:
+        self._metrics.set_value("startup/log_open_seconds", log_open_seconds)
+        if self._opened_log:
+            logging.info("Opened the log in %.3fs", log_open_seconds)
+            return
+        # The first conversion of the process also waits for the interface to start.
+        self._opened_log = True
+        startup_seconds = time.perf_counter() - self._created_time
+        self._metrics.set_value("startup/first_log_open_seconds", startup_seconds)
+        logging.info(
+            "Opened the first log in %.3fs, %.3fs after the interface started",
+            log_open_seconds,
+            startup_seconds,
+        )
+
     @staticmethod
     def _create_output(
         offset: datetime.timedelta = datetime.timedelta(),
@@ -215,20 +568,51 @@ class DataExplorerInterface(stack_interface_v2.StackInterfaceV2):
             output.seen_channel_names.extend(seen_channels)
         return output
 
-    def _populate_cameras(self) -> None:
-        self._camera_handler.update()
-        self._mailbox.latest_outputs[constants.CAMERA_CHANNEL] = self._camera_handler.get()
-
-    def _populate_pose(self) -> None:
-        self._pose_handler.update()
-        self._mailbox.latest_outputs[constants.POSE_CHANNEL] = self._pose_handler.get()
+    def _populate(self, channel: str, handler: channel_handler_base.ChannelHandlerBase) -> None:
+        topic = self._channel_topics[channel]
+        message = self._mailbox.latest_message(topic)
+        if isinstance(message, output_cache.CachedOutput):
+            with self._metrics.time(f"cached/{channel}"):
+                output = type(handler.get()).FromString(message.data)
+        else:
+            with self._metrics.time(f"update/{channel}"):
+                handler.update()
+            output = handler.get()
+            if self._output_cache is not None:
+                with self._metrics.time(f"cache_put/{channel}"):
+                    self._output_cache.put(
+                        self._output_cache_key(topic, self._message_times[topic]),
+                        output.SerializeToString(),
+                    )
+        self._mailbox.put_output(channel, output)
+        if self._metrics.enabled:
+            self._metrics.add_bytes(f"output/{channel}", output.ByteSize())
+
+    def _output_cache_key(self, topic: str, epoch_timestamp: datetime.datetime) -> str:
+        # The timestamp of a message identifies its frame within the topic, and the storage
+        # tells apart logs at the same path in different buckets or directories.
+        handler = self._channel_handlers[self._topic_channels[topic]]
+        return output_cache.cache_key(
+            self._storage_uri,
+            self._log_path,
+            topic,
+            str(scheduled_reader.datetime_to_ns(epoch_timestamp)),
+            handler.cache_token(),
+        )
 
-    def _populate_lidar(self) -> None:
-        self._lidar_handler.update()
-        self._mailbox.latest_outputs[constants.LIDAR_CHANNEL] = self._lidar_handler.get()
+    def _lookup_cached_output(
+        self, topic: str, epoch_timestamp: datetime.datetime
+    ) -> typing.Optional[output_cache.CachedOutput]:
+        """Called by the log readers, possibly from their read-ahead threads."""
+        if self._output_cache is None:
+            return None
+        data = self._output_cache.get(self._output_cache_key(topic, epoch_timestamp))
+        return output_cache.CachedOutput(data) if data is not None else None
 
     def _send_data_point(self, name: str, value: float) -> None:
-        self.send_data_point(common_pb2.DataPoint(name=name, value=value))
+        # Goes through the data sender, so that while a conversion runs with
+        # `async_data_sender` the interface is only sent to from its thread.
+        self._data_sender.send_data_point(common_pb2.DataPoint(name=name, value=value))
 
     def _send_observer_event(self, name: str, passed: bool = False) -> None:
         self.send_observer_event(common_pb2.ObserverEvent(name=name, passed=passed))
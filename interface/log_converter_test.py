@@ -1,11 +1,20 @@
 from __future__ import annotations
 
 import collections
+import os
+import tempfile
 import typing
 import unittest
 
+from benchmarks import pandaset_fixtures
+import constants
+import data_sender
+from google.protobuf import json_format
+import interface_errors
 import log_converter
+from log_readers import mock_position_reader
 
+from simian.public.proto import common_pb2
 from simian.public.proto import sensor_model_pb2
 from simian.public.proto.v2 import io_pb2
 
@@ -14,6 +23,17 @@ EXPECTED_MESSAGE_FREQUENCY = {
     sensor_model_pb2.SensorOutput.CameraImage: 10,
 }
 
+# Synthetic sequence converted from local storage, which needs no S3 access.
+LOCAL_LOG_PATH = "sequence"
+LOCAL_NUM_FRAMES = 4
+# Past the end of the sequence, so every read returns the next message.
+END_OFFSET_MILLISECONDS = 60_000
+
+
+class _FailingDataSender(data_sender.FakeDataSender):
+    def send_data_point(self, datapoint: common_pb2.DataPoint) -> None:
+        raise ValueError(f"Failed to send {datapoint.name}")
+
 
 class LogConverterTest(unittest.TestCase):
     def test_interface(self) -> None:
@@ -43,5 +63,208 @@ class LogConverterTest(unittest.TestCase):
             self.assertEqual(frequencies[channel_type], EXPECTED_MESSAGE_FREQUENCY[channel_type])
 
 
+class LocalConversionTest(unittest.TestCase):
+    _temp_dir: typing.ClassVar[tempfile.TemporaryDirectory[str]]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls._temp_dir = tempfile.TemporaryDirectory()
+        pandaset_fixtures.write_sequence(
+            cls._temp_dir.name,
+            LOCAL_LOG_PATH,
+            num_frames=LOCAL_NUM_FRAMES,
+            points_per_frame=10,
+            image_shape=(16, 24),
+        )
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls._temp_dir.cleanup()
+
+    def _create_interface(
+        self,
+        channels: list[str],
+        extra_data: typing.Optional[dict[str, str]] = None,
+        sender: typing.Optional[data_sender.DataSender] = None,
+    ) -> log_converter.DataExplorerInterface:
+        interface = log_converter.DataExplorerInterface(
+            None, data_sender_override=sender or data_sender.FakeDataSender(quiet=True)
+        )
+        interface.set_startup_options_v2_1(
+            json_format.ParseDict(
+                {
+                    "channelSetup": {"allChannels": [{"name": channel} for channel in channels]},
+                    "scenarioExtraData": {
+                        "storage": "local",
+                        "local_root": self._temp_dir.name,
+                        **(extra_data or {}),
+                    },
+                },
+                io_pb2.InterfaceStartupOptions(),
+            )
+        )
+        return interface
+
+    def _open(
+        self, channels: list[str], extra_data: typing.Optional[dict[str, str]] = None
+    ) -> log_converter.DataExplorerInterface:
+        interface = self._create_interface(channels, extra_data)
+        interface.log_open_v2_2(io_pb2.LogOpenOptions(path=LOCAL_LOG_PATH))
+        self.addCleanup(interface.log_close, io_pb2.LogCloseOptions())
+        return interface
+
+    @staticmethod
+    def _read(
+        interface: log_converter.DataExplorerInterface, offset_milliseconds: int
+    ) -> io_pb2.LogReadOutput:
+        read_options = io_pb2.LogReadOptions()
+        read_options.offset.FromMilliseconds(offset_milliseconds)
+        return interface.log_read_v2_1(read_options)
+
+    @staticmethod
+    def _count_updates(interface: log_converter.DataExplorerInterface) -> collections.Counter[str]:
+        updates: collections.Counter[str] = collections.Counter()
+        for channel, handler in interface._channel_handlers.items():
+            update = handler.update
+
+            def counted_update(
+                channel: str = channel, update: typing.Callable[[], None] = update
+            ) -> None:
+                updates[channel] += 1
+                update()
+
+            handler.update = counted_update  # type: ignore[method-assign]
+        return updates
+
+    def test_converts_channels_on_demand(self) -> None:
+        interface = self._open([constants.POSE_CHANNEL, constants.CAMERA_CHANNEL])
+        updates = self._count_updates(interface)
+        seen: collections.Counter[str] = collections.Counter()
+        while True:
+            read_output = self._read(interface, END_OFFSET_MILLISECONDS)
+            seen.update(read_output.seen_channel_names)
+            if constants.POSE_CHANNEL in read_output.seen_channel_names:
+                pose = interface.convert_to_simian(io_pb2.Channel(name=constants.POSE_CHANNEL))
+                # Asking again for the same message returns the same output without
+                # converting the message again.
+                self.assertIs(
+                    interface.convert_to_simian(io_pb2.Channel(name=constants.POSE_CHANNEL)),
+                    pose,
+                )
+            if not read_output.data_remaining:
+                break
+
+        self.assertEqual(seen[constants.CAMERA_CHANNEL], LOCAL_NUM_FRAMES)
+        self.assertEqual(updates[constants.POSE_CHANNEL], seen[constants.POSE_CHANNEL])
+        # The camera images were read but never asked for, so never converted.
+        self.assertEqual(updates[constants.CAMERA_CHANNEL], 0)
+
+    def test_converts_again_after_free(self) -> None:
+        interface = self._open([constants.POSE_CHANNEL])
+        updates = self._count_updates(interface)
+        channel = io_pb2.Channel(name=constants.POSE_CHANNEL)
+        self.assertIn(constants.POSE_CHANNEL, self._read(interface, 0).seen_channel_names)
+        pose = interface.convert_to_simian(channel)
+        interface.convert_to_simian_free(constants.POSE_CHANNEL)
+        # The same message is converted again from the message kept in the mailbox.
+        self.assertEqual(interface.convert_to_simian(channel), pose)
+        self.assertEqual(updates[constants.POSE_CHANNEL], 2)
+
+    def test_close_raises_async_send_errors(self) -> None:
+        sender = _FailingDataSender(quiet=True)
+        interface = self._create_interface(
+            [constants.POSE_CHANNEL],
+            {"async_data_sender": "true", "instrumentation": "true"},
+            sender,
+        )
+        interface.log_open_v2_2(io_pb2.LogOpenOptions(path=LOCAL_LOG_PATH))
+        self._read(interface, 0)
+        # The metrics are sent on close, and the first failed send is raised once they are.
+        with self.assertRaisesRegex(ValueError, "Failed to send metrics/"):
+            interface.log_close(io_pb2.LogCloseOptions())
+        self.assertIs(interface._data_sender, sender)
+
+    def test_batch_keeps_messages_past_the_offset(self) -> None:
+        interface = self._open([constants.POSE_CHANNEL], {"coalesce_reads": "true"})
+        # The pose messages are 100ms apart. A message past the requested offset is kept for
+        # a later call, which reports it.
+        for offset_milliseconds, expected_channels in (
+            (0, [constants.POSE_CHANNEL]),
+            (70, []),
+            (100, [constants.POSE_CHANNEL]),
+        ):
+            read_output = self._read(interface, offset_milliseconds)
+            self.assertEqual(read_output.offset_reached.ToMilliseconds(), offset_milliseconds)
+            self.assertEqual(list(read_output.seen_channel_names), expected_channels)
+            self.assertTrue(read_output.data_remaining)
+
+    def test_batch_converts_every_message(self) -> None:
+        channels = [constants.POSE_CHANNEL, constants.CAMERA_CHANNEL, constants.LIDAR_CHANNEL]
+        interface = self._open(channels, {"coalesce_reads": "true"})
+        updates = self._count_updates(interface)
+        batches = []
+        while True:
+            read_output = self._read(interface, END_OFFSET_MILLISECONDS)
+            if not read_output.data_remaining:
+                break
+            batches.append(list(read_output.seen_channel_names))
+            for channel in read_output.seen_channel_names:
+                interface.convert_to_simian(io_pb2.Channel(name=channel))
+
+        # The whole log is before the offset, but a batch ends before a second message of a
+        # channel, which would replace the first before it is converted.
+        self.assertTrue(any(len(batch) > 1 for batch in batches))
+        for batch in batches:
+            self.assertEqual(len(batch), len(set(batch)))
+        self.assertEqual(updates[constants.CAMERA_CHANNEL], LOCAL_NUM_FRAMES)
+        self.assertEqual(updates[constants.LIDAR_CHANNEL], LOCAL_NUM_FRAMES)
+        # The last batch is reported before the end of the log, which the next call reports
+        # without any channels.
+        self.assertTrue(batches[-1])
+        self.assertEqual(
+            list(self._read(interface, END_OFFSET_MILLISECONDS).seen_channel_names), []
+        )
+
+    def test_output_cache_tells_storages_apart(self) -> None:
+        with tempfile.TemporaryDirectory() as other_root, tempfile.TemporaryDirectory() as cache:
+            # A different log at the same path of another storage root.
+            pandaset_fixtures.write_sequence(
+                other_root,
+                LOCAL_LOG_PATH,
+                num_frames=2,
+                points_per_frame=10,
+                image_shape=(16, 24),
+                seed=1,
+            )
+            entries = []
+            for local_root in (self._temp_dir.name, other_root, self._temp_dir.name):
+                interface = self._create_interface(
+                    [constants.POSE_CHANNEL],
+                    {"local_root": local_root, "output_cache_dir": cache},
+                )
+                interface.log_open_v2_2(io_pb2.LogOpenOptions(path=LOCAL_LOG_PATH))
+                while self._read(interface, END_OFFSET_MILLISECONDS).data_remaining:
+                    interface.convert_to_simian(io_pb2.Channel(name=constants.POSE_CHANNEL))
+                interface.log_close(io_pb2.LogCloseOptions())
+                entries.append(len(os.listdir(cache)))
+
+        # The other log gets entries of its own, and the first log hits its earlier ones.
+        self.assertGreater(entries[1], entries[0])
+        self.assertEqual(entries[2], entries[1])
+
+    def test_opens_readers_of_requested_channels_only(self) -> None:
+        interface = self._open([constants.POSE_CHANNEL])
+        self.assertEqual(
+            [type(log_reader) for log_reader in interface._log_readers],
+            [mock_position_reader.MockPositionReader],
+        )
+        self.assertEqual(list(interface._channel_handlers), [constants.POSE_CHANNEL])
+
+    def test_unsupported_channels(self) -> None:
+        interface = self._create_interface(["radar_0"])
+        with self.assertRaises(interface_errors.InterfaceImplementationError):
+            interface.log_open_v2_2(io_pb2.LogOpenOptions(path=LOCAL_LOG_PATH))
+
+
 if __name__ == "__main__":
     unittest.main()
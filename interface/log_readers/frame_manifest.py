@@ -0,0 +1,59 @@
+"""Manifest of the per-frame files of a sensor, built from one listing when a log is opened.
+
+PandaSet stores every frame of a sensor as its own file, `<index>.<extension>` with a
+zero-padded index. Listing the sensor directory once gives the key and size of every
+frame up front, so readers know exactly which frames exist and how many bytes a
+conversion downloads before fetching any of them.
+"""
+from __future__ import annotations
+
+import re
+import typing
+
+import storage as storage_module
+
+# Frames named in the manifest's missing frames error before it is shortened.
+_MAX_MISSING_FRAMES_SHOWN = 5
+
+
+class FrameManifest(typing.NamedTuple):
+    """Keys and sizes in bytes of frames 0 to N - 1."""
+
+    keys: list[str]
+    sizes: list[int]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(self.sizes)
+
+
+def build_frame_manifest(
+    storage: storage_module.Storage, sensor_path: str, extension: str, num_frames: int
+) -> FrameManifest:
+    """Lists `sensor_path` and returns the manifest of its first `num_frames` frames, the
+    files named `<index><extension>` directly in it.
+
+    Raises FileNotFoundError naming the missing frames if any of them is not listed, so a
+    sequence is never cut short part way through a conversion.
+    """
+    frame_pattern = re.compile(rf"(\d+){re.escape(extension)}")
+    prefix = f"{sensor_path.rstrip('/')}/"
+    frames: dict[int, storage_module.ObjectInfo] = {}
+    for listed_object in storage.list(prefix):
+        match = frame_pattern.fullmatch(listed_object.key[len(prefix) :])
+        if match is not None:
+            frames[int(match.group(1))] = listed_object
+
+    missing_frames = [index for index in range(num_frames) if index not in frames]
+    if missing_frames:
+        shown = ", ".join(str(index) for index in missing_frames[:_MAX_MISSING_FRAMES_SHOWN])
+        if len(missing_frames) > _MAX_MISSING_FRAMES_SHOWN:
+            shown += ", ..."
+        raise FileNotFoundError(
+            f"{len(missing_frames)} of {num_frames} frames are missing from {prefix}: {shown}"
+        )
+    listed = [frames[index] for index in range(num_frames)]
+    return FrameManifest([item.key for item in listed], [item.size for item in listed])
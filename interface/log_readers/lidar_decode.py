@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+import pickle
+import typing
+import zlib
+
+import numpy as np
+
+
+def decode_pickled_cloud(buffer: typing.Any) -> np.ndarray:
+    """Decodes a PandaSet gzipped, pickled DataFrame into an Nx4 (x, y, z, i) array."""
+    # PandaSet only ships its clouds as pickles, read from the storage the conversion was
+    # configured with.
+    data = pickle.loads(zlib.decompress(buffer, wbits=zlib.MAX_WBITS | 16))  # noqa: S301
+    # Data is a pandas DataFrame with columns x, y, z, i (intensity)
+    points: np.ndarray = data[["x", "y", "z", "i"]].to_numpy()
+    return points
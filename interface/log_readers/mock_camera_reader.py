@@ -1,50 +1,153 @@
 from __future__ import annotations
 
 import datetime
-import typing
+import json
 import os
-import boto3
-import io
+import typing
 
 import constants
-import cv2
 import data_sender as data_sender_module
+import decode_pool as decode_pool_module
+import instrumentation
+from log_readers import frame_manifest
+from log_readers import read_ahead
+from log_readers import scheduled_reader
+from log_readers import sensor_calibration
+import memory_budget
 import numpy as np
+import output_cache
+import storage as storage_module
 
+from simian.public.proto import spatial_pb2
 from simian.public.proto.v2 import io_pb2
 from strada.public.log_readers import log_reader_base
 
 MOCK_START_TIMESTAMP = datetime.datetime.fromtimestamp(1668741575.5, tz=datetime.timezone.utc)
+# The camera frames are placed on the log's timeline from here, as far apart as their
+# PandaSet timestamps.
+_FIRST_FRAME_TIME = MOCK_START_TIMESTAMP + datetime.timedelta(seconds=0.033)
+
+# JPEG start-of-frame markers, which carry the image dimensions. 0xC4 (DHT), 0xC8 (JPG)
+# and 0xCC (DAC) share the range but are not frame headers.
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Markers without a length field.
+_JPEG_STANDALONE_MARKERS = frozenset(range(0xD0, 0xDA)) | {0x01}
+
 
-def get_number_from_counter(counter: int) -> str:
-    return f"{counter:02d}"
+def read_jpeg_shape(buffer: typing.Any) -> tuple[int, int]:
+    """Returns (height, width) of a JPEG by walking its marker segments up to the frame
+    header, without decoding any image data."""
+    data = memoryview(buffer)
+    if bytes(data[:2]) != b"\xff\xd8":
+        raise ValueError("Not a JPEG image")
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            raise ValueError(f"Invalid JPEG marker at byte {pos}")
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            # Fill byte
+            pos += 1
+            continue
+        if marker in _JPEG_STANDALONE_MARKERS:
+            pos += 2
+            continue
+        segment_length = int.from_bytes(data[pos + 2 : pos + 4], "big")
+        if marker in _JPEG_SOF_MARKERS:
+            height = int.from_bytes(data[pos + 5 : pos + 7], "big")
+            width = int.from_bytes(data[pos + 7 : pos + 9], "big")
+            return height, width
+        pos += 2 + segment_length
+    raise ValueError("JPEG frame header not found")
 
 
 class CameraData(typing.NamedTuple):
-    image_arr: typing.Any
+    image_arr: typing.Any  # None in passthrough mode
     height: int
     width: int
+    # The original compressed image, set in passthrough mode.
+    jpeg_bytes: typing.Optional[bytes] = None
+    # Pose of the camera in the ego frame at this frame, from the sequence's calibration.
+    pose: typing.Optional[spatial_pb2.Pose] = None
 
 
-class MockCameraReader(log_reader_base.LogReaderBase):
+# A frame, or its converted output when it is already in the output cache.
+CameraMessage = typing.Union[CameraData, output_cache.CachedOutput]
+
+
+class MockCameraReader(scheduled_reader.ScheduledLogReader):
     """This log reader generates random camera data to convert and later send to ADP."""
 
     def __init__(
         self,
-        _configuration: dict[typing.Any, typing.Any],
+        configuration: dict[typing.Any, typing.Any],
         data_sender: data_sender_module.DataSender,
     ) -> None:
         self._data_sender = data_sender
-        self._camera_images_path = None
-        self._s3_client = boto3.client("s3")
+        self._camera_images_path: typing.Optional[str] = None
+        self._storage: storage_module.Storage = (
+            configuration.get("storage") or storage_module.S3Storage()
+        )
+
+        # Number of frames to keep in flight ahead of the consumer. 0 disables read-ahead.
+        self._read_ahead_frames = int(configuration.get("read_ahead_frames", 0))
+        self._read_ahead: typing.Optional[read_ahead.ReadAhead[CameraMessage]] = None
+        # Prefetched frames are charged against the budget, which limits read-ahead.
+        self._memory_budget: typing.Optional[memory_budget.MemoryBudget] = configuration.get(
+            "memory_budget"
+        )
+
+        # Forward the original JPEG instead of decoding it. Only the header is parsed for
+        # the image shape, so no pixel data is available to the channel handler.
+        self._passthrough = bool(configuration.get("camera_passthrough", False))
+        # Optional worker processes that decode, and re-encode for the channel handler, off
+        # the conversion thread.
+        self._decode_pool: typing.Optional[decode_pool_module.DecodePool] = configuration.get(
+            "decode_pool"
+        )
+
+        # Frames whose output is cached are not downloaded.
+        self._lookup_cached_output: typing.Optional[output_cache.LookupFunction] = (
+            configuration.get("lookup_cached_output")
+        )
+
+        self._metrics: instrumentation.Metrics = (
+            configuration.get("metrics") or instrumentation.DisabledMetrics()
+        )
 
+        # Calibration of each camera by images path, loaded when the log is opened. Cameras
+        # without one keep the default pose of the channel handler.
+        self._calibrations: dict[str, typing.Optional[sensor_calibration.SensorCalibration]] = {}
+        # Keys and sizes of the frames of each camera by images path, listed when the log is
+        # opened.
+        self._manifests: dict[str, frame_manifest.FrameManifest] = {}
+
+        # Number of frames in the sequence, and the time of each frame in microseconds since
+        # the first one, known once the log is opened.
+        self._num_frames = 0
+        self._frame_offsets_us: np.ndarray = np.zeros(0, dtype=np.int64)
         self._counter = 0
 
     def open(
         self, _path: log_reader_base.LogPath, log_open_options: io_pb2.LogOpenOptions
     ) -> io_pb2.LogOpenOutput:
-        self._camera_images_path = os.path.join(log_open_options.path, "camera/front_camera")
-        print(self._camera_images_path) # Pandaset/<id>/camera/front_camera
+        camera_images_path = os.path.join(log_open_options.path, "camera/front_camera")
+        self._camera_images_path = camera_images_path
+        print(camera_images_path) # Pandaset/<id>/camera/front_camera
+
+        self._frame_offsets_us = self._read_frame_offsets_us(camera_images_path)
+        self._num_frames = len(self._frame_offsets_us)
+        self._load_manifest(camera_images_path, self._num_frames)
+        self._load_calibration(log_open_options.path, camera_images_path)
+
+        if self._read_ahead_frames > 0:
+            self._read_ahead = read_ahead.ReadAhead(
+                self._fetch_frame,
+                self._read_ahead_frames,
+                start_index=self._counter,
+                stop_index=self._num_frames,
+                memory_budget=self._memory_budget,
+            )
         output = io_pb2.LogOpenOutput()
         output.start_timestamp.FromDatetime(MOCK_START_TIMESTAMP)
         return output
@@ -52,36 +155,128 @@ class MockCameraReader(log_reader_base.LogReaderBase):
     def close(self, log_close_options: io_pb2.LogCloseOptions) -> None:
         print(f"Closing camera reader for {self._counter} messages")
         print(f"Log close options: {log_close_options}")
-        pass
+        if self._read_ahead is not None:
+            self._read_ahead.close()
+            self._read_ahead = None
 
-    def read_message(self) -> log_reader_base.LogReadType:
-        image_name = get_number_from_counter(self._counter) + ".jpg"
-        s3_key = f"{self._camera_images_path}/{image_name}"
+    def num_messages(self) -> int:
+        return self._num_frames
 
-        # Download image data into memory buffer
-        try:
-            image_buffer = io.BytesIO()
-            self._s3_client.download_fileobj(
-                Bucket=constants.BUCKET_NAME,
-                Key=s3_key,
-                Fileobj=image_buffer
-            )
-            image_buffer.seek(0)
-        except Exception as e:
-            raise StopIteration()
+    def total_bytes(self) -> int:
+        return sum(manifest.total_bytes for manifest in self._manifests.values())
 
-        # Read image from buffer
-        image_array = np.frombuffer(image_buffer.read(), np.uint8)
-        arr = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
-        if arr is None:
-            raise FileNotFoundError(f"Failed to decode image data from S3 key {s3_key}")
-        height, width = arr.shape[:2]
+    def seek_to_message(self, index: int) -> None:
+        self._counter = index
+        if self._read_ahead is not None:
+            self._read_ahead.seek(index)
 
-        fake_epoch_time = MOCK_START_TIMESTAMP + datetime.timedelta(seconds=self._counter * constants.PERIOD_SECONDS + 0.033)
+    def read_message(self) -> log_reader_base.LogReadType:
+        if self._counter >= self._num_frames:
+            raise StopIteration()
+        if self._read_ahead is not None:
+            camera_data = self._read_ahead.next()
+        else:
+            camera_data = self._fetch_frame(self._counter)
+
+        fake_epoch_time = self.message_time(self._counter)
 
         self._counter += 1
         return log_reader_base.LogReadType(
             constants.MOCK_CAMERA_TOPIC,
-            CameraData(image_arr=arr, height=height, width=width),
+            camera_data,
             fake_epoch_time,
         )
+
+    def message_time(self, index: int) -> datetime.datetime:
+        return self._frame_time(index)
+
+    def timestamps_ns(self) -> np.ndarray:
+        return self._frame_timestamps_ns()
+
+    def _frame_time(self, index: int) -> datetime.datetime:
+        return _FIRST_FRAME_TIME + datetime.timedelta(
+            microseconds=int(self._frame_offsets_us[index])
+        )
+
+    def _frame_timestamps_ns(self) -> np.ndarray:
+        """Timestamps of all frames in nanoseconds, matching `_frame_time`."""
+        return scheduled_reader.datetime_to_ns(_FIRST_FRAME_TIME) + self._frame_offsets_us * 1000
+
+    def _read_frame_offsets_us(self, images_path: str) -> np.ndarray:
+        """Reads the timestamp PandaSet ships for each frame of a camera, as microseconds
+        since its first frame."""
+        timestamps_key = f"{images_path}/timestamps.json"
+        try:
+            timestamps = np.array(
+                json.loads(bytes(self._storage.read(timestamps_key))), dtype=np.float64
+            )
+        except Exception as e:
+            raise FileNotFoundError(
+                f"Failed to load camera timestamps from key {timestamps_key}: {e}"
+            ) from e
+        # Rounded to whole microseconds, the resolution of the message times.
+        return np.round((timestamps - timestamps[:1]) * 1e6).astype(np.int64)
+
+    def _fetch_frame(self, index: int) -> CameraMessage:
+        """Downloads and decodes a single frame. Errors are raised rather than ending the
+        sequence early.
+
+        This is called from the read-ahead threads when read-ahead is enabled.
+        """
+        assert self._camera_images_path is not None, "open() must be called before reading"
+        return self._fetch_image(self._camera_images_path, index, constants.MOCK_CAMERA_TOPIC)
+
+    def _fetch_image(self, images_path: str, index: int, topic: str) -> CameraMessage:
+        if self._lookup_cached_output is not None:
+            cached_output = self._lookup_cached_output(topic, self._frame_time(index))
+            if cached_output is not None:
+                return cached_output
+
+        key = self._manifests[images_path].keys[index]
+        fetch_stage = f"fetch/{topic}"
+        with self._metrics.time(fetch_stage):
+            image_buffer = self._storage.read(key)
+        self._metrics.add_bytes(fetch_stage, len(image_buffer))
+
+        with self._metrics.time(f"decode/{topic}"):
+            camera_data = self._decode(key, image_buffer)
+        calibration = self._calibrations.get(images_path)
+        if calibration is not None and index < len(calibration):
+            camera_data = camera_data._replace(pose=calibration.pose_proto(index))
+        return camera_data
+
+    def _load_manifest(self, images_path: str, num_frames: int) -> None:
+        self._manifests[images_path] = frame_manifest.build_frame_manifest(
+            self._storage, images_path, ".jpg", num_frames
+        )
+
+    def _load_calibration(self, log_path: str, images_path: str) -> None:
+        self._calibrations[images_path] = sensor_calibration.load_sensor_calibration(
+            self._storage, log_path, os.path.relpath(images_path, log_path), camera=True
+        )
+
+    def _decode(self, key: str, image_buffer: memoryview) -> CameraData:
+        if self._passthrough:
+            height, width = read_jpeg_shape(image_buffer)
+            return CameraData(
+                image_arr=None, height=height, width=width, jpeg_bytes=image_buffer.tobytes()
+            )
+
+        if self._decode_pool is not None:
+            image_arr, jpeg_bytes = self._decode_pool.decode_jpeg(image_buffer, encode=True)
+            height, width = image_arr.shape[:2]
+            return CameraData(
+                image_arr=image_arr, height=height, width=width, jpeg_bytes=jpeg_bytes
+            )
+
+        # Imported here, OpenCV takes a while to load and passthrough conversions never need
+        # it.
+        import cv2
+
+        # Decode straight from the storage buffer.
+        image_array = np.frombuffer(image_buffer, np.uint8)
+        arr = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
+        if arr is None:
+            raise FileNotFoundError(f"Failed to decode image data from key {key}")
+        height, width = arr.shape[:2]
+        return CameraData(image_arr=arr, height=height, width=width)
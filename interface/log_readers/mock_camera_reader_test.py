@@ -2,8 +2,10 @@ from __future__ import annotations
 
 import unittest
 
+import cv2
 import data_sender
 import mock_camera_reader
+import numpy as np
 
 from simian.public.proto.v2 import io_pb2
 
@@ -24,6 +26,15 @@ class MockCameraReaderTest(unittest.TestCase):
 
         self.assertEqual(num_messages, EXPECTED_NUM_MESSAGES)
 
+    def test_read_jpeg_shape(self) -> None:
+        image = np.zeros((37, 51, 3), np.uint8)
+        for params in ([], [cv2.IMWRITE_JPEG_PROGRESSIVE, 1]):
+            jpeg_bytes = cv2.imencode(".jpg", image, params)[1].tobytes()
+            self.assertEqual(mock_camera_reader.read_jpeg_shape(jpeg_bytes), (37, 51))
+
+        with self.assertRaises(ValueError):
+            mock_camera_reader.read_jpeg_shape(b"not a jpeg")
+
 
 if __name__ == "__main__":
     unittest.main()
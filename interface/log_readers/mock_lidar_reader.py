@@ -1,48 +1,138 @@
 from __future__ import annotations
 
 import datetime
-import typing
+import json
 import os
-import pickle
-import gzip
-import numpy as np
-import pandas as pd
-import boto3
-import io
+import typing
 
 import constants
-import cv2
 import data_sender as data_sender_module
+import decode_pool as decode_pool_module
+import instrumentation
+from log_readers import frame_manifest
+from log_readers import lidar_decode
+from log_readers import packed_lidar
+from log_readers import read_ahead
+from log_readers import scheduled_reader
+from log_readers import sensor_calibration
+import memory_budget
+import numpy as np
+import output_cache
+import storage as storage_module
 
-from simian.public.proto.v2 import io_pb2
 from simian.public.proto import sensor_model_pb2
+from simian.public.proto.v2 import io_pb2
 from strada.public.log_readers import log_reader_base
 
 MOCK_START_TIMESTAMP = datetime.datetime.fromtimestamp(1668741575.5, tz=datetime.timezone.utc)
 
-def get_number_from_counter(counter: int) -> str:
-    return f"{counter:02d}"
-
 class LidarData(typing.NamedTuple):
     points: np.ndarray  # Nx4 array of (x,y,z,i) points
+    # 3x4 [R | t] transform of the points from the world frame, in which PandaSet stores
+    # them, to the ego frame at this frame. None for sequences without lidar poses.
+    ego_from_world: typing.Optional[np.ndarray] = None
+
+# A frame, or its converted output when it is already in the output cache.
+LidarMessage = typing.Union[LidarData, output_cache.CachedOutput]
 
-class MockLidarReader(log_reader_base.LogReaderBase):
+class MockLidarReader(scheduled_reader.ScheduledLogReader):
 
     def __init__(
         self,
-        _configuration: dict[typing.Any, typing.Any],
+        configuration: dict[typing.Any, typing.Any],
         data_sender: data_sender_module.DataSender,
     ) -> None:
         self._data_sender = data_sender
-        self._lidar_clouds_path = None
-        self._s3_client = boto3.client("s3")
+        self._lidar_clouds_path: typing.Optional[str] = None
+        self._storage: storage_module.Storage = (
+            configuration.get("storage") or storage_module.S3Storage()
+        )
+
+        # Number of frames to keep in flight ahead of the consumer. 0 disables read-ahead.
+        self._read_ahead_frames = int(configuration.get("read_ahead_frames", 0))
+        self._read_ahead: typing.Optional[read_ahead.ReadAhead[LidarMessage]] = None
+        # Prefetched frames are charged against the budget, which limits read-ahead.
+        self._memory_budget: typing.Optional[memory_budget.MemoryBudget] = configuration.get(
+            "memory_budget"
+        )
+
+        # `pickle` reads the per-frame PandaSet clouds, `packed` reads a sequence packed with
+        # pack_lidar_sequence, which needs no decompression or unpickling.
+        self._lidar_format = configuration.get("lidar_format", "pickle")
+        self._packed_sequence: typing.Optional[packed_lidar.PackedLidarSequence] = None
+        self._packed_sequence_nbytes = 0
+        # Keys and sizes of the per-frame clouds, listed when the log is opened.
+        self._manifest: typing.Optional[frame_manifest.FrameManifest] = None
+        # Only every Nth frame is read. The skipped frames are never downloaded.
+        self._frame_step = int(configuration.get("lidar_frame_step", 1))
+        if self._frame_step < 1:
+            raise ValueError(f"lidar_frame_step must be at least 1, got {self._frame_step}")
+
+        # Optional worker processes that decode clouds off the conversion thread.
+        self._decode_pool: typing.Optional[decode_pool_module.DecodePool] = configuration.get(
+            "decode_pool"
+        )
+
+        # Frames whose output is cached are not downloaded.
+        self._lookup_cached_output: typing.Optional[output_cache.LookupFunction] = (
+            configuration.get("lookup_cached_output")
+        )
+
+        self._metrics: instrumentation.Metrics = (
+            configuration.get("metrics") or instrumentation.DisabledMetrics()
+        )
+        self._fetch_stage = f"fetch/{constants.MOCK_LIDAR_TOPIC}"
+        self._decode_stage = f"decode/{constants.MOCK_LIDAR_TOPIC}"
+
+        # Per-frame Nx3x4 world to ego transforms, from the lidar poses of the sequence.
+        self._ego_from_world: typing.Optional[np.ndarray] = None
+
+        # Number of frames in the sequence, known once the log is opened.
+        self._num_frames = 0
         self._counter = 0
 
     def open(
         self, _path: log_reader_base.LogPath, log_open_options: io_pb2.LogOpenOptions
     ) -> io_pb2.LogOpenOutput:
-        self._lidar_clouds_path = os.path.join(log_open_options.path, "lidar")
-        print(self._lidar_clouds_path) # Pandaset/<id>/lidar
+        lidar_clouds_path = os.path.join(log_open_options.path, "lidar")
+        self._lidar_clouds_path = lidar_clouds_path
+        print(lidar_clouds_path) # Pandaset/<id>/lidar
+        if self._lidar_format == "packed":
+            packed_buffer = self._storage.read(
+                os.path.join(lidar_clouds_path, packed_lidar.PACKED_SEQUENCE_NAME)
+            )
+            self._packed_sequence = packed_lidar.PackedLidarSequence(packed_buffer)
+            self._packed_sequence_nbytes = len(packed_buffer)
+            self._num_frames = len(self._packed_sequence)
+        else:
+            # PandaSet ships one timestamp per frame, which gives the length of the sequence.
+            timestamps_key = os.path.join(lidar_clouds_path, "timestamps.json")
+            try:
+                self._num_frames = len(json.loads(bytes(self._storage.read(timestamps_key))))
+            except Exception as e:
+                raise FileNotFoundError(
+                    f"Failed to load lidar timestamps from key {timestamps_key}: {e}"
+                ) from e
+            self._manifest = frame_manifest.build_frame_manifest(
+                self._storage, lidar_clouds_path, ".pkl.gz", self._num_frames
+            )
+
+        # The ego frame is the lidar frame, so the lidar poses give the transforms of the
+        # clouds, computed for the whole sequence at once.
+        lidar_poses = sensor_calibration.load_world_poses(
+            self._storage, log_open_options.path, sensor_calibration.EGO_SENSOR_PATH
+        )
+        if lidar_poses is not None:
+            self._ego_from_world = sensor_calibration.world_to_sensor_transforms(*lidar_poses)
+
+        if self._read_ahead_frames > 0:
+            self._read_ahead = read_ahead.ReadAhead(
+                self._fetch_message,
+                self._read_ahead_frames,
+                start_index=self._counter,
+                stop_index=self.num_messages(),
+                memory_budget=self._memory_budget,
+            )
         output = io_pb2.LogOpenOutput()
         output.start_timestamp.FromDatetime(MOCK_START_TIMESTAMP)
         return output
@@ -50,38 +140,33 @@ class MockLidarReader(log_reader_base.LogReaderBase):
     def close(self, log_close_options: io_pb2.LogCloseOptions) -> None:
         print(f"Closing lidar reader for {self._counter} messages")
         print(f"Log close options: {log_close_options}")
-        pass
+        if self._read_ahead is not None:
+            self._read_ahead.close()
+            self._read_ahead = None
 
-    def read_message(self) -> log_reader_base.LogReadType:
+    def num_messages(self) -> int:
+        return -(-self._num_frames // self._frame_step)
 
-        cloud_name = get_number_from_counter(self._counter) + ".pkl.gz"
-        s3_key = os.path.join(self._lidar_clouds_path, cloud_name) # Pandaset/<id>/lidar/<counter>.pkl.gz
+    def total_bytes(self) -> int:
+        if self._manifest is None:
+            return self._packed_sequence_nbytes
+        # Skipped frames are never downloaded.
+        return sum(self._manifest.sizes[:: self._frame_step])
 
-        fake_epoch_time = MOCK_START_TIMESTAMP + datetime.timedelta(seconds=self._counter * constants.PERIOD_SECONDS + 0.066)
+    def seek_to_message(self, index: int) -> None:
+        self._counter = index
+        if self._read_ahead is not None:
+            self._read_ahead.seek(index)
 
-        # Download and decompress the pickle file from S3
-        try:
-            compressed_buffer = io.BytesIO()
-            self._s3_client.download_fileobj(
-                Bucket=constants.BUCKET_NAME,
-                Key=s3_key,
-                Fileobj=compressed_buffer
-            )
-            compressed_buffer.seek(0)
-        except Exception as e:
+    def read_message(self) -> log_reader_base.LogReadType:
+        if self._counter >= self.num_messages():
             raise StopIteration()
+        if self._read_ahead is not None:
+            lidar_data = self._read_ahead.next()
+        else:
+            lidar_data = self._fetch_message(self._counter)
 
-        with gzip.GzipFile(fileobj=compressed_buffer, mode='rb') as gz:
-            data = pickle.load(gz)
-
-        # Data is a pandas DataFrame with columns x, y, z, i (intensity)
-        # Convert to numpy arrays in the required format
-        points = data[['x', 'y', 'z', 'i']].to_numpy()  # Nx4 array of points
-
-        # Create LidarData object
-        lidar_data = LidarData(
-            points=points,
-        )
+        fake_epoch_time = self.message_time(self._counter)
 
         self._counter += 1
         return log_reader_base.LogReadType(
@@ -89,3 +174,51 @@ class MockLidarReader(log_reader_base.LogReaderBase):
             lidar_data,
             fake_epoch_time,
         )
+
+    def message_time(self, index: int) -> datetime.datetime:
+        frame = index * self._frame_step
+        return MOCK_START_TIMESTAMP + datetime.timedelta(
+            seconds=frame * constants.PERIOD_SECONDS + 0.066
+        )
+
+    def _fetch_message(self, index: int) -> LidarMessage:
+        if self._lookup_cached_output is not None:
+            cached_output = self._lookup_cached_output(
+                constants.MOCK_LIDAR_TOPIC, self.message_time(index)
+            )
+            if cached_output is not None:
+                return cached_output
+        frame = index * self._frame_step
+        lidar_data = self._fetch_frame(frame)
+        if self._ego_from_world is not None and frame < len(self._ego_from_world):
+            lidar_data = lidar_data._replace(ego_from_world=self._ego_from_world[frame])
+        return lidar_data
+
+    def _fetch_frame(self, index: int) -> LidarData:
+        """Downloads and decodes a single cloud. Errors are raised rather than ending the
+        sequence early.
+
+        This is called from the read-ahead threads when read-ahead is enabled.
+        """
+        if self._packed_sequence is not None:
+            return LidarData(points=self._packed_sequence.frame(index))
+
+        assert self._manifest is not None
+        key = self._manifest.keys[index]  # Pandaset/<id>/lidar/<counter>.pkl.gz
+        with self._metrics.time(self._fetch_stage):
+            compressed_buffer = self._storage.read(key)
+        self._metrics.add_bytes(self._fetch_stage, len(compressed_buffer))
+
+        with self._metrics.time(self._decode_stage):
+            return self._decode(compressed_buffer)
+
+    def _decode(self, compressed_buffer: memoryview) -> LidarData:
+        # Decompress straight from the storage buffer, without wrapping it in a file object.
+        if self._decode_pool is not None:
+            points = self._decode_pool.decode_pickled_cloud(compressed_buffer)
+        else:
+            points = lidar_decode.decode_pickled_cloud(compressed_buffer)
+
+        return LidarData(
+            points=points,
+        )
@@ -4,35 +4,89 @@ import json
 import datetime
 import typing
 import os
-import boto3
-import io
 
 import constants
 import data_sender as data_sender_module
+from log_readers import scheduled_reader
+import numpy as np
+import output_cache
+import storage as storage_module
+import utm_projection
 
 from simian.public.proto.v2 import io_pb2
 from strada.public.log_readers import log_reader_base
 
 MOCK_START_TIMESTAMP = datetime.datetime.fromtimestamp(1668741575, tz=datetime.timezone.utc)
 
-class GPSPoseMessage(typing.NamedTuple):
-    lat: float
-    long: float
-    next_lat: float
-    next_long: float
+class PoseMessage(typing.NamedTuple):
+    """A trajectory point projected to UTM, with the velocity towards the next point."""
 
+    x: float  # easting
+    y: float  # northing
+    x_vel: float
+    y_vel: float
+    yaw: float
 
-class MockPositionReader(log_reader_base.LogReaderBase):
+
+class Trajectory(typing.NamedTuple):
+    x: np.ndarray
+    y: np.ndarray
+    x_vel: np.ndarray
+    y_vel: np.ndarray
+    yaw: np.ndarray
+
+
+def compute_trajectory(gps_data: list[dict[str, float]]) -> Trajectory:
+    """Projects a whole GPS trace to UTM and derives the velocity and yaw of every point but
+    the last from the point after it.
+
+    Where the vehicle does not move between two points the previous velocity and yaw are
+    kept. Before the first movement the velocity is zero and the yaw is that of the first
+    movement.
+    """
+    if len(gps_data) < 2:
+        empty = np.zeros(0)
+        return Trajectory(empty, empty, empty, empty, empty)
+
+    lat = np.fromiter((point["lat"] for point in gps_data), dtype=np.float64, count=len(gps_data))
+    lon = np.fromiter((point["long"] for point in gps_data), dtype=np.float64, count=len(gps_data))
+    projection = utm_projection.project(lat, lon)
+    x = projection.easting[:-1]
+    y = projection.northing[:-1]
+
+    x_vel = np.diff(projection.easting) / constants.PERIOD_SECONDS
+    y_vel = np.diff(projection.northing) / constants.PERIOD_SECONDS
+
+    # Index of the latest point (at or before each point) where the vehicle moved.
+    moving = (x_vel != 0) | (y_vel != 0)
+    last_moving = np.maximum.accumulate(np.where(moving, np.arange(len(moving)), -1))
+    has_moved = last_moving >= 0
+    x_vel = np.where(has_moved, x_vel[last_moving], 0.0)
+    y_vel = np.where(has_moved, y_vel[last_moving], 0.0)
+
+    yaw = np.arctan2(y_vel, x_vel)
+    if moving.any():
+        yaw[~has_moved] = yaw[np.argmax(moving)]
+    return Trajectory(x, y, x_vel, y_vel, yaw)
+
+
+class MockPositionReader(scheduled_reader.ScheduledLogReader):
     """This log reader generates random gps data to convert and later send to ADP."""
 
     def __init__(
         self,
-        _configuration: dict[typing.Any, typing.Any],
+        configuration: dict[typing.Any, typing.Any],
         data_sender: data_sender_module.DataSender,
     ) -> None:
         self._data_sender = data_sender
-        self._gps_data = {}
-        self._s3_client = boto3.client("s3")
+        self._gps_data: list[dict[str, float]] = []
+        self._trajectory: typing.Optional[Trajectory] = None
+        self._storage: storage_module.Storage = (
+            configuration.get("storage") or storage_module.S3Storage()
+        )
+        self._lookup_cached_output: typing.Optional[output_cache.LookupFunction] = (
+            configuration.get("lookup_cached_output")
+        )
         self._counter = 0
 
     def open(
@@ -40,19 +94,16 @@ class MockPositionReader(log_reader_base.LogReaderBase):
     ) -> io_pb2.LogOpenOutput:
         folder_name = log_open_options.path
         print(f"Folder name: {folder_name}")
-        s3_key = os.path.join(folder_name, "meta/gps.json")
-        print(f"S3 key: {s3_key}") # Pandaset/<id>/meta/gps.json
+        key = os.path.join(folder_name, "meta/gps.json")
+        print(f"Key: {key}") # Pandaset/<id>/meta/gps.json
 
         try:
-            # Get object directly from S3
-            response = self._s3_client.get_object(
-                Bucket=constants.BUCKET_NAME,
-                Key=s3_key
-            )
-            # Read and parse the JSON data from the response body
-            self._gps_data = json.loads(response['Body'].read().decode('utf-8'))
+            self._gps_data = json.loads(bytes(self._storage.read(key)))
         except Exception as e:
-            raise FileNotFoundError(f"Failed to load GPS data from S3 key {s3_key}: {str(e)}")
+            raise FileNotFoundError(f"Failed to load GPS data from key {key}: {e}") from e
+
+        # Project the whole trajectory up front, so reading a message is an index lookup.
+        self._trajectory = compute_trajectory(self._gps_data)
 
         output = io_pb2.LogOpenOutput()
         output.start_timestamp.FromDatetime(MOCK_START_TIMESTAMP)
@@ -63,24 +114,37 @@ class MockPositionReader(log_reader_base.LogReaderBase):
         print(f"Log close options: {log_close_options}")
         pass
 
+    def num_messages(self) -> int:
+        return len(self._opened_trajectory().x)
+
+    def seek_to_message(self, index: int) -> None:
+        self._counter = index
+
     def read_message(self) -> log_reader_base.LogReadType:
-        if self._counter >= len(self._gps_data) - 1:
+        if self._counter >= self.num_messages():
             raise StopIteration()
 
-        gps_point = self._gps_data[self._counter]
+        fake_epoch_time = self.message_time(self._counter)
+        pose_message: typing.Union[PoseMessage, output_cache.CachedOutput, None] = None
+        if self._lookup_cached_output is not None:
+            pose_message = self._lookup_cached_output(constants.MOCK_POSE_TOPIC, fake_epoch_time)
+        if pose_message is None:
+            trajectory = self._opened_trajectory()
+            i = self._counter
+            pose_message = PoseMessage(
+                float(trajectory.x[i]),
+                float(trajectory.y[i]),
+                float(trajectory.x_vel[i]),
+                float(trajectory.y_vel[i]),
+                float(trajectory.yaw[i]),
+            )
 
-        if self._counter < len(self._gps_data) - 1:
-            next_gps_point = self._gps_data[self._counter + 1]
-        else:
-            next_gps_point = self._gps_data[self._counter]
+        self._counter += 1
+        return log_reader_base.LogReadType(constants.MOCK_POSE_TOPIC, pose_message, fake_epoch_time)
 
-        lat = gps_point['lat']
-        long = gps_point['long']
-        next_lat = next_gps_point['lat']
-        next_long = next_gps_point['long']
+    def _opened_trajectory(self) -> Trajectory:
+        assert self._trajectory is not None, "open() must be called before reading"
+        return self._trajectory
 
-        fake_epoch_time = MOCK_START_TIMESTAMP + datetime.timedelta(
-            milliseconds=self._counter * 100
-        )
-        self._counter += 1
-        return log_reader_base.LogReadType(constants.MOCK_POSE_TOPIC, GPSPoseMessage(lat, long, next_lat, next_long), fake_epoch_time)
+    def message_time(self, index: int) -> datetime.datetime:
+        return MOCK_START_TIMESTAMP + datetime.timedelta(milliseconds=index * 100)
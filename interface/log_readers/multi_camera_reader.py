@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import concurrent.futures
+import datetime
+import os
+import typing
+
+import constants
+import data_sender as data_sender_module
+from log_readers import mock_camera_reader
+from log_readers import read_ahead
+import numpy as np
+
+from simian.public.proto.v2 import io_pb2
+from strada.public.log_readers import log_reader_base
+
+
+class MultiCameraReader(mock_camera_reader.MockCameraReader):
+    """Reads the frames of all requested PandaSet cameras in one reader.
+
+    The images of a frame are fetched and decoded concurrently, one thread per camera, so
+    a frame of all cameras takes about as long as a frame of one. Each frame is read as one
+    message per camera, in camera order, on the topics in `constants.CAMERA_TOPICS`.
+    """
+
+    def __init__(
+        self,
+        configuration: dict[typing.Any, typing.Any],
+        data_sender: data_sender_module.DataSender,
+    ) -> None:
+        super().__init__(configuration, data_sender)
+
+        # Indices into constants.PANDASET_CAMERAS of the cameras whose channels are requested.
+        channel_names = configuration.get("channel_names") or constants.CAMERA_CHANNELS
+        self._cameras = [
+            camera
+            for camera, channel in enumerate(constants.CAMERA_CHANNELS)
+            if channel in channel_names
+        ]
+        self._camera_paths: list[str] = []
+        self._fetch_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(len(self._cameras), 1), thread_name_prefix="camera_fetch"
+        )
+        self._frame_read_ahead: typing.Optional[
+            read_ahead.ReadAhead[list[mock_camera_reader.CameraMessage]]
+        ] = None
+
+        # The images of the frame being read, handed out one camera at a time.
+        self._frame: typing.Optional[list[mock_camera_reader.CameraMessage]] = None
+        self._frame_index = -1
+
+    def open(
+        self, _path: log_reader_base.LogPath, log_open_options: io_pb2.LogOpenOptions
+    ) -> io_pb2.LogOpenOutput:
+        self._camera_paths = [
+            os.path.join(log_open_options.path, "camera", constants.PANDASET_CAMERAS[camera])
+            for camera in self._cameras
+        ]
+
+        # The cameras are triggered together, so a frame is complete once every camera has it.
+        # Its time is the one of the first camera.
+        frame_offsets_us = list(
+            self._fetch_executor.map(self._read_frame_offsets_us, self._camera_paths)
+        )
+        self._num_frames = min((len(offsets) for offsets in frame_offsets_us), default=0)
+        if frame_offsets_us:
+            self._frame_offsets_us = frame_offsets_us[0][: self._num_frames]
+        # Listed concurrently too, only up to the frames every camera has.
+        list(
+            self._fetch_executor.map(
+                self._load_manifest,
+                self._camera_paths,
+                [self._num_frames] * len(self._camera_paths),
+            )
+        )
+        for camera_path in self._camera_paths:
+            self._load_calibration(log_open_options.path, camera_path)
+
+        if self._read_ahead_frames > 0:
+            self._frame_read_ahead = read_ahead.ReadAhead(
+                self._fetch_frame_images,
+                self._read_ahead_frames,
+                start_index=self._counter // max(len(self._cameras), 1),
+                stop_index=self._num_frames,
+                memory_budget=self._memory_budget,
+            )
+        output = io_pb2.LogOpenOutput()
+        output.start_timestamp.FromDatetime(mock_camera_reader.MOCK_START_TIMESTAMP)
+        return output
+
+    def close(self, log_close_options: io_pb2.LogCloseOptions) -> None:
+        print(f"Closing multi-camera reader for {self._counter} messages")
+        print(f"Log close options: {log_close_options}")
+        if self._frame_read_ahead is not None:
+            self._frame_read_ahead.close()
+            self._frame_read_ahead = None
+        self._fetch_executor.shutdown(wait=True, cancel_futures=True)
+        self._frame = None
+
+    def num_messages(self) -> int:
+        return self._num_frames * len(self._cameras)
+
+    def seek_to_message(self, index: int) -> None:
+        self._counter = index
+        self._frame = None
+        self._frame_index = -1
+        if self._frame_read_ahead is not None:
+            self._frame_read_ahead.seek(index // len(self._cameras))
+
+    def read_message(self) -> log_reader_base.LogReadType:
+        if self._counter >= self.num_messages():
+            raise StopIteration()
+        frame_index, camera = divmod(self._counter, len(self._cameras))
+        if frame_index != self._frame_index:
+            if self._frame_read_ahead is not None:
+                self._frame = self._frame_read_ahead.next()
+            else:
+                self._frame = self._fetch_frame_images(frame_index)
+            self._frame_index = frame_index
+        if self._frame is None:
+            raise StopIteration()
+
+        camera_data = self._frame[camera]
+        if camera == len(self._cameras) - 1:
+            # Release the frame as soon as its last image is handed out.
+            self._frame = None
+            self._frame_index = -1
+
+        fake_epoch_time = self.message_time(self._counter)
+        self._counter += 1
+        return log_reader_base.LogReadType(
+            constants.CAMERA_TOPICS[self._cameras[camera]],
+            camera_data,
+            fake_epoch_time,
+        )
+
+    def message_time(self, index: int) -> datetime.datetime:
+        return self._frame_time(index // len(self._cameras))
+
+    def timestamps_ns(self) -> np.ndarray:
+        # All cameras of a frame share its timestamp.
+        return np.repeat(self._frame_timestamps_ns(), len(self._cameras))
+
+    def _fetch_frame_images(self, index: int) -> list[mock_camera_reader.CameraMessage]:
+        """Downloads and decodes the images of all cameras of a frame concurrently.
+
+        This is called from the read-ahead threads when read-ahead is enabled.
+        """
+        return list(
+            self._fetch_executor.map(
+                self._fetch_image,
+                self._camera_paths,
+                [index] * len(self._cameras),
+                [constants.CAMERA_TOPICS[camera] for camera in self._cameras],
+            )
+        )
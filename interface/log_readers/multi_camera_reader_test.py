@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import unittest
+
+from benchmarks import pandaset_fixtures
+import constants
+import data_sender
+import multi_camera_reader
+import numpy as np
+import scheduled_reader
+import storage
+
+from simian.public.proto.v2 import io_pb2
+
+LOG_PATH = "sequence"
+NUM_FRAMES = 3
+
+
+class MultiCameraReaderTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._temp_dir.cleanup)
+        pandaset_fixtures.write_sequence(
+            self._temp_dir.name,
+            LOG_PATH,
+            num_frames=NUM_FRAMES,
+            points_per_frame=10,
+            image_shape=(16, 24),
+            cameras=constants.PANDASET_CAMERAS,
+        )
+
+    def _open_reader(self, read_ahead_frames: int) -> multi_camera_reader.MultiCameraReader:
+        reader = multi_camera_reader.MultiCameraReader(
+            {
+                "channel_names": ["camera_0", "camera_3", "lidar_0"],
+                "storage": storage.LocalStorage(self._temp_dir.name),
+                "read_ahead_frames": read_ahead_frames,
+            },
+            data_sender.FakeDataSender(),
+        )
+        reader.open("", io_pb2.LogOpenOptions(path=LOG_PATH))
+        self.addCleanup(reader.close, io_pb2.LogCloseOptions())
+        return reader
+
+    def test_reads_requested_cameras_of_each_frame(self) -> None:
+        for read_ahead_frames in (0, 2):
+            reader = self._open_reader(read_ahead_frames)
+            messages = list(reader)
+
+            self.assertEqual(reader.num_messages(), 2 * NUM_FRAMES)
+            self.assertEqual(
+                [message.topic for message in messages],
+                [constants.CAMERA_TOPICS[0], constants.CAMERA_TOPICS[3]] * NUM_FRAMES,
+            )
+            self.assertEqual((messages[0].message.height, messages[0].message.width), (16, 24))
+            # Both cameras of a frame share its timestamp.
+            timestamps_ns = reader.timestamps_ns()
+            np.testing.assert_array_equal(timestamps_ns[::2], timestamps_ns[1::2])
+            self.assertTrue(np.all(np.diff(timestamps_ns[::2]) > 0))
+
+    def test_frame_times_follow_timestamps(self) -> None:
+        # The frames are placed as far apart as their timestamps, which need not be evenly
+        # spaced. The times of the first camera are used for the whole frame.
+        camera_path = os.path.join(self._temp_dir.name, LOG_PATH, "camera", "front_camera")
+        with open(os.path.join(camera_path, "timestamps.json"), "w") as f:
+            json.dump([1557540883.0, 1557540883.1004, 1557540883.25], f)
+        reader = self._open_reader(read_ahead_frames=0)
+
+        timestamps_ns = reader.timestamps_ns()
+        np.testing.assert_array_equal(
+            timestamps_ns[::2] - timestamps_ns[0], [0, 100_400_000, 250_000_000]
+        )
+        self.assertEqual(
+            [
+                scheduled_reader.datetime_to_ns(reader.message_time(i))
+                for i in range(reader.num_messages())
+            ],
+            timestamps_ns.tolist(),
+        )
+
+    def test_seek_to_second_camera_of_frame(self) -> None:
+        reader = self._open_reader(read_ahead_frames=2)
+        reader.seek_to_message(3)
+        self.assertEqual(
+            [message.topic for message in reader],
+            [constants.CAMERA_TOPICS[3], constants.CAMERA_TOPICS[0], constants.CAMERA_TOPICS[3]],
+        )
+
+    def test_frames_listed_when_opened(self) -> None:
+        reader = self._open_reader(read_ahead_frames=0)
+        image_bytes = sum(
+            os.path.getsize(os.path.join(self._temp_dir.name, LOG_PATH, "camera", camera, name))
+            for camera in ("front_camera", "left_camera")
+            for name in ("00.jpg", "01.jpg", "02.jpg")
+        )
+        self.assertEqual(reader.total_bytes(), image_bytes)
+
+        os.remove(os.path.join(self._temp_dir.name, LOG_PATH, "camera/left_camera/01.jpg"))
+        with self.assertRaisesRegex(FileNotFoundError, "1 of 3 frames are missing"):
+            self._open_reader(read_ahead_frames=0)
+
+    def test_fetch_errors_are_raised(self) -> None:
+        reader = self._open_reader(read_ahead_frames=2)
+        # A frame that disappears after the log is opened fails the conversion instead of
+        # ending it early.
+        os.remove(os.path.join(self._temp_dir.name, LOG_PATH, "camera/front_camera/02.jpg"))
+        with self.assertRaises(FileNotFoundError):
+            list(reader)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+"""Packs the per-frame pickled lidar clouds of a PandaSet sequence into a single
+memory-mappable file, read by MockLidarReader when `lidar_format` is `packed`.
+
+Example, from /interface:
+    python -m log_readers.pack_lidar_sequence --log_path Pandaset/001 --storage local
+"""
+from __future__ import annotations
+
+import argparse
+import os
+
+import data_sender
+from log_readers import mock_lidar_reader
+from log_readers import packed_lidar
+import storage
+
+from simian.public.proto.v2 import io_pb2
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--log_path", type=str, required=True, help="Log prefix, eg Pandaset/001")
+    parser.add_argument("--storage", type=str, default="s3", choices=["s3", "local"])
+    parser.add_argument("--local_root", type=str, default=storage.DEFAULT_LOCAL_ROOT)
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help=f"Output file. Defaults to <log>/lidar/{packed_lidar.PACKED_SEQUENCE_NAME} "
+        "below --local_root, upload it next to the clouds when converting from S3.",
+    )
+    args = parser.parse_args()
+
+    configuration = {
+        "storage": storage.create_storage(
+            {"storage": args.storage, "local_root": args.local_root}
+        ),
+        "lidar_format": "pickle",
+    }
+    reader = mock_lidar_reader.MockLidarReader(configuration, data_sender.FakeDataSender())
+    reader.open(args.log_path, io_pb2.LogOpenOptions(path=args.log_path))
+    clouds = [read_message.message.points for read_message in reader]
+    reader.close(io_pb2.LogCloseOptions())
+
+    output = args.output or os.path.join(
+        args.local_root, args.log_path, "lidar", packed_lidar.PACKED_SEQUENCE_NAME
+    )
+    with open(output, "wb") as f:
+        f.write(packed_lidar.pack_sequence(clouds))
+    print(f"Packed {len(clouds)} clouds into {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import struct
+import typing
+
+import numpy as np
+
+# Name of the packed sequence file, stored next to the per-frame clouds in `<log>/lidar/`.
+PACKED_SEQUENCE_NAME = "sequence.packed"
+
+MAGIC = b"PLDR"
+VERSION = 1
+NUM_COLUMNS = 4  # x, y, z, intensity
+
+# magic, version, num_frames, num_columns, total_points, data_offset
+HEADER_FORMAT = "<4sIIIQQ"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+# The point columns start on a 64 byte boundary so every column view is aligned.
+DATA_ALIGNMENT = 64
+
+
+def _data_offset(num_frames: int) -> int:
+    index_end = HEADER_SIZE + (num_frames + 1) * 8
+    return -(-index_end // DATA_ALIGNMENT) * DATA_ALIGNMENT
+
+
+def pack_sequence(clouds: typing.Sequence[np.ndarray]) -> bytearray:
+    """Packs a sequence of Nx4 (x, y, z, intensity) clouds into a single buffer.
+
+    Layout (little endian):
+        * header (HEADER_FORMAT)
+        * uint64 frame offsets, num_frames + 1 entries. Frame i spans points
+          [offsets[i], offsets[i + 1]).
+        * float32 columns, NUM_COLUMNS x total_points, starting at data_offset.
+    """
+    offsets = np.zeros(len(clouds) + 1, dtype="<u8")
+    np.cumsum([cloud.shape[0] for cloud in clouds], out=offsets[1:])
+    total_points = int(offsets[-1])
+    data_offset = _data_offset(len(clouds))
+
+    buffer = bytearray(data_offset + NUM_COLUMNS * total_points * 4)
+    struct.pack_into(
+        HEADER_FORMAT, buffer, 0, MAGIC, VERSION, len(clouds), NUM_COLUMNS, total_points, data_offset
+    )
+    np.frombuffer(buffer, dtype="<u8", count=len(offsets), offset=HEADER_SIZE)[:] = offsets
+
+    columns = np.frombuffer(buffer, dtype="<f4", offset=data_offset).reshape(
+        NUM_COLUMNS, total_points
+    )
+    for i, cloud in enumerate(clouds):
+        columns[:, offsets[i] : offsets[i + 1]] = cloud[:, :NUM_COLUMNS].T
+    return buffer
+
+
+class PackedLidarSequence:
+    """Read-only view over a packed lidar sequence.
+
+    Frames are returned as views into the underlying buffer, so reading a frame from a
+    memory-mapped file only touches the pages of that frame.
+    """
+
+    def __init__(self, buffer: typing.Any) -> None:
+        magic, version, num_frames, num_columns, total_points, data_offset = (
+            struct.unpack_from(HEADER_FORMAT, buffer, 0)
+        )
+        if magic != MAGIC or version != VERSION or num_columns != NUM_COLUMNS:
+            raise ValueError(
+                f"Not a packed lidar sequence (magic {magic!r}, version {version}, columns {num_columns})"
+            )
+        self._offsets = np.frombuffer(buffer, dtype="<u8", count=num_frames + 1, offset=HEADER_SIZE)
+        self._columns = np.frombuffer(
+            buffer, dtype="<f4", count=NUM_COLUMNS * total_points, offset=data_offset
+        ).reshape(NUM_COLUMNS, total_points)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def frame(self, index: int) -> np.ndarray:
+        """Returns frame `index` as an Nx4 float32 view."""
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return np.asarray(self._columns[:, start:end].T)
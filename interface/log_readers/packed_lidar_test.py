@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import unittest
+
+import numpy as np
+import packed_lidar
+
+
+class PackedLidarTest(unittest.TestCase):
+    def test_round_trip(self) -> None:
+        rng = np.random.default_rng(0)
+        clouds = [rng.normal(size=(n, 4)) for n in (5, 0, 17)]
+
+        sequence = packed_lidar.PackedLidarSequence(packed_lidar.pack_sequence(clouds))
+
+        self.assertEqual(len(sequence), len(clouds))
+        for i, cloud in enumerate(clouds):
+            frame = sequence.frame(i)
+            self.assertEqual(frame.shape, cloud.shape)
+            self.assertEqual(frame.dtype, np.float32)
+            np.testing.assert_allclose(frame, cloud.astype(np.float32))
+
+    def test_rejects_other_formats(self) -> None:
+        with self.assertRaises(ValueError):
+            packed_lidar.PackedLidarSequence(bytes(packed_lidar.HEADER_SIZE))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import collections
+import concurrent.futures
+import typing
+
+import memory_budget as memory_budget_module
+
+T = typing.TypeVar("T")
+
+# Callable that fetches a single frame by index, returning None past the end of the sequence.
+FetchFunction = typing.Callable[[int], typing.Optional[T]]
+
+
+class ReadAhead(typing.Generic[T]):
+    """Keeps up to `window` frames in flight on a bounded thread pool and hands them
+    back in frame order.
+
+    Frames that have been fetched but not yet consumed stay inside the window, which is
+    refilled as soon as a frame is handed back, so at most `window + 1` frames are held in
+    memory at any time: the window and the frame the consumer is working on. Once `fetch` returns None for an
+    index, no further frames are returned. When the number of frames is known up front,
+    `stop_index` keeps frames past the end from being requested at all.
+
+    With a `memory_budget`, frames are charged against it from the time they are requested
+    until they are handed back. Frames in flight are charged the size of the last fetched
+    frame until their own size is known. No further frames are requested while the
+    budget has no room for one, except for the next frame, so the consumer never waits on
+    the budget.
+    """
+
+    def __init__(
+        self,
+        fetch: FetchFunction[T],
+        window: int,
+        start_index: int = 0,
+        stop_index: typing.Optional[int] = None,
+        max_workers: typing.Optional[int] = None,
+        memory_budget: typing.Optional[memory_budget_module.MemoryBudget] = None,
+    ) -> None:
+        if window < 1:
+            raise ValueError(f"Read-ahead window must be at least 1, got {window}")
+        self._fetch = fetch
+        self._window = window
+        self._next_index = start_index
+        self._stop_index = stop_index
+        self._memory_budget = memory_budget
+        # Size of the last fetched frame, None until a frame was fetched.
+        self._frame_nbytes: typing.Optional[int] = None
+        self._exhausted = False
+        # Frames in flight, with the number of bytes charged for them when requested.
+        self._pending: collections.deque[
+            tuple[concurrent.futures.Future[typing.Optional[T]], int]
+        ] = collections.deque()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers or window, thread_name_prefix="read_ahead"
+        )
+
+    def next(self) -> typing.Optional[T]:
+        """Returns the next frame in order, blocking until it is available."""
+        self._fill()
+        if not self._pending:
+            return None
+
+        frame = self._pending.popleft()[0].result()
+        self._release(frame)
+        if frame is None:
+            self._exhausted = True
+            self._cancel_pending()
+        else:
+            self._fill()
+        return frame
+
+    def seek(self, index: int) -> None:
+        """Makes `index` the next frame returned. Frames already in flight are discarded."""
+        self._cancel_pending()
+        self._next_index = index
+        self._exhausted = False
+
+    def close(self) -> None:
+        self._exhausted = True
+        self._cancel_pending()
+        self._executor.shutdown(wait=False)
+
+    def _fill(self) -> None:
+        while not self._exhausted and len(self._pending) < self._window:
+            if self._stop_index is not None and self._next_index >= self._stop_index:
+                break
+            reserved_bytes = 0
+            if self._memory_budget is not None:
+                if self._pending and (
+                    # The size of a frame is only known once one was fetched.
+                    self._frame_nbytes is None
+                    or not self._memory_budget.try_prefetch(self._frame_nbytes)
+                ):
+                    break
+                reserved_bytes = self._frame_nbytes or 0
+                self._memory_budget.charge(reserved_bytes)
+            future = self._executor.submit(self._fetch_charged, self._next_index, reserved_bytes)
+            self._pending.append((future, reserved_bytes))
+            self._next_index += 1
+
+    def _fetch_charged(self, index: int, reserved_bytes: int) -> typing.Optional[T]:
+        if self._memory_budget is None:
+            return self._fetch(index)
+        try:
+            frame = self._fetch(index)
+        except BaseException:
+            self._memory_budget.release(reserved_bytes)
+            raise
+        # The frame is charged its own size in place of the reservation.
+        num_bytes = memory_budget_module.estimate_nbytes(frame) if frame is not None else 0
+        if frame is not None:
+            self._frame_nbytes = num_bytes
+        self._memory_budget.charge(num_bytes - reserved_bytes)
+        return frame
+
+    def _release(self, frame: typing.Optional[T]) -> None:
+        if self._memory_budget is not None and frame is not None:
+            self._memory_budget.release(memory_budget_module.estimate_nbytes(frame))
+
+    def _release_discarded(self, future: concurrent.futures.Future[typing.Optional[T]]) -> None:
+        if not future.cancelled() and future.exception() is None:
+            self._release(future.result())
+
+    def _cancel_pending(self) -> None:
+        while self._pending:
+            future, reserved_bytes = self._pending.popleft()
+            if future.cancel():
+                if self._memory_budget is not None:
+                    self._memory_budget.release(reserved_bytes)
+            else:
+                # Frames already being fetched are released once they are done.
+                future.add_done_callback(self._release_discarded)
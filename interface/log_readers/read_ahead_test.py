@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import threading
+import time
+import typing
+import unittest
+
+from log_readers import read_ahead
+
+
+class _Fetcher:
+    """Fetches frame `index` as `index`, or None from `num_frames` on, after a delay that
+    varies between frames so they finish out of order. Keeps track of the fetched frames
+    that were not handed back yet."""
+
+    def __init__(self, num_frames: int) -> None:
+        self._num_frames = num_frames
+        self._lock = threading.Lock()
+        self.fetched: list[int] = []
+        self.held = 0
+        self.max_held = 0
+
+    def __call__(self, index: int) -> typing.Optional[int]:
+        time.sleep(index * 7 % 5 * 4e-4)
+        with self._lock:
+            self.fetched.append(index)
+            if index >= self._num_frames:
+                return None
+            self.held += 1
+            self.max_held = max(self.max_held, self.held)
+        return index
+
+    def consume(self, frame: typing.Optional[int]) -> typing.Optional[int]:
+        if frame is not None:
+            with self._lock:
+                self.held -= 1
+        return frame
+
+
+class ReadAheadTest(unittest.TestCase):
+    def _read_all(
+        self, reader: read_ahead.ReadAhead[int], fetcher: _Fetcher
+    ) -> list[typing.Optional[int]]:
+        frames = []
+        while True:
+            frame = fetcher.consume(reader.next())
+            frames.append(frame)
+            if frame is None:
+                return frames
+
+    def test_returns_frames_in_order(self) -> None:
+        fetcher = _Fetcher(num_frames=50)
+        reader = read_ahead.ReadAhead(fetcher, window=4, start_index=5)
+        self.addCleanup(reader.close)
+        self.assertEqual(self._read_all(reader, fetcher), [*range(5, 50), None])
+        # The window and the frame handed back last.
+        self.assertLessEqual(fetcher.max_held, 4 + 1)
+
+    def test_stops_after_fetch_returns_none(self) -> None:
+        fetcher = _Fetcher(num_frames=10)
+        reader = read_ahead.ReadAhead(fetcher, window=4)
+        self.addCleanup(reader.close)
+        self.assertEqual(self._read_all(reader, fetcher), [*range(10), None])
+        num_fetched = len(fetcher.fetched)
+        # Frames requested past the end are bounded by the window.
+        self.assertLessEqual(num_fetched, 10 + 4)
+        self.assertIsNone(reader.next())
+        self.assertEqual(len(fetcher.fetched), num_fetched)
+
+    def test_stop_index(self) -> None:
+        fetcher = _Fetcher(num_frames=10)
+        reader = read_ahead.ReadAhead(fetcher, window=4, stop_index=6)
+        self.addCleanup(reader.close)
+        self.assertEqual(self._read_all(reader, fetcher), [*range(6), None])
+        # Frames past the stop index are never requested.
+        self.assertEqual(sorted(fetcher.fetched), list(range(6)))
+
+    def test_seek(self) -> None:
+        fetcher = _Fetcher(num_frames=10)
+        reader = read_ahead.ReadAhead(fetcher, window=3)
+        self.addCleanup(reader.close)
+        self.assertEqual(reader.next(), 0)
+        reader.seek(7)
+        self.assertEqual([reader.next() for _ in range(4)], [7, 8, 9, None])
+        reader.seek(2)
+        self.assertEqual(reader.next(), 2)
+
+    def test_window_must_be_positive(self) -> None:
+        with self.assertRaises(ValueError):
+            read_ahead.ReadAhead(_Fetcher(num_frames=1), window=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import datetime
+
+import numpy as np
+
+from strada.public.log_readers import log_reader_base
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def datetime_to_ns(dt: datetime.datetime) -> int:
+    return (dt - _EPOCH) // datetime.timedelta(microseconds=1) * 1000
+
+
+class ScheduledLogReader(log_reader_base.LogReaderBase):
+    """A log reader that knows how many messages it will produce and when each of them
+    occurs as soon as the log is opened.
+
+    This lets the conversion schedule all messages up front instead of comparing them
+    as they are read, and start reading at any message without reading the ones before it.
+    """
+
+    def num_messages(self) -> int:
+        raise NotImplementedError()
+
+    def message_time(self, index: int) -> datetime.datetime:
+        raise NotImplementedError()
+
+    def seek_to_message(self, index: int) -> None:
+        """Makes message `index` the next message read, without reading any messages."""
+        raise NotImplementedError()
+
+    def seek(self, timestamp_ns: int) -> int:
+        """Makes the first message at or after `timestamp_ns` the next message read.
+        Returns its index."""
+        index = int(np.searchsorted(self.timestamps_ns(), timestamp_ns, side="left"))
+        self.seek_to_message(index)
+        return index
+
+    def total_bytes(self) -> int:
+        """Bytes of the files the reader downloads to read every message, or 0 if they are
+        not known once the log is opened."""
+        return 0
+
+    def timestamps_ns(self) -> np.ndarray:
+        """Timestamps of all messages in nanoseconds, in the order they are read."""
+        return np.array(
+            [datetime_to_ns(self.message_time(i)) for i in range(self.num_messages())],
+            dtype=np.int64,
+        )
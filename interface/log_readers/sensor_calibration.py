@@ -0,0 +1,171 @@
+"""Per-frame sensor poses and camera intrinsics from PandaSet calibration files.
+
+PandaSet ships, next to the frames of every sensor, a `poses.json` with the pose of the
+sensor in the world frame at each frame, and for cameras an `intrinsics.json`. The poses
+are converted to the ego frame in one vectorized pass when a log is opened, and the pose
+protos of all frames are built up front, so converting a frame only picks one by index.
+"""
+from __future__ import annotations
+
+import json
+import os
+import typing
+
+import numpy as np
+import storage as storage_module
+
+from simian.public.proto import spatial_pb2
+from simian.public.transforms import proto_util
+from simian.public.transforms import spatial_py
+
+POSES_FILE_NAME = "poses.json"
+INTRINSICS_FILE_NAME = "intrinsics.json"
+
+# PandaSet's ego frame is the frame of the lidar, whose poses are the vehicle's.
+EGO_SENSOR_PATH = "lidar"
+
+# Rotation from the body axes of a camera (x forward, y left, z up) to its optical axes
+# (x right, y down, z forward), in which PandaSet gives the camera poses.
+OPTICAL_FROM_BODY = np.array([[0.0, -1.0, 0.0], [0.0, 0.0, -1.0], [1.0, 0.0, 0.0]])
+
+
+class CameraIntrinsics(typing.NamedTuple):
+    fx: float
+    fy: float
+    cx: float
+    cy: float
+
+
+class SensorCalibration(typing.NamedTuple):
+    """The poses of a sensor in the ego frame, one per frame."""
+
+    positions: np.ndarray  # Nx3 x, y, z
+    roll_pitch_yaw: np.ndarray  # Nx3
+    pose_protos: list[spatial_pb2.Pose]
+    intrinsics: typing.Optional[CameraIntrinsics] = None
+
+    def __len__(self) -> int:
+        return len(self.pose_protos)
+
+    def pose_proto(self, frame: int) -> spatial_pb2.Pose:
+        return self.pose_protos[frame]
+
+
+def read_poses(poses: list[dict[str, typing.Any]]) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the Nx3 positions and Nx3x3 rotation matrices of PandaSet poses, each a
+    `position` {x, y, z} and a `heading` quaternion {w, x, y, z}."""
+    positions = np.array(
+        [[pose["position"][axis] for axis in "xyz"] for pose in poses], dtype=np.float64
+    ).reshape(-1, 3)
+    quaternions = np.array(
+        [[pose["heading"][axis] for axis in "wxyz"] for pose in poses], dtype=np.float64
+    ).reshape(-1, 4)
+    return positions, quaternions_to_matrices(quaternions)
+
+
+def quaternions_to_matrices(quaternions: np.ndarray) -> np.ndarray:
+    """Converts Nx4 (w, x, y, z) quaternions to Nx3x3 rotation matrices."""
+    w, x, y, z = (quaternions / np.linalg.norm(quaternions, axis=1, keepdims=True)).T
+    return np.stack(
+        [
+            np.stack([1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)], -1),
+            np.stack([2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)], -1),
+            np.stack([2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)], -1),
+        ],
+        axis=1,
+    )
+
+
+def matrices_to_roll_pitch_yaw(rotations: np.ndarray) -> np.ndarray:
+    """Converts Nx3x3 rotation matrices to Nx3 (roll, pitch, yaw), rotations about the
+    fixed x, y and z axes, in that order."""
+    roll = np.arctan2(rotations[:, 2, 1], rotations[:, 2, 2])
+    pitch = np.arcsin(np.clip(-rotations[:, 2, 0], -1.0, 1.0))
+    yaw = np.arctan2(rotations[:, 1, 0], rotations[:, 0, 0])
+    return np.stack([roll, pitch, yaw], axis=-1)
+
+
+def relative_poses(
+    positions: np.ndarray,
+    rotations: np.ndarray,
+    reference_positions: np.ndarray,
+    reference_rotations: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Expresses world poses in the frames of reference poses, frame by frame."""
+    world_to_reference = np.swapaxes(reference_rotations, 1, 2)
+    offsets = positions - reference_positions
+    return np.einsum("nij,nj->ni", world_to_reference, offsets), world_to_reference @ rotations
+
+
+def build_calibration(
+    positions: np.ndarray,
+    rotations: np.ndarray,
+    intrinsics: typing.Optional[CameraIntrinsics] = None,
+) -> SensorCalibration:
+    roll_pitch_yaw = matrices_to_roll_pitch_yaw(rotations)
+    pose_protos = [
+        proto_util.pose3d_to_proto(
+            spatial_py.Pose3d.create_with_roll_pitch_yaw(*position, *angles)
+        )
+        for position, angles in zip(positions.tolist(), roll_pitch_yaw.tolist())
+    ]
+    return SensorCalibration(positions, roll_pitch_yaw, pose_protos, intrinsics)
+
+
+def load_world_poses(
+    storage: storage_module.Storage, log_path: str, sensor_path: str
+) -> typing.Optional[tuple[np.ndarray, np.ndarray]]:
+    """Loads the Nx3 positions and Nx3x3 rotations of the sensor at
+    `<log_path>/<sensor_path>` in the world frame. Returns None for sequences without
+    calibration files."""
+    try:
+        return read_poses(_read_json(storage, log_path, sensor_path, POSES_FILE_NAME))
+    except FileNotFoundError:
+        return None
+
+
+def world_to_sensor_transforms(positions: np.ndarray, rotations: np.ndarray) -> np.ndarray:
+    """Returns the Nx3x4 [R | t] transforms from the world frame to the frames of the sensor
+    poses, such that `R @ point + t` expresses a world point in the sensor frame."""
+    world_to_sensor = np.swapaxes(rotations, 1, 2)
+    translations = -np.einsum("nij,nj->ni", world_to_sensor, positions)
+    return np.concatenate([world_to_sensor, translations[:, :, np.newaxis]], axis=2)
+
+
+def load_sensor_calibration(
+    storage: storage_module.Storage, log_path: str, sensor_path: str, camera: bool = False
+) -> typing.Optional[SensorCalibration]:
+    """Loads the poses of the sensor at `<log_path>/<sensor_path>` in the ego frame, and the
+    intrinsics of cameras. Returns None for sequences without calibration files, whose
+    frames keep the default pose of their channel handler."""
+    world_poses = load_world_poses(storage, log_path, sensor_path)
+    ego_poses = load_world_poses(storage, log_path, EGO_SENSOR_PATH)
+    if world_poses is None or ego_poses is None:
+        return None
+    (positions, rotations), (ego_positions, ego_rotations) = world_poses, ego_poses
+    num_frames = min(len(positions), len(ego_positions))
+    positions, rotations = relative_poses(
+        positions[:num_frames],
+        rotations[:num_frames],
+        ego_positions[:num_frames],
+        ego_rotations[:num_frames],
+    )
+
+    intrinsics = None
+    if camera:
+        rotations = rotations @ OPTICAL_FROM_BODY
+        try:
+            values = _read_json(storage, log_path, sensor_path, INTRINSICS_FILE_NAME)
+        except FileNotFoundError:
+            pass
+        else:
+            intrinsics = CameraIntrinsics(
+                *(float(values[field]) for field in CameraIntrinsics._fields)
+            )
+    return build_calibration(positions, rotations, intrinsics)
+
+
+def _read_json(
+    storage: storage_module.Storage, log_path: str, sensor_path: str, file_name: str
+) -> typing.Any:
+    return json.loads(bytes(storage.read(os.path.join(log_path, sensor_path, file_name))))
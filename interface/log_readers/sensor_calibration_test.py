@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import tempfile
+import unittest
+
+from benchmarks import pandaset_fixtures
+import numpy as np
+import sensor_calibration
+import storage
+
+LOG_PATH = "sequence"
+NUM_FRAMES = 4
+
+
+class RotationTest(unittest.TestCase):
+    def test_roll_pitch_yaw_round_trip(self) -> None:
+        roll_pitch_yaw = np.array([[0.1, -0.2, 0.3], [0.0, 0.0, np.pi / 2], [-0.4, 0.5, -2.0]])
+        roll, pitch, yaw = roll_pitch_yaw.T
+        zeros, ones = np.zeros(3), np.ones(3)
+        rotations = (
+            np.stack(
+                [
+                    np.stack([np.cos(yaw), -np.sin(yaw), zeros], -1),
+                    np.stack([np.sin(yaw), np.cos(yaw), zeros], -1),
+                    np.stack([zeros, zeros, ones], -1),
+                ],
+                axis=1,
+            )
+            @ np.stack(
+                [
+                    np.stack([np.cos(pitch), zeros, np.sin(pitch)], -1),
+                    np.stack([zeros, ones, zeros], -1),
+                    np.stack([-np.sin(pitch), zeros, np.cos(pitch)], -1),
+                ],
+                axis=1,
+            )
+            @ np.stack(
+                [
+                    np.stack([ones, zeros, zeros], -1),
+                    np.stack([zeros, np.cos(roll), -np.sin(roll)], -1),
+                    np.stack([zeros, np.sin(roll), np.cos(roll)], -1),
+                ],
+                axis=1,
+            )
+        )
+        np.testing.assert_allclose(
+            sensor_calibration.matrices_to_roll_pitch_yaw(rotations), roll_pitch_yaw, atol=1e-12
+        )
+
+    def test_quaternions_to_matrices(self) -> None:
+        # Identity, and a quarter turn about z, not normalized.
+        rotations = sensor_calibration.quaternions_to_matrices(
+            np.array([[1.0, 0.0, 0.0, 0.0], [2.0, 0.0, 0.0, 2.0]])
+        )
+        np.testing.assert_allclose(rotations[0], np.eye(3))
+        np.testing.assert_allclose(
+            rotations[1], [[0.0, -1.0, 0.0], [1.0, 0.0, 0.0], [0.0, 0.0, 1.0]], atol=1e-12
+        )
+
+    def test_world_to_sensor_transforms(self) -> None:
+        rotations = sensor_calibration.quaternions_to_matrices(
+            np.array([[1.0, 0.0, 0.0, 0.0], [0.5, 0.5, 0.5, 0.5]])
+        )
+        positions = np.array([[1.0, 2.0, 3.0], [-4.0, 5.0, 0.5]])
+        transforms = sensor_calibration.world_to_sensor_transforms(positions, rotations)
+        self.assertEqual(transforms.shape, (2, 3, 4))
+        # A point given in the sensor frame, moved to the world frame and back.
+        sensor_point = np.array([0.3, -0.7, 1.1])
+        for transform, rotation, position in zip(transforms, rotations, positions):
+            world_point = rotation @ sensor_point + position
+            np.testing.assert_allclose(
+                transform[:, :3] @ world_point + transform[:, 3], sensor_point, atol=1e-12
+            )
+
+
+class LoadSensorCalibrationTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._temp_dir.cleanup)
+        pandaset_fixtures.write_sequence(
+            self._temp_dir.name,
+            LOG_PATH,
+            num_frames=NUM_FRAMES,
+            points_per_frame=10,
+            image_shape=(16, 24),
+            cameras=("front_camera", "left_camera"),
+        )
+        self._storage = storage.LocalStorage(self._temp_dir.name)
+
+    def test_camera_poses_in_ego_frame(self) -> None:
+        front = sensor_calibration.load_sensor_calibration(
+            self._storage, LOG_PATH, "camera/front_camera", camera=True
+        )
+        left = sensor_calibration.load_sensor_calibration(
+            self._storage, LOG_PATH, "camera/left_camera", camera=True
+        )
+        self.assertEqual(len(front), NUM_FRAMES)
+        # The cameras are fixed to the vehicle, so their extrinsics are the same every frame
+        # even though the vehicle moves and turns.
+        np.testing.assert_allclose(front.positions, [[0.5, 0.0, 1.5]] * NUM_FRAMES, atol=1e-9)
+        np.testing.assert_allclose(front.roll_pitch_yaw, np.zeros((NUM_FRAMES, 3)), atol=1e-9)
+        np.testing.assert_allclose(
+            left.roll_pitch_yaw, [[0.0, 0.0, np.pi / 2]] * NUM_FRAMES, atol=1e-9
+        )
+        self.assertAlmostEqual(left.pose_proto(2).yaw, np.pi / 2)
+        self.assertEqual(front.intrinsics.fx, 1970.0)
+
+    def test_missing_calibration(self) -> None:
+        self.assertIsNone(
+            sensor_calibration.load_sensor_calibration(
+                self._storage, LOG_PATH, "camera/back_camera", camera=True
+            )
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,12 @@
 from __future__ import annotations
 
-from typing import Any, ClassVar
+import collections
+import threading
+from typing import Any, Optional
+
+import memory_budget as memory_budget_module
+
+DEFAULT_MESSAGES_PER_TOPIC = 1
 
 
 class Mailbox:
@@ -8,10 +14,89 @@ class Mailbox:
     the channel handlers.
 
     This implementation tracks the latest converted ADP channel data and the latest
-    messages that were read from logs.
+    messages that were read from logs. Each conversion owns its mailbox, so several
+    conversions can run in one process. Only the last `messages_per_topic` messages of
+    each topic are kept, and outputs are released once ADP frees them. The messages and
+    outputs kept are charged against the `memory_budget` of the conversion, if any.
     """
 
-    # Hold all the latest messages from the log(s).
-    latest_messages: ClassVar[dict[str, Any]] = {}
-    # Hold all the latest proto outputs AFTER conversion to ADP.
-    latest_outputs: ClassVar[dict[str, Any]] = {}
+    def __init__(
+        self,
+        messages_per_topic: int = DEFAULT_MESSAGES_PER_TOPIC,
+        memory_budget: Optional[memory_budget_module.MemoryBudget] = None,
+    ) -> None:
+        if messages_per_topic < 1:
+            raise ValueError(f"messages_per_topic must be at least 1, got {messages_per_topic}")
+        self._messages_per_topic = messages_per_topic
+        self._memory_budget = memory_budget
+        self._lock = threading.Lock()
+        # The latest messages read from the log(s), oldest first, with their charged sizes.
+        self._messages: dict[str, collections.deque[tuple[Any, int]]] = {}
+        # The latest proto outputs AFTER conversion to ADP, with their charged sizes.
+        self._outputs: dict[str, tuple[Any, int]] = {}
+
+    def put_message(self, topic: str, message: Any) -> None:
+        """Adds the latest message of `topic`, dropping its oldest one when full."""
+        num_bytes = self._charge(message)
+        with self._lock:
+            messages = self._messages.get(topic)
+            if messages is None:
+                messages = self._messages[topic] = collections.deque(
+                    maxlen=self._messages_per_topic
+                )
+            if len(messages) == messages.maxlen:
+                self._release(messages[0][1])
+            messages.append((message, num_bytes))
+
+    def latest_message(self, topic: str) -> Optional[Any]:
+        with self._lock:
+            messages = self._messages.get(topic)
+            return messages[-1][0] if messages else None
+
+    def recent_messages(self, topic: str) -> list[Any]:
+        """Returns the kept messages of `topic`, oldest first."""
+        with self._lock:
+            return [message for message, _ in self._messages.get(topic, ())]
+
+    def put_output(self, channel: str, output: Any) -> None:
+        num_bytes = self._charge(output)
+        with self._lock:
+            previous = self._outputs.get(channel)
+            if previous is not None:
+                self._release(previous[1])
+            self._outputs[channel] = (output, num_bytes)
+
+    def latest_output(self, channel: str) -> Optional[Any]:
+        with self._lock:
+            output = self._outputs.get(channel)
+            return output[0] if output is not None else None
+
+    def release_output(self, channel: str) -> bool:
+        """Drops the reference to the output of `channel` after ADP is done with it.
+        Returns whether there was an output to drop."""
+        with self._lock:
+            output = self._outputs.pop(channel, None)
+            if output is not None:
+                self._release(output[1])
+            return output is not None
+
+    def clear(self) -> None:
+        with self._lock:
+            for messages in self._messages.values():
+                for _, num_bytes in messages:
+                    self._release(num_bytes)
+            for _, num_bytes in self._outputs.values():
+                self._release(num_bytes)
+            self._messages.clear()
+            self._outputs.clear()
+
+    def _charge(self, value: Any) -> int:
+        if self._memory_budget is None:
+            return 0
+        num_bytes = memory_budget_module.estimate_nbytes(value)
+        self._memory_budget.charge(num_bytes)
+        return num_bytes
+
+    def _release(self, num_bytes: int) -> None:
+        if self._memory_budget is not None and num_bytes:
+            self._memory_budget.release(num_bytes)
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import mailbox
+import unittest
+
+import memory_budget
+
+
+class MailboxTest(unittest.TestCase):
+    def test_keeps_latest_messages_per_topic(self) -> None:
+        box = mailbox.Mailbox(messages_per_topic=2)
+        self.assertIsNone(box.latest_message("topic"))
+        for i in range(5):
+            box.put_message("topic", i)
+        box.put_message("other_topic", "a")
+
+        self.assertEqual(box.latest_message("topic"), 4)
+        self.assertEqual(box.recent_messages("topic"), [3, 4])
+        self.assertEqual(box.recent_messages("other_topic"), ["a"])
+
+    def test_release_output(self) -> None:
+        box = mailbox.Mailbox()
+        box.put_output("channel", "output")
+        self.assertEqual(box.latest_output("channel"), "output")
+        self.assertTrue(box.release_output("channel"))
+        self.assertIsNone(box.latest_output("channel"))
+        # Releasing twice is allowed, ADP may free channels that had no output.
+        self.assertFalse(box.release_output("channel"))
+
+    def test_instances_are_independent(self) -> None:
+        first = mailbox.Mailbox()
+        second = mailbox.Mailbox()
+        first.put_message("topic", 1)
+        first.put_output("channel", 1)
+        self.assertIsNone(second.latest_message("topic"))
+        self.assertIsNone(second.latest_output("channel"))
+
+    def test_charges_memory_budget(self) -> None:
+        budget = memory_budget.MemoryBudget()
+        box = mailbox.Mailbox(messages_per_topic=2, memory_budget=budget)
+        for _ in range(3):
+            box.put_message("topic", bytes(100))
+        # The oldest message was dropped and released.
+        self.assertEqual(budget.used_bytes, 200)
+        box.put_output("channel", bytes(10))
+        box.put_output("channel", bytes(20))
+        self.assertEqual(budget.used_bytes, 220)
+        box.release_output("channel")
+        self.assertEqual(budget.used_bytes, 200)
+
+        box.clear()
+        self.assertEqual(budget.used_bytes, 0)
+        self.assertEqual(budget.peak_bytes, 300)
+
+    def test_rejects_empty_buffer(self) -> None:
+        with self.assertRaises(ValueError):
+            mailbox.Mailbox(messages_per_topic=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import collections.abc
+import threading
+import typing
+
+from google.protobuf import message as message_module
+import numpy as np
+
+# No limit, only the usage is tracked.
+UNLIMITED = 0
+
+# Estimated size of a scalar field.
+_SCALAR_NBYTES = 8
+
+
+def estimate_nbytes(value: typing.Any) -> int:
+    """Estimates the memory held by a frame: the arrays, buffers and protos it contains,
+    including those of nested tuples (such as NamedTuple messages) and lists."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, memoryview):
+        return value.nbytes
+    if isinstance(value, message_module.Message):
+        return _message_nbytes(value)
+    if isinstance(value, (tuple, list)):
+        return sum(estimate_nbytes(item) for item in value)
+    return 0
+
+
+def _message_nbytes(message: message_module.Message) -> int:
+    # Sums the bytes and string fields, which hold the images and point clouds, rather than
+    # calling ByteSize, which walks the whole encoding and costs about 1ms per MB.
+    return sum(_field_nbytes(value) for _, value in message.ListFields())
+
+
+def _field_nbytes(value: typing.Any) -> int:
+    if isinstance(value, message_module.Message):
+        return _message_nbytes(value)
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    if isinstance(value, collections.abc.Mapping):
+        return sum(_field_nbytes(key) + _field_nbytes(item) for key, item in value.items())
+    if isinstance(value, collections.abc.Sequence):
+        return sum(_field_nbytes(item) for item in value)
+    return _SCALAR_NBYTES
+
+
+class MemoryBudget:
+    """Accounts the memory of the frames a conversion holds against a limit.
+
+    Readers charge the frames they prefetch and stop prefetching while the budget has no
+    room for another frame, and the mailbox charges the messages and outputs it keeps
+    until it drops them. Charges always succeed, so a conversion can go over budget by the
+    frames it needs to make progress, but not by prefetched frames. The peak usage is kept
+    to size containers by.
+    """
+
+    def __init__(self, max_bytes: int = UNLIMITED) -> None:
+        if max_bytes < 0:
+            raise ValueError(f"Memory budget must not be negative, got {max_bytes}")
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._used_bytes = 0
+        self._peak_bytes = 0
+        # Number of times a reader held back a prefetch because the budget was exceeded.
+        self._shed_prefetches = 0
+
+    @property
+    def used_bytes(self) -> int:
+        return self._used_bytes
+
+    @property
+    def peak_bytes(self) -> int:
+        return self._peak_bytes
+
+    @property
+    def exceeded(self) -> bool:
+        return self.max_bytes != UNLIMITED and self._used_bytes >= self.max_bytes
+
+    def charge(self, num_bytes: int) -> None:
+        with self._lock:
+            self._used_bytes += num_bytes
+            self._peak_bytes = max(self._peak_bytes, self._used_bytes)
+
+    def release(self, num_bytes: int) -> None:
+        with self._lock:
+            self._used_bytes -= num_bytes
+
+    def try_prefetch(self, num_bytes: int) -> bool:
+        """Returns whether a reader may prefetch another frame of `num_bytes`, counting
+        refusals."""
+        with self._lock:
+            if self.max_bytes == UNLIMITED or self._used_bytes + num_bytes <= self.max_bytes:
+                return True
+            self._shed_prefetches += 1
+            return False
+
+    def summary(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "max_bytes": self.max_bytes,
+                "peak_bytes": self._peak_bytes,
+                "used_bytes": self._used_bytes,
+                "shed_prefetches": self._shed_prefetches,
+            }
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import threading
+import typing
+import unittest
+
+from log_readers import read_ahead
+import memory_budget
+import numpy as np
+
+from simian.public.proto import sensor_model_pb2
+
+
+class Frame(typing.NamedTuple):
+    image: np.ndarray
+    jpeg_bytes: typing.Optional[bytes] = None
+
+
+class MemoryBudgetTest(unittest.TestCase):
+    def test_estimate_nbytes(self) -> None:
+        frame = Frame(np.zeros((4, 5), dtype=np.float32), b"123")
+        self.assertEqual(memory_budget.estimate_nbytes(frame), 83)
+        self.assertEqual(memory_budget.estimate_nbytes([frame, frame]), 166)
+        self.assertEqual(memory_budget.estimate_nbytes(1.5), 0)
+
+    def test_estimate_message_nbytes(self) -> None:
+        camera_image = sensor_model_pb2.SensorOutput.CameraImage()
+        camera_image.image.image_bytes = bytes(100_000)
+        camera_image.image_shape.height = 480
+        camera_image.pose.px = 1.5
+        nbytes = memory_budget.estimate_nbytes(camera_image)
+        # The image dominates; the estimate is within the small fields of the encoded size.
+        self.assertGreaterEqual(nbytes, 100_000)
+        self.assertLess(abs(nbytes - camera_image.ByteSize()), 100)
+
+    def test_tracks_peak_usage(self) -> None:
+        budget = memory_budget.MemoryBudget(max_bytes=100)
+        budget.charge(60)
+        self.assertTrue(budget.try_prefetch(40))
+        self.assertFalse(budget.try_prefetch(41))
+        budget.charge(60)
+        self.assertTrue(budget.exceeded)
+        budget.release(60)
+        budget.release(60)
+        self.assertEqual(
+            budget.summary(),
+            {"max_bytes": 100, "peak_bytes": 120, "used_bytes": 0, "shed_prefetches": 1},
+        )
+
+    def test_unlimited(self) -> None:
+        budget = memory_budget.MemoryBudget()
+        budget.charge(1 << 40)
+        self.assertFalse(budget.exceeded)
+
+
+class ReadAheadBudgetTest(unittest.TestCase):
+    def test_sheds_prefetch_over_budget(self) -> None:
+        budget = memory_budget.MemoryBudget(max_bytes=250)
+        fetched: list[int] = []
+        lock = threading.Lock()
+
+        def fetch(index: int) -> bytes:
+            with lock:
+                fetched.append(index)
+            return bytes(100)
+
+        reader = read_ahead.ReadAhead(fetch, window=8, stop_index=20, memory_budget=budget)
+        for _ in range(20):
+            self.assertEqual(reader.next(), bytes(100))
+            # The frames handed out are released, the frames in flight fit the budget.
+            self.assertLessEqual(budget.used_bytes, 250)
+        self.assertIsNone(reader.next())
+        reader.close()
+
+        self.assertEqual(sorted(fetched), list(range(20)))
+        self.assertEqual(budget.used_bytes, 0)
+        self.assertEqual(budget.peak_bytes, 200)
+        self.assertGreater(budget.summary()["shed_prefetches"], 0)
+
+    def test_releases_discarded_frames(self) -> None:
+        budget = memory_budget.MemoryBudget()
+        reader = read_ahead.ReadAhead(lambda _: bytes(10), window=4, memory_budget=budget)
+        reader.next()
+        reader.seek(10)
+        reader.close()
+        reader._executor.shutdown(wait=True)
+        self.assertEqual(budget.used_bytes, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
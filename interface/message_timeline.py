@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import time
+import typing
+
+import instrumentation
+from log_readers import scheduled_reader
+import numpy as np
+
+from strada.public.log_readers import log_reader_base
+
+
+class MessageTimeline:
+    """The schedule of every message of a set of log readers, sorted by timestamp.
+
+    Each reader provides the int64 nanosecond timestamps of all of its messages, in the
+    order it produces them. Ties are broken by reader order.
+    """
+
+    def __init__(self, reader_timestamps_ns: typing.Sequence[np.ndarray]) -> None:
+        timestamps_ns = np.concatenate(
+            [np.asarray(timestamps, dtype=np.int64) for timestamps in reader_timestamps_ns]
+            + [np.zeros(0, dtype=np.int64)]
+        )
+        reader_indices = np.concatenate(
+            [
+                np.full(len(timestamps), i, dtype=np.int32)
+                for i, timestamps in enumerate(reader_timestamps_ns)
+            ]
+            + [np.zeros(0, dtype=np.int32)]
+        )
+        frame_indices = np.concatenate(
+            [np.arange(len(timestamps), dtype=np.int64) for timestamps in reader_timestamps_ns]
+            + [np.zeros(0, dtype=np.int64)]
+        )
+
+        order = np.argsort(timestamps_ns, kind="stable")
+        self.timestamps_ns = timestamps_ns[order]
+        self.reader_indices = reader_indices[order]
+        self.frame_indices = frame_indices[order]
+        self.message_counts = [len(timestamps) for timestamps in reader_timestamps_ns]
+        self.reader_timestamps_ns = [
+            np.asarray(timestamps, dtype=np.int64) for timestamps in reader_timestamps_ns
+        ]
+
+    def __len__(self) -> int:
+        return len(self.timestamps_ns)
+
+
+class MergedLogReader:
+    """Iterates over the messages of several log readers in timeline order.
+
+    Each step reads the next message of the reader scheduled by the timeline, so no
+    messages are buffered and nothing is compared at read time.
+    """
+
+    def __init__(
+        self,
+        log_readers: typing.Sequence[scheduled_reader.ScheduledLogReader],
+        timeline: MessageTimeline,
+        metrics: typing.Optional[instrumentation.Metrics] = None,
+    ) -> None:
+        self._log_readers = log_readers
+        self._timeline = timeline
+        self._metrics = metrics or instrumentation.DisabledMetrics()
+        self._position = 0
+        # Readers that stopped before the end of their schedule.
+        self._exhausted: set[int] = set()
+
+    def __iter__(self) -> MergedLogReader:
+        return self
+
+    @property
+    def position(self) -> int:
+        """Index in the timeline of the next message."""
+        return self._position
+
+    def seek(self, timestamp_ns: int) -> None:
+        """Continues from the first message at or after `timestamp_ns`. The skipped messages
+        are never read."""
+        self._position = int(
+            np.searchsorted(self._timeline.timestamps_ns, timestamp_ns, side="left")
+        )
+        self._exhausted.clear()
+        for log_reader, reader_timestamps in zip(
+            self._log_readers, self._timeline.reader_timestamps_ns
+        ):
+            log_reader.seek_to_message(
+                int(np.searchsorted(reader_timestamps, timestamp_ns, side="left"))
+            )
+
+    def __next__(self) -> log_reader_base.LogReadType:
+        while self._position < len(self._timeline):
+            reader_index = int(self._timeline.reader_indices[self._position])
+            self._position += 1
+            if reader_index in self._exhausted:
+                continue
+            try:
+                if not self._metrics.enabled:
+                    return next(self._log_readers[reader_index])
+                start = time.perf_counter()
+                read_message = next(self._log_readers[reader_index])
+                self._metrics.record_latency(
+                    f"read_message/{read_message.topic}", time.perf_counter() - start
+                )
+                return read_message
+            except StopIteration:
+                self._exhausted.add(reader_index)
+        raise StopIteration
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import heapq
+import typing
+import unittest
+
+import message_timeline
+import numpy as np
+
+
+class FakeReader:
+    def __init__(self, name: str, num_messages: int) -> None:
+        self._name = name
+        self._num_messages = num_messages
+        self.counter = 0
+
+    def seek_to_message(self, index: int) -> None:
+        self.counter = index
+
+    def __next__(self) -> str:
+        if self.counter >= self._num_messages:
+            raise StopIteration
+        self.counter += 1
+        return f"{self._name}{self.counter - 1}"
+
+
+class MessageTimelineTest(unittest.TestCase):
+    def test_matches_heap_merge(self) -> None:
+        reader_timestamps = [[0, 100, 200, 300], [33, 133, 233], [0, 66, 166, 300]]
+        messages = [
+            [(timestamp, reader, frame) for frame, timestamp in enumerate(timestamps)]
+            for reader, timestamps in enumerate(reader_timestamps)
+        ]
+        timeline = message_timeline.MessageTimeline([np.array(ts) for ts in reader_timestamps])
+        merged_reader = message_timeline.MergedLogReader(
+            [typing.cast(typing.Any, iter(reader_messages)) for reader_messages in messages],
+            timeline,
+        )
+
+        expected = list(heapq.merge(*messages, key=lambda message: message[0]))
+        self.assertEqual(list(merged_reader), expected)
+        self.assertEqual(len(timeline), len(expected))
+        self.assertEqual(timeline.message_counts, [4, 3, 4])
+        self.assertEqual(
+            list(zip(timeline.timestamps_ns, timeline.reader_indices, timeline.frame_indices)),
+            expected,
+        )
+
+    def test_reader_stopping_early(self) -> None:
+        timeline = message_timeline.MessageTimeline([np.array([0, 10, 20]), np.array([5, 15])])
+        merged_reader = message_timeline.MergedLogReader(
+            [typing.cast(typing.Any, iter(["a0"])), typing.cast(typing.Any, iter(["b0", "b1"]))],
+            timeline,
+        )
+        self.assertEqual(list(merged_reader), ["a0", "b0", "b1"])
+
+    def test_seek(self) -> None:
+        timeline = message_timeline.MessageTimeline([np.array([0, 10, 20]), np.array([5, 10, 15])])
+        readers = [FakeReader("a", 3), FakeReader("b", 3)]
+        merged_reader = message_timeline.MergedLogReader(
+            [typing.cast(typing.Any, reader) for reader in readers], timeline
+        )
+        self.assertEqual(next(merged_reader), "a0")
+
+        merged_reader.seek(10)
+        self.assertEqual([reader.counter for reader in readers], [1, 1])
+        self.assertEqual(list(merged_reader), ["a1", "b1", "b2", "a2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import contextlib
+import datetime
+import fcntl
+import hashlib
+import os
+import tempfile
+import threading
+import typing
+
+DEFAULT_MAX_BYTES = 10 * 1024**3
+# Eviction removes entries until the cache is below this fraction of its maximum size, so
+# it does not run again on every following write.
+_EVICTION_TARGET_FRACTION = 0.9
+_LOCK_FILE_NAME = ".lock"
+_TEMP_FILE_PREFIX = ".tmp-"
+
+
+class CachedOutput(typing.NamedTuple):
+    """A serialized channel output read from the cache, which log readers return in place
+    of the raw frame."""
+
+    data: bytes
+
+
+# Returns the cached output of the message of a topic at a timestamp, if there is one. Log
+# readers call this before fetching a frame, and return the cached output instead.
+LookupFunction = typing.Callable[[str, datetime.datetime], typing.Optional[CachedOutput]]
+
+
+def cache_key(*parts: str) -> str:
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+class OutputCache:
+    """Content-addressed on-disk cache of serialized channel outputs.
+
+    Entries are files named by their key, written to a temporary file and renamed into
+    place, so readers only ever see complete entries. Several processes can share a cache
+    directory: reads need no locking, and eviction of the least recently read entries, once
+    the cache grows past `max_bytes`, runs under a file lock.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self._directory = directory
+        self._max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # Size of the cache as last seen by this process. Other processes also write, so
+        # this is only a trigger to rescan, the eviction itself uses the actual sizes.
+        self._size_bytes = sum(entry.stat().st_size for entry in self._entries())
+
+    def get(self, key: str) -> typing.Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # The modification time orders entries for eviction.
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix=_TEMP_FILE_PREFIX, dir=os.path.dirname(path))
+        try:
+            with open(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(temp_path)
+            raise
+
+        with self._lock:
+            self._size_bytes += len(data)
+            if self._size_bytes > self._max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        with open(os.path.join(self._directory, _LOCK_FILE_NAME), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            entries = []
+            for entry in self._entries():
+                with contextlib.suppress(FileNotFoundError):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            entries.sort()
+
+            size_bytes = sum(size for _, size, _ in entries)
+            target_bytes = self._max_bytes * _EVICTION_TARGET_FRACTION
+            for _, size, path in entries:
+                if size_bytes <= target_bytes:
+                    break
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(path)
+                size_bytes -= size
+            self._size_bytes = size_bytes
+
+    def _entries(self) -> typing.Iterator[os.DirEntry[str]]:
+        for shard in os.scandir(self._directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if not entry.name.startswith(_TEMP_FILE_PREFIX):
+                    yield entry
+
+    def _path(self, key: str) -> str:
+        # Entries are spread over 256 subdirectories to keep directories small.
+        return os.path.join(self._directory, key[:2], key)
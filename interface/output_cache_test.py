@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import unittest
+
+import output_cache
+
+
+class OutputCacheTest(unittest.TestCase):
+    def test_put_get(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            cache = output_cache.OutputCache(directory)
+            key = output_cache.cache_key("log", "topic", "0", "Handler/1")
+            self.assertIsNone(cache.get(key))
+
+            cache.put(key, b"output")
+            self.assertEqual(cache.get(key), b"output")
+            # Entries persist for other processes and later conversions.
+            self.assertEqual(output_cache.OutputCache(directory).get(key), b"output")
+            # No temporary files are left behind.
+            self.assertEqual(len(list(cache._entries())), 1)
+
+    def test_keys_differ_per_part(self) -> None:
+        self.assertNotEqual(
+            output_cache.cache_key("log", "topic", "0", "Handler/1"),
+            output_cache.cache_key("log", "topic", "0", "Handler/2"),
+        )
+        self.assertNotEqual(
+            output_cache.cache_key("log", "topic0"), output_cache.cache_key("log", "topic", "0")
+        )
+
+    def test_evicts_least_recently_read(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            cache = output_cache.OutputCache(directory, max_bytes=300)
+            keys = [output_cache.cache_key(str(i)) for i in range(3)]
+            for i, key in enumerate(keys):
+                cache.put(key, bytes(100))
+                # Make the order of the entries independent of the file system's timestamps.
+                os.utime(cache._path(key), (i, i))
+            # Reading the oldest entry makes it the most recently used.
+            self.assertIsNotNone(cache.get(keys[0]))
+
+            cache.put(output_cache.cache_key("3"), bytes(100))
+
+            # Eviction goes below the maximum size, to 90% of it.
+            self.assertIsNone(cache.get(keys[1]))
+            self.assertIsNone(cache.get(keys[2]))
+            self.assertIsNotNone(cache.get(keys[0]))
+            self.assertIsNotNone(cache.get(output_cache.cache_key("3")))
+            self.assertEqual(cache._size_bytes, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,297 @@
+"""Opt-in CPU and memory profiling of a conversion, from log_open to log_close.
+
+The interface runs inside the stack server, where no profiler can be attached, so the
+conversion profiles itself and writes its results to files that can be collected from
+the container:
+
+    <directory>/<log>-<time>-<pid>.prof             cProfile stats (`cpu` mode)
+    <directory>/<log>-<time>-<pid>.samples.txt      collapsed stacks (`sampling` mode)
+    <directory>/<log>-<time>-<pid>.<n>.tracemalloc  tracemalloc snapshots (memory)
+    <directory>/<log>-<time>-<pid>.summary.txt      top-N functions and allocation sites
+
+`cpu` mode traces every call made by the interface calls, on the threads ADP makes
+them on. `sampling` mode samples the stacks of all threads, including the read-ahead
+threads, at a fixed interval and has a much lower overhead.
+"""
+from __future__ import annotations
+
+import collections
+import cProfile
+import io
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import types
+import typing
+
+MODES = ("cpu", "sampling")
+DEFAULT_DIRECTORY = "/tmp/profiles"
+DEFAULT_TOP_N = 30
+DEFAULT_SNAPSHOT_INTERVAL_SECONDS = 10.0
+DEFAULT_SAMPLE_INTERVAL_SECONDS = 0.005
+# Frames kept per traced allocation, enough to tell apart the callers of shared helpers.
+_TRACEMALLOC_FRAMES = 8
+
+# Stack frame as (file name, line number of the function, function name).
+_Frame = tuple[str, int, str]
+
+# Several conversions of a process can trace memory at once, and tracemalloc is global, so
+# it is only stopped once the last of them stops, and only if they started it.
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_started = False
+
+
+def _acquire_tracemalloc() -> None:
+    global _tracemalloc_users, _tracemalloc_started
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(_TRACEMALLOC_FRAMES)
+            _tracemalloc_started = True
+        _tracemalloc_users += 1
+
+
+def _release_tracemalloc() -> None:
+    global _tracemalloc_users, _tracemalloc_started
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _tracemalloc_started:
+            _tracemalloc_started = False
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+
+
+class ProfileOptions(typing.NamedTuple):
+    # `cpu`, `sampling` or None for no CPU profiling.
+    mode: typing.Optional[str] = None
+    memory: bool = False
+    directory: str = DEFAULT_DIRECTORY
+    top_n: int = DEFAULT_TOP_N
+    snapshot_interval_seconds: float = DEFAULT_SNAPSHOT_INTERVAL_SECONDS
+    sample_interval_seconds: float = DEFAULT_SAMPLE_INTERVAL_SECONDS
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode is not None or self.memory
+
+
+class Profiler:
+    """Profiles one conversion. `start` is called in log_open and `stop` in log_close, and
+    every interface call in between runs inside `active`."""
+
+    enabled = True
+
+    def __init__(self, options: ProfileOptions, log_path: str) -> None:
+        if options.mode is not None and options.mode not in MODES:
+            raise ValueError(f"Unknown profile mode {options.mode}, expected one of {MODES}")
+        self._options = options
+        name = re.sub(r"[^A-Za-z0-9_.-]+", "_", log_path).strip("_") or "log"
+        self._prefix = os.path.join(
+            options.directory, f"{name}-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        )
+        self._stopped = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+        self._cpu_profile: typing.Optional[cProfile.Profile] = None
+        # Samples per stack, innermost frame last.
+        self._stack_samples: collections.Counter[tuple[_Frame, ...]] = collections.Counter()
+        self._num_samples = 0
+
+        self._snapshot_paths: list[str] = []
+        self._first_snapshot: typing.Optional[tracemalloc.Snapshot] = None
+        self._last_snapshot: typing.Optional[tracemalloc.Snapshot] = None
+        # (seconds since start, traced bytes, peak traced bytes) of each snapshot.
+        self._memory_timeline: list[tuple[float, int, int]] = []
+        self._tracing_memory = False
+        self._start_time = 0.0
+
+    def start(self) -> None:
+        os.makedirs(self._options.directory, exist_ok=True)
+        self._start_time = time.perf_counter()
+        if self._options.mode == "cpu":
+            self._cpu_profile = cProfile.Profile()
+        elif self._options.mode == "sampling":
+            self._start_thread(self._sample_stacks, "profile_sampler")
+        if self._options.memory:
+            _acquire_tracemalloc()
+            self._tracing_memory = True
+            self._take_snapshot()
+            self._start_thread(self._take_snapshots, "profile_snapshots")
+
+    def active(self) -> typing.ContextManager[object]:
+        """Profiles the body of a `with` block in `cpu` mode."""
+        if self._cpu_profile is None:
+            return _NULL_CONTEXT
+        return self._cpu_profile
+
+    def stop(self) -> str:
+        """Stops profiling, writes the results and returns the path of the summary."""
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join()
+        if self._tracing_memory:
+            self._take_snapshot()
+            self._tracing_memory = False
+            _release_tracemalloc()
+
+        sections = [f"Profile of {os.path.basename(self._prefix)}"]
+        if self._cpu_profile is not None:
+            self._cpu_profile.dump_stats(f"{self._prefix}.prof")
+            sections.append(self._cpu_summary())
+        elif self._options.mode == "sampling":
+            self._write_samples()
+            sections.append(self._sampling_summary())
+        if self._options.memory:
+            sections.append(self._memory_summary())
+
+        summary_path = f"{self._prefix}.summary.txt"
+        with open(summary_path, "w") as f:
+            f.write("\n\n".join(sections) + "\n")
+        logging.info("Wrote the conversion profile to %s", summary_path)
+        return summary_path
+
+    def _start_thread(self, target: typing.Callable[[], None], name: str) -> None:
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _sample_stacks(self) -> None:
+        own_thread = threading.get_ident()
+        while not self._stopped.wait(self._options.sample_interval_seconds):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                stack = []
+                current: typing.Optional[types.FrameType] = frame
+                while current is not None:
+                    code = current.f_code
+                    stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                    current = current.f_back
+                self._stack_samples[tuple(reversed(stack))] += 1
+            self._num_samples += 1
+
+    def _take_snapshots(self) -> None:
+        while not self._stopped.wait(self._options.snapshot_interval_seconds):
+            self._take_snapshot()
+
+    def _take_snapshot(self) -> None:
+        try:
+            snapshot = tracemalloc.take_snapshot()
+        except RuntimeError:
+            # Tracing was turned off by code other than the profilers.
+            return
+        snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        traced_bytes, peak_bytes = tracemalloc.get_traced_memory()
+        self._memory_timeline.append(
+            (time.perf_counter() - self._start_time, traced_bytes, peak_bytes)
+        )
+        path = f"{self._prefix}.{len(self._snapshot_paths)}.tracemalloc"
+        snapshot.dump(path)
+        self._snapshot_paths.append(path)
+        if self._first_snapshot is None:
+            self._first_snapshot = snapshot
+        self._last_snapshot = snapshot
+
+    def _cpu_summary(self) -> str:
+        assert self._cpu_profile is not None
+        output = io.StringIO()
+        stats = pstats.Stats(self._cpu_profile, stream=output)
+        for sort_key in ("cumulative", "tottime"):
+            output.write(f"Top {self._options.top_n} functions by {sort_key} time\n")
+            stats.sort_stats(sort_key).print_stats(self._options.top_n)
+        return output.getvalue().rstrip()
+
+    def _write_samples(self) -> None:
+        # One `outer;...;inner count` line per stack, the input of flame graph tools.
+        with open(f"{self._prefix}.samples.txt", "w") as f:
+            for stack, count in self._stack_samples.most_common():
+                f.write(";".join(_format_frame(frame) for frame in stack) + f" {count}\n")
+
+    def _sampling_summary(self) -> str:
+        own_samples: collections.Counter[_Frame] = collections.Counter()
+        total_samples: collections.Counter[_Frame] = collections.Counter()
+        for stack, count in self._stack_samples.items():
+            if not stack:
+                continue
+            own_samples[stack[-1]] += count
+            for frame in set(stack):
+                total_samples[frame] += count
+        # Every thread is sampled, idle ones included, and several threads can be in the
+        # same function, so percentages of the samples can add up to more than 100.
+        num_samples = max(self._num_samples, 1)
+        lines = [
+            f"{self._num_samples} samples of all threads, one every "
+            f"{self._options.sample_interval_seconds}s"
+        ]
+        for title, counts in (("own", own_samples), ("total", total_samples)):
+            lines.append(f"Top {self._options.top_n} functions by {title} samples")
+            lines.extend(
+                f"{count:>8} {100 * count / num_samples:7.2f}%  {_format_frame(frame)}"
+                for frame, count in counts.most_common(self._options.top_n)
+            )
+        return "\n".join(lines)
+
+    def _memory_summary(self) -> str:
+        if self._last_snapshot is None:
+            return "No memory snapshots, tracemalloc was not tracing"
+        lines = ["Traced memory (seconds, current bytes, peak bytes)"]
+        lines.extend(
+            f"{seconds:10.1f} {traced:>14} {peak:>14}"
+            for seconds, traced, peak in self._memory_timeline
+        )
+        top_n = self._options.top_n
+        lines.append(f"Top {top_n} allocation sites at log_close")
+        lines.extend(str(stat) for stat in self._last_snapshot.statistics("lineno")[:top_n])
+        if self._first_snapshot is not None:
+            lines.append(f"Top {top_n} allocation sites by growth since log_open")
+            lines.extend(
+                str(stat)
+                for stat in self._last_snapshot.compare_to(self._first_snapshot, "lineno")[:top_n]
+            )
+        lines.append("Snapshots: " + ", ".join(self._snapshot_paths))
+        return "\n".join(lines)
+
+
+class DisabledProfiler(Profiler):
+    """Profiler that does nothing, used when profiling is off."""
+
+    enabled = False
+
+    def __init__(self) -> None:
+        pass
+
+    def start(self) -> None:
+        pass
+
+    def active(self) -> typing.ContextManager[object]:
+        return _NULL_CONTEXT
+
+    def stop(self) -> str:
+        return ""
+
+
+class _NullContext:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *_exc_info: typing.Any) -> None:
+        pass
+
+
+_NULL_CONTEXT = _NullContext()
+
+
+def _format_frame(frame: _Frame) -> str:
+    filename, line, function = frame
+    return f"{function} ({os.path.basename(filename)}:{line})"
+
+
+def create_profiler(options: ProfileOptions, log_path: str) -> Profiler:
+    return Profiler(options, log_path) if options.enabled else DisabledProfiler()
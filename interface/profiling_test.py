@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import tracemalloc
+import unittest
+
+import profiling
+
+
+def _workload() -> int:
+    return sum(len(str(value)) for value in range(20000))
+
+
+class ProfilerTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._temp_dir.cleanup)
+
+    def _profile(self, options: profiling.ProfileOptions) -> str:
+        profiler = profiling.create_profiler(options, "s3://bucket/logs/001")
+        profiler.start()
+        with profiler.active():
+            _workload()
+        summary_path = profiler.stop()
+        with open(summary_path) as f:
+            return f.read()
+
+    def test_cpu_profile(self) -> None:
+        summary = self._profile(
+            profiling.ProfileOptions(mode="cpu", directory=self._temp_dir.name, top_n=5)
+        )
+        self.assertIn("_workload", summary)
+        files = os.listdir(self._temp_dir.name)
+        self.assertTrue(any(name.endswith(".prof") for name in files))
+        self.assertTrue(all(name.startswith("s3_bucket_logs_001-") for name in files))
+
+    def test_sampling_and_memory_profile(self) -> None:
+        summary = self._profile(
+            profiling.ProfileOptions(
+                mode="sampling",
+                memory=True,
+                directory=self._temp_dir.name,
+                sample_interval_seconds=0.001,
+            )
+        )
+        self.assertIn("samples of all threads", summary)
+        self.assertIn("allocation sites", summary)
+        files = os.listdir(self._temp_dir.name)
+        self.assertTrue(any(name.endswith(".samples.txt") for name in files))
+        # One snapshot at start and one at stop.
+        self.assertEqual(sum(name.endswith(".tracemalloc") for name in files), 2)
+
+    def test_overlapping_memory_profiles(self) -> None:
+        options = profiling.ProfileOptions(
+            memory=True, directory=self._temp_dir.name, snapshot_interval_seconds=0.01
+        )
+        first = profiling.create_profiler(options, "first")
+        second = profiling.create_profiler(options, "second")
+        first.start()
+        second.start()
+        first.stop()
+        # The second conversion keeps tracing after the first one closes.
+        self.assertTrue(tracemalloc.is_tracing())
+        _workload()
+        with open(second.stop()) as f:
+            self.assertIn("allocation sites", f.read())
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_keeps_tracing_started_elsewhere(self) -> None:
+        tracemalloc.start()
+        self.addCleanup(tracemalloc.stop)
+        profiler = profiling.create_profiler(
+            profiling.ProfileOptions(memory=True, directory=self._temp_dir.name), "log"
+        )
+        profiler.start()
+        profiler.stop()
+        self.assertTrue(tracemalloc.is_tracing())
+
+    def test_disabled(self) -> None:
+        profiler = profiling.create_profiler(profiling.ProfileOptions(), "log")
+        self.assertFalse(profiler.enabled)
+        profiler.start()
+        with profiler.active():
+            _workload()
+        self.assertEqual(profiler.stop(), "")
+
+    def test_unknown_mode(self) -> None:
+        with self.assertRaises(ValueError):
+            profiling.Profiler(profiling.ProfileOptions(mode="gpu"), "log")
+
+
+if __name__ == "__main__":
+    unittest.main()
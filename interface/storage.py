@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import abc
+import io
+import mmap
+import os
+import threading
+import typing
+
+import constants
+
+DEFAULT_LOCAL_ROOT = "/logs"
+# Connections kept open by the shared S3 client, enough for the read-ahead threads of every
+# reader. botocore defaults to 10 and discards the connections above that.
+DEFAULT_MAX_POOL_CONNECTIONS = 32
+
+# Attempts per S3 request, retried with backoff on throttling and transient errors.
+S3_MAX_ATTEMPTS = 5
+
+_shared_s3_client: typing.Any = None
+_shared_s3_client_lock = threading.Lock()
+
+
+class ObjectInfo(typing.NamedTuple):
+    key: str
+    size: int
+
+
+class Storage(abc.ABC):
+    """Read-only access to raw log files, addressed by key relative to the storage root.
+
+    Log readers should go through a storage instead of talking to S3 or the filesystem
+    directly, so the same reader works against cloud storage and local mounts.
+    """
+
+    @abc.abstractmethod
+    def read(self, key: str) -> memoryview:
+        """Returns the contents of `key`.
+
+        Raises FileNotFoundError if the key does not exist.
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def list(self, prefix: str) -> list[ObjectInfo]:
+        """Returns every key starting with `prefix`, including those in subdirectories,
+        sorted by key. Returns an empty list if there are none."""
+        raise NotImplementedError()
+
+    @property
+    @abc.abstractmethod
+    def uri(self) -> str:
+        """Identifies the bucket or directory the keys are relative to, so the same key in
+        two storages can be told apart."""
+        raise NotImplementedError()
+
+
+def shared_s3_client(max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS) -> typing.Any:
+    """Returns the S3 client shared by all storages of the process, created on first use.
+
+    Creating a client imports boto3 and loads the S3 service model, which takes about a
+    second, so it is done once per process rather than once per log, and the connections
+    it opens are reused by later conversions. boto3 clients are thread-safe. The pool size
+    of the first call is kept.
+    """
+    global _shared_s3_client
+    with _shared_s3_client_lock:
+        if _shared_s3_client is None:
+            # Deferred so that conversions from local storage never import boto3.
+            import boto3
+            from botocore import config
+
+            _shared_s3_client = boto3.client(
+                "s3",
+                config=config.Config(
+                    max_pool_connections=max_pool_connections,
+                    retries={"mode": "standard", "max_attempts": S3_MAX_ATTEMPTS},
+                ),
+            )
+        return _shared_s3_client
+
+
+class S3Storage(Storage):
+    """Reads objects from an S3 bucket into memory, with the shared S3 client unless a
+    client is given."""
+
+    def __init__(
+        self,
+        bucket: str = constants.BUCKET_NAME,
+        client: typing.Any = None,
+        max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS,
+    ) -> None:
+        self._bucket = bucket
+        self._client = client
+        self._max_pool_connections = max_pool_connections
+
+    @property
+    def uri(self) -> str:
+        return f"s3://{self._bucket}"
+
+    @property
+    def client(self) -> typing.Any:
+        if self._client is None:
+            self._client = shared_s3_client(self._max_pool_connections)
+        return self._client
+
+    def read(self, key: str) -> memoryview:
+        buffer = io.BytesIO()
+        client = self.client
+        try:
+            client.download_fileobj(Bucket=self._bucket, Key=key, Fileobj=buffer)
+        except client.exceptions.ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                raise FileNotFoundError(f"s3://{self._bucket}/{key}") from e
+            raise
+        # Hand out a view of the download buffer rather than a copy of it.
+        return buffer.getbuffer()
+
+    def list(self, prefix: str) -> list[ObjectInfo]:
+        # Listings are paginated, 1000 keys per page.
+        paginator = self.client.get_paginator("list_objects_v2")
+        objects = [
+            ObjectInfo(item["Key"], item["Size"])
+            for page in paginator.paginate(Bucket=self._bucket, Prefix=prefix)
+            for item in page.get("Contents", [])
+        ]
+        return sorted(objects)
+
+
+class LocalStorage(Storage):
+    """Reads files below a local directory, such as the `/logs/` mount created by
+    `docker/start.sh --logs`.
+
+    Files are memory-mapped, so the returned buffers are backed by the page cache and
+    nothing is copied until a reader decodes them.
+    """
+
+    def __init__(self, root: str = DEFAULT_LOCAL_ROOT) -> None:
+        self._root = root
+
+    @property
+    def uri(self) -> str:
+        return f"file://{os.path.abspath(self._root)}"
+
+    def path(self, key: str) -> str:
+        return os.path.join(self._root, key)
+
+    def read(self, key: str) -> memoryview:
+        with open(self.path(key), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                # Empty files cannot be memory-mapped.
+                return memoryview(b"")
+            # The mapping stays valid after the file is closed and is released together
+            # with the last view that references it.
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def list(self, prefix: str) -> list[ObjectInfo]:
+        # Keys are matched as S3 prefixes, so only the directory holding the end of the
+        # prefix is walked.
+        objects = []
+        directories = [os.path.dirname(prefix)]
+        while directories:
+            directory = directories.pop()
+            try:
+                entries = list(os.scandir(self.path(directory)))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                key = f"{directory}/{entry.name}" if directory else entry.name
+                if not key.startswith(prefix):
+                    continue
+                if entry.is_dir():
+                    directories.append(key)
+                else:
+                    objects.append(ObjectInfo(key, entry.stat().st_size))
+        return sorted(objects)
+
+
+def create_storage(configuration: dict[str, typing.Any]) -> Storage:
+    """Creates the storage described by the scenario extra data.
+
+    `storage` selects the backend (`s3` or `local`). The S3 backend reads from `bucket`
+    with up to `s3_max_pool_connections` connections, and the local backend from
+    `local_root`.
+    """
+    storage_type = configuration.get("storage", "s3")
+    if storage_type == "s3":
+        return S3Storage(
+            configuration.get("bucket", constants.BUCKET_NAME),
+            max_pool_connections=_max_pool_connections(configuration),
+        )
+    if storage_type == "local":
+        return LocalStorage(configuration.get("local_root", DEFAULT_LOCAL_ROOT))
+    raise ValueError(f"Unknown storage type {storage_type}")
+
+
+def warm_up(configuration: dict[str, typing.Any]) -> typing.Optional[threading.Thread]:
+    """Prepares the backend `create_storage` selects for `configuration` in a background
+    thread, so that opening the first log does not wait for it. Returns the thread, if any.
+    """
+    if configuration.get("storage", "s3") != "s3":
+        return None
+    thread = threading.Thread(
+        target=shared_s3_client,
+        args=(_max_pool_connections(configuration),),
+        name="s3_client_warm_up",
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+def _max_pool_connections(configuration: dict[str, typing.Any]) -> int:
+    return int(configuration.get("s3_max_pool_connections", DEFAULT_MAX_POOL_CONNECTIONS))
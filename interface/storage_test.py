@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import typing
+import unittest
+
+import storage
+
+
+class LocalStorageTest(unittest.TestCase):
+    def test_read(self) -> None:
+        with tempfile.TemporaryDirectory() as root:
+            os.makedirs(os.path.join(root, "log/meta"))
+            with open(os.path.join(root, "log/meta/gps.json"), "wb") as f:
+                f.write(b"[]")
+            open(os.path.join(root, "log/meta/empty.json"), "wb").close()
+
+            local_storage = storage.LocalStorage(root)
+            self.assertEqual(bytes(local_storage.read("log/meta/gps.json")), b"[]")
+            self.assertEqual(bytes(local_storage.read("log/meta/empty.json")), b"")
+            with self.assertRaises(FileNotFoundError):
+                local_storage.read("log/meta/missing.json")
+
+    def test_list(self) -> None:
+        with tempfile.TemporaryDirectory() as root:
+            for key, size in (("log/lidar/00.pkl.gz", 3), ("log/lidar/sub/01.pkl.gz", 1)):
+                os.makedirs(os.path.dirname(os.path.join(root, key)), exist_ok=True)
+                with open(os.path.join(root, key), "wb") as f:
+                    f.write(bytes(size))
+            os.makedirs(os.path.join(root, "log/lidar_extra"))
+
+            local_storage = storage.LocalStorage(root)
+            self.assertEqual(
+                local_storage.list("log/lidar/"),
+                [
+                    storage.ObjectInfo("log/lidar/00.pkl.gz", 3),
+                    storage.ObjectInfo("log/lidar/sub/01.pkl.gz", 1),
+                ],
+            )
+            self.assertEqual(len(local_storage.list("log/li")), 2)
+            self.assertEqual(local_storage.list("log/camera/"), [])
+
+    def test_create_storage(self) -> None:
+        self.assertIsInstance(
+            storage.create_storage({"storage": "local", "local_root": "/tmp"}),
+            storage.LocalStorage,
+        )
+        with self.assertRaises(ValueError):
+            storage.create_storage({"storage": "ftp"})
+
+    def test_uri(self) -> None:
+        self.assertEqual(storage.LocalStorage("/logs/").uri, "file:///logs")
+        self.assertEqual(storage.S3Storage("bucket", client=object()).uri, "s3://bucket")
+
+
+class _ClientError(Exception):
+    def __init__(self, code: str) -> None:
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+class _FakeS3Client:
+    """Serves `objects` from the bucket `bucket`."""
+
+    class exceptions:
+        ClientError = _ClientError
+
+    def __init__(self, bucket: str, objects: dict[str, bytes]) -> None:
+        self._bucket = bucket
+        self._objects = objects
+
+    def get_paginator(self, operation_name: str) -> _FakeS3Client:
+        assert operation_name == "list_objects_v2"
+        return self
+
+    def paginate(self, Bucket: str, Prefix: str) -> list[dict[str, typing.Any]]:
+        assert Bucket == self._bucket
+        # One key per page.
+        return [
+            {"Contents": [{"Key": key, "Size": len(data)}]}
+            for key, data in sorted(self._objects.items(), reverse=True)
+            if key.startswith(Prefix)
+        ] + [{"KeyCount": 0}]
+
+    def download_fileobj(self, Bucket: str, Key: str, Fileobj: typing.BinaryIO) -> None:
+        assert Bucket == self._bucket
+        if Key not in self._objects:
+            raise _ClientError("404")
+        Fileobj.write(self._objects[Key])
+
+
+class S3StorageTest(unittest.TestCase):
+    def setUp(self) -> None:
+        storage._shared_s3_client = None
+        self.addCleanup(setattr, storage, "_shared_s3_client", None)
+
+    def test_read(self) -> None:
+        s3_storage = storage.S3Storage(
+            "bucket", _FakeS3Client("bucket", {"log/meta/gps.json": b"[]"})
+        )
+        self.assertEqual(bytes(s3_storage.read("log/meta/gps.json")), b"[]")
+        with self.assertRaises(FileNotFoundError):
+            s3_storage.read("log/meta/missing.json")
+
+    def test_list(self) -> None:
+        s3_storage = storage.S3Storage(
+            "bucket",
+            _FakeS3Client(
+                "bucket", {"log/lidar/01.pkl.gz": b"1", "log/lidar/00.pkl.gz": b"00", "x": b""}
+            ),
+        )
+        self.assertEqual(
+            s3_storage.list("log/"),
+            [
+                storage.ObjectInfo("log/lidar/00.pkl.gz", 2),
+                storage.ObjectInfo("log/lidar/01.pkl.gz", 1),
+            ],
+        )
+
+    def test_shared_client(self) -> None:
+        configuration = {"storage": "s3", "s3_max_pool_connections": "48"}
+        warm_up_thread = storage.warm_up(configuration)
+        assert warm_up_thread is not None
+        warm_up_thread.join()
+
+        first = storage.create_storage(configuration)
+        second = storage.create_storage({"storage": "s3"})
+        assert isinstance(first, storage.S3Storage) and isinstance(second, storage.S3Storage)
+        self.assertIs(first.client, second.client)
+        self.assertEqual(first.client.meta.config.max_pool_connections, 48)
+
+    def test_no_warm_up_for_local_storage(self) -> None:
+        self.assertIsNone(storage.warm_up({"storage": "local"}))
+        self.assertIsNone(storage._shared_s3_client)
+
+
+if __name__ == "__main__":
+    unittest.main()
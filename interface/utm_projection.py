@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import typing
+
+import numpy as np
+
+# WGS84 ellipsoid
+WGS84_A = 6378137.0  # major axis
+WGS84_F = 1 / 298.257223563  # flattening
+K0 = 0.9996  # UTM scale factor
+
+FALSE_EASTING = 500000.0
+# Added to the northing in the southern hemisphere so it stays positive.
+FALSE_NORTHING_SOUTH = 10000000.0
+
+_E_SQ = WGS84_F * (2 - WGS84_F)  # eccentricity squared
+_E_PRIME_SQ = _E_SQ / (1 - _E_SQ)
+
+
+class UtmProjection(typing.NamedTuple):
+    easting: np.ndarray
+    northing: np.ndarray
+    zone_number: int
+    hemisphere: str  # "N" or "S"
+
+
+def zone_number_for(lon: float) -> int:
+    return int((lon + 180) // 6) % 60 + 1
+
+
+def project(
+    lat: typing.Any,
+    lon: typing.Any,
+    zone_number: typing.Optional[int] = None,
+    hemisphere: typing.Optional[str] = None,
+) -> UtmProjection:
+    """Projects arrays of WGS84 latitudes and longitudes (degrees) to UTM.
+
+    All points are projected into a single zone and hemisphere so a trajectory stays
+    continuous when it crosses a zone boundary or the equator. Both default to those of
+    the first point.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    if zone_number is None:
+        zone_number = zone_number_for(float(lon.flat[0]))
+    if hemisphere is None:
+        hemisphere = "N" if lat.flat[0] >= 0 else "S"
+
+    lon_origin = (zone_number - 1) * 6 - 180 + 3  # central meridian of zone
+    lat_rad = np.radians(lat)
+    sin_lat = np.sin(lat_rad)
+    cos_lat = np.cos(lat_rad)
+    tan_lat = np.tan(lat_rad)
+
+    # Ellipsoid parameters
+    N = WGS84_A / np.sqrt(1 - _E_SQ * sin_lat**2)
+    T = tan_lat**2
+    C = _E_PRIME_SQ * cos_lat**2
+    A = cos_lat * np.radians(lon - lon_origin)
+
+    # Meridian arc
+    e_sq = _E_SQ
+    M = WGS84_A * (
+        (1 - e_sq / 4 - 3 * e_sq**2 / 64 - 5 * e_sq**3 / 256) * lat_rad
+        - (3 * e_sq / 8 + 3 * e_sq**2 / 32 + 45 * e_sq**3 / 1024) * np.sin(2 * lat_rad)
+        + (15 * e_sq**2 / 256 + 45 * e_sq**3 / 1024) * np.sin(4 * lat_rad)
+        - (35 * e_sq**3 / 3072) * np.sin(6 * lat_rad)
+    )
+
+    easting = (
+        K0
+        * N
+        * (
+            A
+            + (1 - T + C) * A**3 / 6
+            + (5 - 18 * T + T**2 + 72 * C - 58 * _E_PRIME_SQ) * A**5 / 120
+        )
+        + FALSE_EASTING
+    )
+    northing = K0 * (
+        M
+        + N
+        * tan_lat
+        * (
+            A**2 / 2
+            + (5 - T + 9 * C + 4 * C**2) * A**4 / 24
+            + (61 - 58 * T + T**2 + 600 * C - 330 * _E_PRIME_SQ) * A**6 / 720
+        )
+    )
+    if hemisphere == "S":
+        northing = northing + FALSE_NORTHING_SOUTH
+
+    return UtmProjection(easting, northing, zone_number, hemisphere)
+
+
+def latlon_to_utm(lat: float, lon: float) -> dict[str, typing.Any]:
+    """Projects a single point into its own UTM zone."""
+    projection = project([lat], [lon])
+    return {
+        "easting": float(projection.easting[0]),
+        "northing": float(projection.northing[0]),
+        "zone_number": projection.zone_number,
+        "hemisphere": projection.hemisphere,
+    }
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import unittest
+
+import numpy as np
+import utm_projection
+
+
+class UtmProjectionTest(unittest.TestCase):
+    def test_northern_hemisphere(self) -> None:
+        point = utm_projection.latlon_to_utm(37.7749, -122.4194)
+        self.assertEqual(point["zone_number"], 10)
+        self.assertEqual(point["hemisphere"], "N")
+        self.assertAlmostEqual(point["easting"], 551130.768, places=2)
+        self.assertAlmostEqual(point["northing"], 4180998.882, places=2)
+
+    def test_southern_hemisphere(self) -> None:
+        point = utm_projection.latlon_to_utm(-33.8688, 151.2093)
+        self.assertEqual(point["zone_number"], 56)
+        self.assertEqual(point["hemisphere"], "S")
+        self.assertAlmostEqual(point["easting"], 334368.634, places=2)
+        self.assertAlmostEqual(point["northing"], 6250948.345, places=2)
+
+    def test_zone_crossing_stays_in_first_zone(self) -> None:
+        # Zone 10 ends at -120 degrees, so the second point is in zone 11 on its own.
+        projection = utm_projection.project([37.7749, 37.7749], [-120.01, -119.99])
+        self.assertEqual(utm_projection.latlon_to_utm(37.7749, -119.99)["zone_number"], 11)
+        self.assertEqual(projection.zone_number, 10)
+        np.testing.assert_allclose(projection.easting[1], 765106.406, atol=1e-2)
+        self.assertGreater(projection.easting[1], projection.easting[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,4 +6,8 @@ DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 source "$DIR/docker/variables.sh"
 
 docker exec -it $CONTAINER_NAME coverage run -m unittest discover -p '*_test.py' -s /interface
+# The subdirectories are not packages, which discovery from /interface does not enter.
+for TEST_DIR in /interface/benchmarks /interface/channel_handlers /interface/log_readers /scripts; do
+  docker exec -it $CONTAINER_NAME coverage run -a -m unittest discover -p '*_test.py' -s "$TEST_DIR"
+done
 docker exec -it $CONTAINER_NAME coverage report -i
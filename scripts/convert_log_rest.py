@@ -1,9 +1,16 @@
 from __future__ import annotations
 
 import argparse
+import concurrent.futures
 import os
+import random
+import threading
+import time
+import typing
 
 import requests
+from requests import adapters
+from urllib3 import exceptions as urllib3_exceptions
 
 # TODO: Adjust the constants to the parameters to use for conversions.
 MAP_KEY = "sunnyvale"
@@ -20,36 +27,210 @@ API_URL = "http://localhost:8088"
 # IMAGE_NAME = "sample_image:tag"   # Only used in cloud
 # BASE_SIM_FLAGS = f" --container_name 'strada' --customer_server_run_cmd 'python /interface/log_converter.py' --image_name {IMAGE_NAME}"
 
+# Responses to a conversion request that are retried: rate limiting only. A server side
+# error may come after the conversion was started, and retrying it would start it twice.
+RETRY_STATUS_CODES = frozenset({429})
 
-def convert_drive(log_path: str, auth_token: str) -> None:
-    headers = {
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-        "Authorization": f"Bearer {auth_token}",
-    }
-    request_body_template = {
+
+def create_session(auth_token: str, pool_size: int) -> requests.Session:
+    """Creates a session whose connections are reused across requests, with enough pooled
+    connections for `pool_size` concurrent requests."""
+    session = requests.Session()
+    adapter = adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(
+        {
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+            "Authorization": f"Bearer {auth_token}",
+        }
+    )
+    # TODO(284066) remove, authorization header is preferred. v2 API should
+    # be preferred.
+    session.cookies.set("auth_token", auth_token)
+    return session
+
+
+def create_request_body(log_path: str) -> dict[str, typing.Any]:
+    return {
         "logs": [{"name": "default", "path": log_path}],
         "drive_config_path": DRIVE_CONFIG_PATH,
         "drive_duration_secs": 20000,
         "map_key": MAP_KEY,
         "sim_flags": f"{BASE_SIM_FLAGS}",
     }
-    print("Request", request_body_template)
-    response = requests.post(
-        f"{API_URL}/v1/convert_strada_drive?auth_token={auth_token}",
-        json=request_body_template,
-        headers=headers,
-        # TODO(284066) remove, authorization header is preferred. v2 API should
-        # be preferred.
-        cookies={"auth_token": auth_token},
-        timeout=1000,
-    )
-    print(response)
+
+
+class RateLimiter:
+    """Spaces out calls to `wait` by at least 1 / `max_per_second` seconds, across threads."""
+
+    def __init__(self, max_per_second: float) -> None:
+        self._interval = 1.0 / max_per_second if max_per_second > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+
+    def wait(self) -> None:
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait_seconds = self._next_time - now
+            self._next_time = max(now, self._next_time) + self._interval
+        if wait_seconds > 0:
+            time.sleep(wait_seconds)
+
+
+class BatchOptions(typing.NamedTuple):
+    api_url: str = API_URL
+    concurrency: int = 1
+    # Maximum number of conversion requests started per second, 0 for no limit.
+    max_requests_per_second: float = 0.0
+    # Number of times a failed request is retried, with exponential backoff. Requests are
+    # only retried when they were not sent or were rate limited.
+    retries: int = 3
+    backoff_seconds: float = 1.0
+    timeout_seconds: float = 1000.0
+
+
+class ConversionResult(typing.NamedTuple):
+    log_path: str
+    succeeded: bool
+    attempts: int
+    seconds: float
+    # The HTTP status of the submission, or `error` if it failed without a response.
+    status: str
+    error: typing.Optional[str] = None
+
+
+class _RetryableError(Exception):
+    def __init__(self, message: str, retry_after_seconds: typing.Optional[float] = None) -> None:
+        super().__init__(message)
+        self.retry_after_seconds = retry_after_seconds
+
+
+def _not_sent(error: requests.RequestException) -> bool:
+    """Whether the request failed before any of it was sent, so the server never saw it."""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, urllib3_exceptions.NewConnectionError)
+
+
+def _request(
+    session: requests.Session, method: str, url: str, timeout: float, **kwargs: typing.Any
+) -> requests.Response:
+    """Sends a request, raising _RetryableError for failures worth retrying and
+    requests.RequestException for the others.
+
+    Requests are only retried when they were never sent or were rate limited, so a
+    conversion is never started twice.
+    """
+    try:
+        response = session.request(method, url, timeout=timeout, **kwargs)
+    except (requests.ConnectionError, requests.Timeout) as e:
+        if _not_sent(e):
+            raise _RetryableError(str(e))
+        raise
+    if response.status_code in RETRY_STATUS_CODES:
+        retry_after = response.headers.get("Retry-After")
+        raise _RetryableError(
+            f"HTTP {response.status_code}",
+            float(retry_after) if retry_after and retry_after.isdigit() else None,
+        )
+    response.raise_for_status()
+    return response
+
+
+def _with_retries(
+    options: BatchOptions, send: typing.Callable[[], requests.Response]
+) -> requests.Response:
+    """Calls `send` until it succeeds or runs out of retries."""
+    retry = 0
+    while True:
+        try:
+            return send()
+        except _RetryableError as e:
+            if retry == options.retries:
+                raise
+            delay = e.retry_after_seconds
+            if delay is None:
+                # Exponential backoff, with jitter so concurrent retries spread out.
+                delay = options.backoff_seconds * 2**retry * random.uniform(0.5, 1.0)
+            time.sleep(delay)
+            retry += 1
+
+
+def convert_log(
+    session: requests.Session,
+    log_path: str,
+    auth_token: str,
+    options: BatchOptions,
+    rate_limiter: RateLimiter,
+) -> ConversionResult:
+    """Submits the conversion of one log, retrying failed requests."""
+    start = time.monotonic()
+    url = f"{options.api_url}/v1/convert_strada_drive?auth_token={auth_token}"
+    body = create_request_body(log_path)
+
+    attempts = 0
+
+    def submit() -> requests.Response:
+        nonlocal attempts
+        attempts += 1
+        rate_limiter.wait()
+        return _request(session, "POST", url, options.timeout_seconds, json=body)
+
+    def result(status: str, error: typing.Optional[str] = None) -> ConversionResult:
+        return ConversionResult(
+            log_path, error is None, attempts, time.monotonic() - start, status, error
+        )
+
+    try:
+        response = _with_retries(options, submit)
+    except (_RetryableError, requests.RequestException) as e:
+        return result("error", str(e))
+    return result(str(response.status_code))
+
+
+def convert_logs(
+    log_paths: typing.Sequence[str], auth_token: str, options: BatchOptions
+) -> list[ConversionResult]:
+    """Converts `log_paths` with up to `options.concurrency` conversions in flight, printing
+    each result as it completes. Results are returned in the order of `log_paths`."""
+    rate_limiter = RateLimiter(options.max_requests_per_second)
+    with create_session(auth_token, options.concurrency) as session:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=options.concurrency) as executor:
+            futures = [
+                executor.submit(convert_log, session, log_path, auth_token, options, rate_limiter)
+                for log_path in log_paths
+            ]
+            for done, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+                result = future.result()
+                outcome = "ok" if result.succeeded else f"FAILED ({result.error})"
+                print(
+                    f"[{done}/{len(futures)}] {result.log_path}: {outcome} "
+                    f"status={result.status} attempts={result.attempts} {result.seconds:.1f}s"
+                )
+            return [future.result() for future in futures]
+
+
+def summarize(results: typing.Sequence[ConversionResult], elapsed_seconds: float) -> str:
+    succeeded = sum(result.succeeded for result in results)
+    failed = [result for result in results if not result.succeeded]
+    retried = sum(result.attempts > 1 for result in results)
+    lines = [
+        f"Converted {succeeded}/{len(results)} logs in {elapsed_seconds:.1f}s "
+        f"({len(results) / elapsed_seconds if elapsed_seconds else 0.0:.2f} logs/s), "
+        f"{len(failed)} failed, {retried} retried",
+    ]
+    lines.extend(f"  FAILED {result.log_path}: {result.error}" for result in failed)
+    return "\n".join(lines)
 
 
 if __name__ == "__main__":
     """
-    Helper script to convert a drive using the rest api.
+    Helper script to convert drives using the rest api.
     """
     parser = argparse.ArgumentParser()
     parser.add_argument(
@@ -65,12 +246,37 @@ if __name__ == "__main__":
         required=True,
         help="Rest API token. See documentation for how to obtain this here: https://home.applied.co/manual/adp/latest/#/apis/rest_api/rest_api?id=authentication-for-desktop-adp.",
     )
+    parser.add_argument("--api_url", type=str, default=API_URL)
+    parser.add_argument(
+        "--concurrency", type=int, default=1, help="Number of conversions submitted at once"
+    )
+    parser.add_argument(
+        "--max_requests_per_second",
+        type=float,
+        default=0.0,
+        help="Maximum number of conversion requests per second, 0 for no limit",
+    )
+    parser.add_argument("--retries", type=int, default=3, help="Retries of each failed request")
+    parser.add_argument("--backoff_seconds", type=float, default=1.0)
+    parser.add_argument("--timeout_seconds", type=float, default=1000.0)
     args = parser.parse_args()
 
     script_dir = os.path.dirname(__file__)
-    logs = open(os.path.join(script_dir, args.log_paths_file)).read().splitlines()
-    for log in logs:
-        if log.strip():
-            print("Converting ", log)
-            convert_drive(log, args.rest_api_token)
-    print(f"Navigate to {API_URL}/strada/library to view log.")
+    with open(os.path.join(script_dir, args.log_paths_file)) as f:
+        logs = [line.strip() for line in f if line.strip()]
+
+    start = time.monotonic()
+    results = convert_logs(
+        logs,
+        args.rest_api_token,
+        BatchOptions(
+            api_url=args.api_url,
+            concurrency=args.concurrency,
+            max_requests_per_second=args.max_requests_per_second,
+            retries=args.retries,
+            backoff_seconds=args.backoff_seconds,
+            timeout_seconds=args.timeout_seconds,
+        ),
+    )
+    print(summarize(results, time.monotonic() - start))
+    print(f"Navigate to {args.api_url}/strada/library to view log.")
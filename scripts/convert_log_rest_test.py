@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import collections
+import http.server
+import json
+import threading
+import time
+import typing
+import unittest
+
+import convert_log_rest
+import requests
+from urllib3 import exceptions as urllib3_exceptions
+
+
+class FakeApiServer(http.server.ThreadingHTTPServer):
+    """Stand-in for the conversion REST API.
+
+    Conversions of logs named `flaky*` are rate limited with a 429 on their first
+    submission, `busy*` logs fail with a 503 on theirs, and `bad*` logs are rejected with
+    a 400.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _FakeApiHandler)
+        self.lock = threading.Lock()
+        self.submissions: collections.Counter[str] = collections.Counter()
+        self.client_ports: set[int] = set()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _FakeApiHandler(http.server.BaseHTTPRequestHandler):
+    server: FakeApiServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *_args: typing.Any) -> None:
+        pass
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        log_path = body["logs"][0]["path"]
+        with self.server.lock:
+            self.server.client_ports.add(self.client_address[1])
+            self.server.submissions[log_path] += 1
+            attempt = self.server.submissions[log_path]
+        if log_path.startswith("flaky") and attempt == 1:
+            self._respond(429, {})
+        elif log_path.startswith("busy") and attempt == 1:
+            self._respond(503, {})
+        elif log_path.startswith("bad"):
+            self._respond(400, {"error": "bad request"})
+        else:
+            self._respond(200, {"id": log_path})
+
+    def _respond(self, status: int, body: dict[str, typing.Any]) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class ConvertLogsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = FakeApiServer()
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def _options(self, **kwargs: typing.Any) -> convert_log_rest.BatchOptions:
+        return convert_log_rest.BatchOptions(
+            api_url=self.server.url, backoff_seconds=0.01, timeout_seconds=10, **kwargs
+        )
+
+    def test_batch_with_retries(self) -> None:
+        log_paths = [f"log_{i}" for i in range(10)] + ["flaky_0", "busy_0", "bad_0"]
+        results = convert_log_rest.convert_logs(log_paths, "token", self._options(concurrency=4))
+
+        self.assertEqual([result.log_path for result in results], log_paths)
+        by_path = {result.log_path: result for result in results}
+        self.assertTrue(all(by_path[f"log_{i}"].succeeded for i in range(10)))
+        self.assertEqual(by_path["log_0"].status, "200")
+        self.assertTrue(by_path["flaky_0"].succeeded)
+        self.assertEqual(by_path["flaky_0"].attempts, 2)
+        # Server errors may come after a conversion started, so submissions are not retried.
+        self.assertFalse(by_path["busy_0"].succeeded)
+        self.assertEqual(self.server.submissions["busy_0"], 1)
+        # Client errors are not retried.
+        self.assertFalse(by_path["bad_0"].succeeded)
+        self.assertEqual(by_path["bad_0"].attempts, 1)
+        # Connections are pooled instead of opened per request.
+        self.assertLessEqual(len(self.server.client_ports), 4)
+
+        summary = convert_log_rest.summarize(results, elapsed_seconds=2.0)
+        self.assertIn("Converted 11/13 logs", summary)
+        self.assertIn("2 failed, 1 retried", summary)
+        self.assertIn("FAILED bad_0", summary)
+
+    def test_gives_up_after_retries(self) -> None:
+        # Connections to the closed server are refused, so the request is never sent.
+        self.server.shutdown()
+        self.server.server_close()
+        results = convert_log_rest.convert_logs(["log_0"], "token", self._options(retries=2))
+        self.assertFalse(results[0].succeeded)
+        self.assertEqual(results[0].attempts, 3)
+
+
+class _FakeSession:
+    """Answers every request with `status_code`, or raises `error`."""
+
+    def __init__(self, status_code: int = 200, error: typing.Optional[Exception] = None) -> None:
+        self._status_code = status_code
+        self._error = error
+
+    def request(self, *_args: typing.Any, **_kwargs: typing.Any) -> requests.Response:
+        if self._error is not None:
+            raise self._error
+        response = requests.Response()
+        response.status_code = self._status_code
+        return response
+
+
+class RequestTest(unittest.TestCase):
+    def _request(self, session: _FakeSession) -> requests.Response:
+        return convert_log_rest._request(typing.cast(requests.Session, session), "POST", "url", 1.0)
+
+    def test_server_errors(self) -> None:
+        with self.assertRaises(requests.HTTPError):
+            self._request(_FakeSession(503))
+        with self.assertRaises(convert_log_rest._RetryableError):
+            self._request(_FakeSession(429))
+
+    def test_connection_errors(self) -> None:
+        # The exceptions requests raises when a connection is refused.
+        no_pool = typing.cast(typing.Any, None)
+        not_sent = requests.ConnectionError(
+            urllib3_exceptions.MaxRetryError(
+                no_pool, "url", urllib3_exceptions.NewConnectionError(no_pool, "refused")
+            )
+        )
+        dropped = requests.ConnectionError(urllib3_exceptions.ProtocolError("reset"))
+        with self.assertRaises(convert_log_rest._RetryableError):
+            self._request(_FakeSession(error=not_sent))
+        with self.assertRaises(convert_log_rest._RetryableError):
+            self._request(_FakeSession(error=requests.ConnectTimeout()))
+        # The server may have received a request whose response never arrived.
+        with self.assertRaises(requests.ConnectionError):
+            self._request(_FakeSession(error=dropped))
+        with self.assertRaises(requests.ReadTimeout):
+            self._request(_FakeSession(error=requests.ReadTimeout()))
+
+
+class RateLimiterTest(unittest.TestCase):
+    def test_spaces_out_calls(self) -> None:
+        rate_limiter = convert_log_rest.RateLimiter(max_per_second=100)
+        start = time.monotonic()
+        for _ in range(5):
+            rate_limiter.wait()
+        self.assertGreaterEqual(time.monotonic() - start, 0.04 - 1e-3)
+
+
+if __name__ == "__main__":
+    unittest.main()